@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
+
+    def ready(self):
+        from monitoring import metrics
+
+        # Connect the user cache's signal receivers.
+        from . import authentication, revocation  # noqa: F401
+
+        metrics.expose(
+            "refresh_token_revocation_events_total",
+            "Revocation checks the filter passed alone or looked up, and "
+            "tokens revoked",
+            revocation.stats,
+            "event",
+        )
@@ -0,0 +1,126 @@
+"""
+JWT authentication without a users-table read on every request.
+
+``CachedJWTAuthentication`` validates tokens exactly like simplejwt's
+``JWTAuthentication`` but keeps each user it loads in a per-process cache
+for ``USER_CACHE_SECONDS``. Entries are keyed by user id and the token's
+version claim (simplejwt's ``REVOKE_TOKEN_CLAIM``, present when
+``CHECK_REVOKE_TOKEN`` is on), so tokens issued before a password change
+never share an entry with newer ones. Saving or deleting a user, which
+includes profile updates and deactivation, drops that process's entries
+at once; other processes notice within the cache lifetime.
+
+With ``TRUST_TOKEN_CLAIMS`` on, views that set ``trust_token_claims``
+answer safe requests with a ``TokenUser`` built from the claims signed
+into the token at login (see ``token_claims``), without loading the user.
+A deactivated user keeps that read access until the token expires.
+"""
+
+import copy
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from monitoring import metrics
+
+from . import conf
+from .tokens import RefreshToken
+
+AUTHENTICATION_SECONDS = metrics.histogram(
+    "jwt_authentication_seconds",
+    "Time to validate a JWT and resolve its user",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1),
+)
+USER_LOOKUPS = metrics.counter(
+    "jwt_user_lookups_total",
+    "Users for JWTs served from the cache, loaded, or built from claims",
+    ("source",),
+)
+
+_lock = threading.Lock()
+# {(user id, token version): (expires at, user)}
+_users = {}
+
+
+def token_claims(user):
+    """Claims signed into tokens for ``TRUST_TOKEN_CLAIMS`` reads."""
+    return {"username": user.username}
+
+
+def tokens_for(user):
+    """Return ``{"refresh", "access"}`` token strings for ``user``."""
+    refresh = RefreshToken.for_user(user)
+    for claim, value in token_claims(user).items():
+        refresh[claim] = value
+    return {"refresh": str(refresh), "access": str(refresh.access_token)}
+
+
+def forget(user_id):
+    """Drop this process's cached copies of a user."""
+    with _lock:
+        for key in [key for key in _users if key[0] == user_id]:
+            del _users[key]
+
+
+def reset():
+    """Forget every cached user (used by tests)."""
+    with _lock:
+        _users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        view = (getattr(request, "parser_context", None) or {}).get("view")
+        self.trust_claims = (
+            conf.get("TRUST_TOKEN_CLAIMS")
+            and getattr(view, "trust_token_claims", False)
+            and request.method in SAFE_METHODS
+        )
+        if self.get_header(request) is None:
+            return None  # Anonymous requests are not timed.
+        started = time.perf_counter()
+        try:
+            return super().authenticate(request)
+        finally:
+            AUTHENTICATION_SECONDS.observe(time.perf_counter() - started)
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # Raises InvalidToken.
+        if self.trust_claims:
+            USER_LOOKUPS.inc("claims")
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+
+        lifetime = conf.get("USER_CACHE_SECONDS")
+        key = (user_id, validated_token.get(api_settings.REVOKE_TOKEN_CLAIM))
+        now = time.monotonic()
+        cached = _users.get(key)
+        if cached is not None and cached[0] > now:
+            USER_LOOKUPS.inc("cache")
+            # Each request gets its own copy to modify.
+            return copy.copy(cached[1])
+
+        USER_LOOKUPS.inc("database")
+        user = super().get_user(validated_token)
+        if lifetime:
+            with _lock:
+                if len(_users) >= conf.get("USER_CACHE_SIZE"):
+                    _users.clear()
+                _users[key] = (now + lifetime, copy.copy(user))
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _on_user_changed(sender, instance, **kwargs):
+    forget(instance.pk)
+    # Again once committed, in case a request cached the old row meanwhile.
+    transaction.on_commit(lambda: forget(instance.pk))
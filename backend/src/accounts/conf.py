@@ -0,0 +1,32 @@
+"""
+Settings for the accounts app.
+
+Values are read from the ``ACCOUNTS`` dict in the Django settings, falling
+back to the defaults below, e.g.::
+
+    ACCOUNTS = {"USER_CACHE_SECONDS": 10}
+"""
+
+from django.conf import settings
+
+DEFAULTS = {
+    # How long each process reuses a user resolved from a JWT. 0 disables.
+    "USER_CACHE_SECONDS": 30,
+    # Users each process keeps cached.
+    "USER_CACHE_SIZE": 10000,
+    # Seconds between reads of tokens revoked by other processes into this
+    # process's filter (see revocation.py).
+    "REVOCATION_SYNC_SECONDS": 5,
+    # Revoked tokens the filter is sized for before it is rebuilt larger.
+    "REVOCATION_FILTER_CAPACITY": 100000,
+    # Share of unrevoked tokens the filter sends to the database.
+    "REVOCATION_FILTER_ERROR_RATE": 0.001,
+    # Let views that opt in answer safe requests from the claims signed
+    # into the token at login, without loading the user at all.
+    "TRUST_TOKEN_CLAIMS": False,
+}
+
+
+def get(name):
+    """Return the configured value for ``name``."""
+    return getattr(settings, "ACCOUNTS", {}).get(name, DEFAULTS[name])
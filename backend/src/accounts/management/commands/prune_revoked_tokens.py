@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from accounts import revocation
+
+
+class Command(BaseCommand):
+    help = "Remove revoked refresh tokens that have expired anyway"
+
+    def handle(self, *args, **options):
+        removed = revocation.prune()
+        self.stdout.write(
+            self.style.SUCCESS(f"Removed {removed} expired revoked token(s).")
+        )
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class RevokedToken(models.Model):
+    """
+    A refresh token that may no longer be used, identified by its ``jti``.
+
+    Rows are only needed until the token would have expired anyway;
+    ``prune_revoked_tokens`` removes them after that.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(
+        db_index=True, help_text="When the token expires regardless"
+    )
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Revoked Token"
+        verbose_name_plural = "Revoked Tokens"
+
+    def __str__(self):
+        return self.jti
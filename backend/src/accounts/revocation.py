@@ -0,0 +1,147 @@
+"""
+Revoked refresh tokens, with an in-memory pre-check.
+
+Refreshing rotates the refresh token and revokes the one presented by
+inserting its ``jti`` into ``RevokedToken``. The table's unique constraint
+makes that insert fail for a token that was already used, whichever
+process used it, so a stolen refresh token works at most once.
+
+Before that, ``is_revoked`` asks a per-process Bloom filter of revoked
+``jti`` values, which answers "certainly not revoked" for nearly every
+valid token without a query; only possible hits are checked in the
+database. The filter is built from the table on first use, gains each
+token this process revokes, and picks up rows written by other processes
+every ``REVOCATION_SYNC_SECONDS``. A token revoked elsewhere that the
+filter has not caught up with still fails at the insert.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import conf
+from .models import RevokedToken
+
+
+class AlreadyRevoked(Exception):
+    pass
+
+
+class BloomFilter:
+    """Set membership without false negatives.
+
+    Up to ``capacity`` items, false positives stay near ``error_rate``.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.size = max(8, math.ceil(bits))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def _positions(self, item):
+        # Double hashing: k positions from two independent 64-bit halves.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+
+_lock = threading.Lock()
+_filter = None
+_last_id = 0
+_synced_at = 0.0
+
+# Process-wide counters: "passed" for checks the filter answered alone,
+# "checked" for possible hits looked up, "revoked" for tokens revoked.
+stats = Counter()
+
+
+def is_revoked(jti):
+    """Whether the token with this ``jti`` has been revoked."""
+    _sync()
+    if jti not in _filter:
+        stats["passed"] += 1
+        return False
+    stats["checked"] += 1
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def revoke(jti, expires_at):
+    """Revoke a token. Raises ``AlreadyRevoked`` if it already was."""
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+    except IntegrityError:
+        raise AlreadyRevoked(jti)
+    stats["revoked"] += 1
+    _sync()
+    with _lock:
+        _filter.add(jti)
+
+
+def prune():
+    """Delete revoked tokens that have expired. Returns the number removed.
+
+    Filters keep the pruned values until their next rebuild, which only
+    costs the odd needless lookup.
+    """
+    removed, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return removed
+
+
+def reset():
+    """Drop this process's filter (used by tests)."""
+    global _filter, _last_id, _synced_at
+
+    with _lock:
+        _filter = None
+        _last_id = 0
+        _synced_at = 0.0
+
+
+def _sync():
+    global _filter, _last_id, _synced_at
+
+    now = time.monotonic()
+    interval = conf.get("REVOCATION_SYNC_SECONDS")
+    if _filter is not None and now - _synced_at < interval:
+        return
+    with _lock:
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        if _filter is None or _filter.count >= _filter.capacity:
+            live = rows.count()
+            # Rebuilt with headroom, so growth triggers few rebuilds.
+            fresh = BloomFilter(
+                max(conf.get("REVOCATION_FILTER_CAPACITY"), 2 * live),
+                conf.get("REVOCATION_FILTER_ERROR_RATE"),
+            )
+            _last_id = RevokedToken.objects.aggregate(last=Max("id"))["last"] or 0
+            rows = rows.filter(id__lte=_last_id)
+        else:
+            fresh = _filter
+            rows = RevokedToken.objects.filter(id__gt=_last_id)
+        for pk, jti in rows.order_by("id").values_list("id", "jti").iterator():
+            fresh.add(jti)
+            _last_id = max(_last_id, pk)
+        _filter = fresh
+        _synced_at = now
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from features.models import Feature
+from . import authentication, revocation
+from .models import RevokedToken
+from .tokens import RefreshToken
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    def setUp(self):
+        authentication.reset()
+        self.user = User.objects.create_user(username="reader", password="secret1")
+        response = self.client.post(
+            reverse("login"), {"username": "reader", "password": "secret1"}
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['tokens']['access']}"
+        )
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q["sql"] for q in queries if 'FROM "auth_user"' in q["sql"]]
+
+    def test_user_is_loaded_once(self):
+        """Test that repeated requests reuse the resolved user."""
+        self.assertEqual(len(self.user_queries(reverse("profile"))), 1)
+        self.assertEqual(self.user_queries(reverse("profile")), [])
+
+    def test_profile_update_and_deactivation_invalidate(self):
+        """Test that saving the user drops the cached copy."""
+        self.client.get(reverse("profile"))
+        response = self.client.patch(reverse("profile"), {"first_name": "Ada"})
+        self.assertEqual(response.data["first_name"], "Ada")
+        self.assertEqual(self.client.get(reverse("profile")).data["first_name"], "Ada")
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("profile"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(ACCOUNTS={"TRUST_TOKEN_CLAIMS": True})
+    def test_trusted_claims_skip_the_user_for_reads(self):
+        """Test that opted-in reads use token claims and writes do not."""
+        feature = Feature.objects.create(
+            title="Claimed", author=User.objects.create(username="author")
+        )
+        feature.upvote(self.user)
+
+        self.assertEqual(self.user_queries(reverse("feature-list")), [])
+        response = self.client.get(reverse("feature-list"))
+        self.assertTrue(response.data["results"][0]["has_voted"])
+        self.assertEqual(len(self.user_queries(reverse("profile"))), 1)
+
+        response = self.client.delete(
+            reverse("feature-remove-vote", kwargs={"pk": feature.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.wsgi_request.user, User)
+
+
+class RefreshTokenRevocationTest(APITestCase):
+    def setUp(self):
+        revocation.reset()
+        revocation.stats.clear()
+        User.objects.create_user(username="holder", password="secret1")
+        response = self.client.post(
+            reverse("login"), {"username": "holder", "password": "secret1"}
+        )
+        self.refresh = response.data["tokens"]["refresh"]
+
+    def rotate(self, token):
+        return self.client.post(reverse("token_refresh"), {"refresh": token})
+
+    def test_rotated_token_is_revoked(self):
+        """Test that a refresh token works once and its successor works."""
+        response = self.rotate(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.rotate(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertEqual(
+            self.rotate(response.data["refresh"]).status_code, status.HTTP_200_OK
+        )
+
+    def test_filter_spares_valid_tokens_a_lookup(self):
+        """Test that unrevoked tokens are only written, never looked up."""
+        self.rotate(self.rotate(self.refresh).data["refresh"])  # Build the filter.
+        token = self.rotate(self.refresh).data  # Revoked: looked up, rejected.
+        self.assertNotIn("refresh", token)
+
+        fresh = self.client.post(
+            reverse("login"), {"username": "holder", "password": "secret1"}
+        ).data["tokens"]["refresh"]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.rotate(fresh).status_code, status.HTTP_200_OK)
+        lookups = [
+            q["sql"]
+            for q in queries
+            if 'FROM "accounts_revokedtoken"' in q["sql"]
+        ]
+        self.assertEqual(lookups, [])
+        self.assertGreaterEqual(revocation.stats["checked"], 1)
+
+    @override_settings(ACCOUNTS={"REVOCATION_SYNC_SECONDS": 3600})
+    def test_revocation_elsewhere_is_caught_at_insert(self):
+        """Test that a token revoked by another process cannot be reused."""
+        token = RefreshToken(self.refresh)  # Builds this process's filter.
+        RevokedToken.objects.create(
+            jti=token["jti"], expires_at=timezone.now() + timedelta(days=1)
+        )
+        self.assertFalse(revocation.is_revoked(token["jti"]))  # Not synced yet.
+        response = self.rotate(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_removes_expired_tokens(self):
+        """Test that prune_revoked_tokens keeps unexpired revocations."""
+        self.rotate(self.refresh)
+        RevokedToken.objects.create(
+            jti="expired", expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        out = StringIO()
+        call_command("prune_revoked_tokens", stdout=out)
+        self.assertIn("Removed 1", out.getvalue())
+        self.assertEqual(RevokedToken.objects.count(), 1)
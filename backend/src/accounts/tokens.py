@@ -0,0 +1,26 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from . import revocation
+
+
+class RefreshToken(tokens.RefreshToken):
+    """A refresh token checked against and revoked through ``revocation``."""
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if revocation.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        """Revoke this token; raises ``TokenError`` if it already was."""
+        try:
+            revocation.revoke(
+                self.payload[api_settings.JTI_CLAIM],
+                datetime_from_epoch(self.payload["exp"]),
+            )
+        except revocation.AlreadyRevoked:
+            raise TokenError(_("Token is blacklisted"))
@@ -2,9 +2,9 @@ from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from drf_spectacular.utils import extend_schema
 from django.contrib.auth.models import User
+from .authentication import tokens_for
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -50,16 +50,10 @@ def register(request):
     if serializer.is_valid():
         user = serializer.save()
 
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
-
         return Response(
             {
                 "user": UserProfileSerializer(user).data,
-                "tokens": {
-                    "refresh": str(refresh),
-                    "access": str(refresh.access_token),
-                },
+                "tokens": tokens_for(user),
             },
             status=status.HTTP_201_CREATED,
         )
@@ -105,16 +99,11 @@ def login(request):
     if serializer.is_valid():
         user = serializer.validated_data["user"]
 
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
-
+        # Generate JWT tokens, signing in the claims trusted for reads
         return Response(
             {
                 "user": UserProfileSerializer(user).data,
-                "tokens": {
-                    "refresh": str(refresh),
-                    "access": str(refresh.access_token),
-                },
+                "tokens": tokens_for(user),
             }
         )
 
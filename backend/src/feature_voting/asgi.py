@@ -2,6 +2,10 @@
 ASGI config for feature_voting project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn feature_voting.asgi:application``)
+so the live vote stream at ``/api/features/stream/`` runs on the event loop.
+Requests are resolved against ``feature_voting.asgi_urls``, which serves the
+feature list, detail, upvote and remove_vote routes with async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -9,8 +13,27 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "feature_voting.settings")
 
-application = get_asgi_application()
+
+class FeatureVotingASGIHandler(ASGIHandler):
+    """ASGI handler resolving requests against the async URL configuration."""
+
+    urlconf = "feature_voting.asgi_urls"
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = FeatureVotingASGIHandler()
+
+from features import leaderboard  # noqa: E402  (needs the app registry)
+
+leaderboard.start()
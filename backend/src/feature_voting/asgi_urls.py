@@ -0,0 +1,12 @@
+"""
+URL configuration used under ASGI (see ``feature_voting.asgi``).
+
+The async feature views take the routes they implement; everything else
+resolves exactly as in ``feature_voting.urls``.
+"""
+
+from features.urls import async_urlpatterns
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = async_urlpatterns + sync_urlpatterns
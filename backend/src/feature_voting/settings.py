@@ -46,10 +46,12 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "features",
     "accounts",
+    "monitoring",
 ]
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "monitoring.middleware.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -102,6 +104,26 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Set CACHE_DIR to share the cache between worker processes on one host
+# (needed by FEATURE_VOTING["RESPONSE_CACHE"] with several workers)
+CACHE_DIR = config("CACHE_DIR", default=None)
+
+if CACHE_DIR:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -150,7 +172,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -190,4 +212,43 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    # Revokes rotated refresh tokens through accounts.revocation
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.TokenRefreshSerializer",
+}
+
+# Accounts settings; see accounts/conf.py for the available options
+ACCOUNTS = {
+    # Answer feature reads from signed token claims without loading the user
+    "TRUST_TOKEN_CLAIMS": False,
+}
+
+# Feature voting settings; see features/conf.py for the available options
+FEATURE_VOTING = {
+    # Promote a feature to sharded vote counters above this many votes/second
+    "SHARD_PROMOTION_RATE": None,
+}
+
+# Monitoring settings; see monitoring/conf.py for the available options
+MONITORING = {
+    # "raise" turns likely N+1 queries into request errors (set it in CI)
+    "N_PLUS_ONE": config("N_PLUS_ONE", default="log"),
+    # Query counts and timings in a Server-Timing header on every response
+    "SERVER_TIMING": config("SERVER_TIMING", default=DEBUG, cast=bool),
+    # Shared by the workers of one host so /metrics covers all of them
+    "METRICS_DIR": config("METRICS_DIR", default=None),
+    # Required by /metrics as a Bearer token when set
+    "METRICS_TOKEN": config("METRICS_TOKEN", default=None),
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        # INFO adds a line with query counts and timings for every request
+        "monitoring": {
+            "handlers": ["console"],
+            "level": config("MONITORING_LOG_LEVEL", default="WARNING"),
+        },
+    },
 }
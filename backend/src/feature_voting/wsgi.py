@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "feature_voting.settings")
 
 application = get_wsgi_application()
+
+from features import leaderboard  # noqa: E402  (needs the app registry)
+
+leaderboard.start()
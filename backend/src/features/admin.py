@@ -1,8 +1,9 @@
 from django.contrib import admin
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Feature
+from . import rollups, search, voting
+from .models import Feature, VoteRollup
 
 
 class VotesFilter(admin.SimpleListFilter):
@@ -20,13 +21,13 @@ class VotesFilter(admin.SimpleListFilter):
     def queryset(self, request, queryset):
         value = self.value()
         if value == "0":
-            return queryset.filter(votes=0)
+            return queryset.filter(vote_count=0)
         elif value == "1-4":
-            return queryset.filter(votes__gte=1, votes__lte=4)
+            return queryset.filter(vote_count__gte=1, vote_count__lte=4)
         elif value == "5-9":
-            return queryset.filter(votes__gte=5, votes__lte=9)
+            return queryset.filter(vote_count__gte=5, vote_count__lte=9)
         elif value == "10+":
-            return queryset.filter(votes__gte=10)
+            return queryset.filter(vote_count__gte=10)
         return queryset
 
 
@@ -53,19 +54,22 @@ class FeatureAdmin(admin.ModelAdmin):
         VotesFilter,
     ]
 
-    # Search functionality
+    # Search functionality (served by the full-text index, see search.py)
     search_fields = ["title", "description"]
 
     # Ordering
     # ordering = ["-votes", "-created_at"]
 
     # Read-only fields
-    readonly_fields = ["id", "votes", "created_at", "updated_at", "votes_chart"]
+    readonly_fields = ["id", "vote_count", "created_at", "updated_at", "votes_chart"]
 
     # Fieldsets for organized form layout
     fieldsets = (
         ("Feature Information", {"fields": ("title", "description")}),
-        ("Statistics", {"fields": ("votes", "votes_chart"), "classes": ("collapse",)}),
+        (
+            "Statistics",
+            {"fields": ("vote_count", "votes_chart"), "classes": ("collapse",)},
+        ),
         (
             "Metadata",
             {"fields": ("id", "created_at", "updated_at"), "classes": ("collapse",)},
@@ -73,7 +77,13 @@ class FeatureAdmin(admin.ModelAdmin):
     )
 
     # Actions
-    actions = ["reset_votes", "add_vote", "feature_popular"]
+    actions = ["reset_votes"]
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the full-text index instead of LIKE scans."""
+        if not search_term.strip():
+            return queryset, False
+        return search.matching(queryset, search_term), False
 
     def title_with_link(self, obj):
         """Display title with link to detail view."""
@@ -114,6 +124,7 @@ class FeatureAdmin(admin.ModelAdmin):
         )
 
     votes_badge.short_description = "Votes"
+    votes_badge.admin_order_field = "vote_count"
 
     def created_at_formatted(self, obj):
         """Format creation date nicely."""
@@ -141,57 +152,54 @@ class FeatureAdmin(admin.ModelAdmin):
     quick_actions.short_description = "Actions"
 
     def votes_chart(self, obj):
-        """Simple visual representation of votes."""
-        vote_count = obj.vote_count
-        if vote_count == 0:
+        """Daily votes over the last two weeks of activity, from the rollups."""
+        points = rollups.series(obj.pk, VoteRollup.DAY)[-14:]
+        if not points:
             return "No votes yet"
 
         # Create a simple bar chart using HTML/CSS
-        max_width = 200
-        bar_width = min(vote_count * 10, max_width)
-
+        max_height = 40
+        peak = max(abs(votes) for _, votes, _ in points) or 1
+        bars = format_html_join(
+            "",
+            '<div title="{}: {} votes" style="background: linear-gradient(0deg, '
+            '#007cba, #28a745); width: 12px; height: {}px; border-radius: 3px;">'
+            "</div>",
+            (
+                (
+                    start.strftime("%b %d"),
+                    f"{votes:+d}",
+                    max(2, max_height * max(votes, 0) // peak),
+                )
+                for start, votes, _ in points
+            ),
+        )
         return format_html(
-            '<div style="background: #e9ecef; width: {}px; height: 20px; border-radius: 10px;">'
-            '<div style="background: linear-gradient(90deg, #007cba, #28a745); '
-            "width: {}px; height: 20px; border-radius: 10px; display: flex; "
-            'align-items: center; justify-content: center; color: white; font-size: 11px;">'
-            "{} votes</div></div>",
-            max_width,
-            bar_width,
-            vote_count,
+            '<div style="display: flex; align-items: flex-end; gap: 3px; '
+            'height: {}px;">{}</div>'
+            '<div style="color: #6c757d; font-size: 11px;">'
+            "{} votes, daily since {}</div>",
+            max_height,
+            bars,
+            points[-1][2],
+            points[0][0].strftime("%b %d, %Y"),
         )
 
     votes_chart.short_description = "Vote Visualization"
 
     # Custom actions
     def reset_votes(self, request, queryset):
-        """Reset votes to 0 for selected features."""
-        updated = queryset.update(votes=0)
+        """Delete every vote on the selected features."""
+        feature_ids = list(queryset.values_list("pk", flat=True))
+        deleted = voting.clear_votes(feature_ids)
         self.message_user(
-            request, f"Successfully reset votes for {updated} feature(s)."
+            request,
+            f"Successfully removed {deleted} vote(s) from {len(feature_ids)} "
+            "feature(s).",
         )
 
     reset_votes.short_description = "Reset votes to 0"
 
-    def add_vote(self, request, queryset):
-        """Add one vote to selected features."""
-        for feature in queryset:
-            feature.upvote()
-        self.message_user(
-            request, f"Successfully added 1 vote to {queryset.count()} feature(s)."
-        )
-
-    add_vote.short_description = "Add 1 vote to selected features"
-
-    def feature_popular(self, request, queryset):
-        """Mark features as popular (set votes to 10)."""
-        updated = queryset.update(votes=10)
-        self.message_user(
-            request, f"Successfully marked {updated} feature(s) as popular."
-        )
-
-    feature_popular.short_description = "Mark as popular (10 votes)"
-
     class Media:
         """Add custom CSS and JavaScript."""
 
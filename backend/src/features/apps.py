@@ -1,6 +1,29 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class FeaturesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "features"
+
+    def ready(self):
+        from monitoring import metrics
+
+        # Connect the leaderboard's, live stream's, similarity index's,
+        # response cache's and search index's signal receivers.
+        from . import leaderboard, live, responsecache, similarity  # noqa: F401
+        from . import search, voting
+
+        post_migrate.connect(search.create_index_after_migrate, sender=self)
+        metrics.expose(
+            "vote_events_total",
+            "Vote lock retries and votes that lost to an existing row",
+            voting.stats,
+            "event",
+        )
+        metrics.expose(
+            "response_cache_lookups_total",
+            "Response cache hits, misses and waits for another worker's rebuild",
+            responsecache.stats,
+            "result",
+        )
@@ -0,0 +1,144 @@
+"""
+Async implementations of the busiest feature endpoints.
+
+Under ASGI (``feature_voting.asgi``) the feature list, detail, upvote and
+remove_vote routes are served by these views instead of the sync
+``FeatureViewSet``. They run the viewset's own authentication, permission,
+filtering, serialization and ETag code, so responses are identical, but
+read features with the async ORM and pass the remaining blocking steps
+(authentication, vote writes, serialization) to a worker thread one at a
+time, instead of holding a thread for the whole request. Methods they do
+not implement, such as POST on the list, are handed to the sync viewset,
+as are reads while the response cache is on.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+
+from . import etags, responsecache
+from .views import FeatureViewSet
+
+
+async def _list(view):
+    request = view.request
+    if responsecache.enabled():
+        # Cache reads, and waits for another worker's build, block.
+        return await sync_to_async(view.list)(request)
+    queryset = view.filter_queryset(view.get_queryset())
+    if request.headers.get("If-None-Match"):
+        stamps = await view.pagination_class().apaginate_queryset(
+            queryset.only(*etags.STAMP_FIELDS), request, view=view
+        )
+        etag = await sync_to_async(etags.compute)(request, stamps)
+        if etags.matches(request, etag):
+            return view.not_modified(etag)
+
+    page = await view.paginator.apaginate_queryset(
+        view.page_rows(queryset), request, view=view
+    )
+    return await sync_to_async(view.page_response)(page)
+
+
+async def _retrieve(view):
+    request, pk = view.request, view.kwargs["pk"]
+    if responsecache.enabled():
+        return await sync_to_async(view.retrieve)(request, pk=pk)
+    if request.headers.get("If-None-Match"):
+        stamp = await _aget_or_404(view.get_queryset().only(*etags.STAMP_FIELDS), pk)
+        etag = await sync_to_async(etags.compute)(request, [stamp])
+        if etags.matches(request, etag):
+            return view.not_modified(etag)
+
+    instance = await _aget_or_404(view.filter_queryset(view.get_queryset()), pk)
+    view.check_object_permissions(request, instance)
+    return await sync_to_async(view.instance_response)(instance)
+
+
+async def _upvote(view):
+    engine = view.get_vote_engine()
+    result = await sync_to_async(engine.cast_vote)(
+        view.kwargs["pk"], view.request.user.pk
+    )
+    return view.upvote_response(result)
+
+
+async def _remove_vote(view):
+    engine = view.get_vote_engine()
+    result = await sync_to_async(engine.retract_vote)(
+        view.kwargs["pk"], view.request.user.pk
+    )
+    return view.remove_vote_response(result)
+
+
+async def _aget_or_404(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+        raise Http404
+
+
+async def _dispatch(request, action, handler, kwargs):
+    """Run ``handler`` the way ``APIView.dispatch`` runs a sync action."""
+    view = FeatureViewSet(**getattr(getattr(FeatureViewSet, action), "kwargs", {}))
+    view.action_map = {request.method.lower(): action}
+    view.args, view.kwargs = (), kwargs
+    view.request = view.initialize_request(request, **kwargs)
+    view.headers = view.default_response_headers
+    try:
+        # Authentication may query the database; the rest is in memory.
+        await sync_to_async(view.initial)(view.request, **kwargs)
+        response = await handler(view)
+    except Exception as exc:
+        response = view.handle_exception(exc)
+    response = view.finalize_response(view.request, response, **kwargs)
+    return response.render()
+
+
+def _route(actions, handlers, detail):
+    """Build a view running ``handlers`` natively and other methods in sync.
+
+    ``actions`` maps methods to viewset actions as in a router; ``handlers``
+    maps the methods served natively to coroutines.
+    """
+    served = next(iter(handlers))
+    sync_view = FeatureViewSet.as_view(
+        actions,
+        basename="feature",
+        detail=detail,
+        **getattr(getattr(FeatureViewSet, actions[served]), "kwargs", {}),
+    )
+
+    async def view(request, **kwargs):
+        method = request.method.lower()
+        if method not in handlers:
+            return await sync_to_async(sync_view)(request, **kwargs)
+        action = actions.get(method, actions[served])
+        return await _dispatch(request, action, handlers[method], kwargs)
+
+    # DRF authentication enforces CSRF for session users itself, as with
+    # ``APIView.as_view``. (``csrf_exempt`` would hide that this is async.)
+    view.csrf_exempt = True
+    # Described like ``ViewSetMixin.as_view`` does, so per-view metrics label
+    # requests the same under WSGI and ASGI.
+    view.cls, view.actions = FeatureViewSet, actions
+    return view
+
+
+feature_list = _route(
+    {"get": "list", "post": "create"}, {"get": _list, "head": _list}, detail=False
+)
+feature_detail = _route(
+    {
+        "get": "retrieve",
+        "put": "update",
+        "patch": "partial_update",
+        "delete": "destroy",
+    },
+    {"get": _retrieve, "head": _retrieve},
+    detail=True,
+)
+feature_upvote = _route({"post": "upvote"}, {"post": _upvote}, detail=True)
+feature_remove_vote = _route(
+    {"delete": "remove_vote"}, {"delete": _remove_vote}, detail=True
+)
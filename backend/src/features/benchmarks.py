@@ -0,0 +1,670 @@
+"""
+Benchmark scenarios for the features app.
+
+Each scenario runs against a throwaway test database (created and destroyed
+by ``benchmark_database``) so it never touches real data. Scenarios are
+registered in ``SCENARIOS`` and run with::
+
+    python manage.py benchmark <scenario> [--threads N] [--operations N]
+
+Scenarios that return a ``{size: {path: summary}}`` tree (see ``summarize``)
+can save it with ``--json`` and be checked against an earlier run with
+``--baseline``, which fails on regressions (see ``compare``).
+"""
+
+import asyncio
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import wsgiref.util
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.models import Q
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from . import conf, counters, voting
+from .models import Feature, Vote
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    """Register ``func`` as a benchmark scenario under its name."""
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+@contextmanager
+def benchmark_database():
+    """Create a disposable test database for the duration of the block.
+
+    SQLite test databases default to shared-cache in-memory databases whose
+    table locks fail immediately instead of waiting, which says nothing about
+    a real deployment; benchmarks use a temporary file instead. Server-Timing
+    headers are switched on so requests are measured with them, as in CI.
+    """
+    monitoring = {**getattr(settings, "MONITORING", {}), "SERVER_TIMING": True}
+    with override_settings(MONITORING=monitoring):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for alias in connections:
+                settings_dict = connections[alias].settings_dict
+                if settings_dict["ENGINE"].endswith("sqlite3"):
+                    settings_dict["TEST"]["NAME"] = os.path.join(tmpdir, f"{alias}.db")
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                yield
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+
+def create_users(count, prefix="bench"):
+    """Bulk-create ``count`` users without password hashing."""
+    User.objects.bulk_create(
+        [User(username=f"{prefix}{i}") for i in range(count)], batch_size=1000
+    )
+    return list(
+        User.objects.filter(username__startswith=prefix)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def run_parallel(func, items, threads):
+    """Call ``func(item)`` for every item across ``threads`` threads.
+
+    Returns the elapsed wall-clock time in seconds.
+    """
+    chunks = [items[i::threads] for i in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(chunk):
+        barrier.wait()
+        try:
+            for item in chunk:
+                func(item)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker, args=(c,)) for c in chunks]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started
+
+
+@scenario
+def sharding(options, stdout):
+    """Concurrent upvotes on a single feature, with and without sharding."""
+    votes = options["operations"]
+    threads = options["threads"]
+    author = User.objects.create(username="bench-author")
+    voters = create_users(votes)
+
+    stdout.write(
+        f"{votes} upvotes on one feature from {threads} threads "
+        f"({connection.vendor})"
+    )
+    for sharded in (False, True):
+        feature = Feature.objects.create(title="Viral feature", author=author)
+        if sharded:
+            counters.promote(feature.pk)
+        retries_before = voting.stats["retries"]
+
+        elapsed = run_parallel(
+            lambda user_id: voting.cast_vote(feature.pk, user_id), voters, threads
+        )
+
+        feature.refresh_from_db()
+        label = "sharded" if sharded else "unsharded"
+        stdout.write(
+            f"  {label:>9}: {votes / elapsed:8.0f} votes/s "
+            f"({elapsed:.2f}s, {voting.stats['retries'] - retries_before} retries, "
+            f"count={counters.total(feature)})"
+        )
+
+
+@scenario
+def bulk_vote(options, stdout):
+    """Voters picking several features: one cast_vote each vs one bulk_vote."""
+    picks = 10
+    threads = options["threads"]
+    voters = options["operations"] // picks
+    author = User.objects.create(username="bulk-author")
+
+    stdout.write(
+        f"{voters} voters x {picks} features from {threads} threads "
+        f"({connection.vendor})"
+    )
+    for bulk in (False, True):
+        label = "bulk" if bulk else "single"
+        users = create_users(voters, prefix=f"bulk-{label}-")
+        features = Feature.objects.bulk_create(
+            [Feature(title=f"Pick {i}", author=author) for i in range(picks)]
+        )
+        feature_ids = [feature.pk for feature in features]
+
+        if bulk:
+
+            def vote(user_id):
+                voting.bulk_vote(user_id, feature_ids)
+
+        else:
+
+            def vote(user_id):
+                for feature_id in feature_ids:
+                    voting.cast_vote(feature_id, user_id)
+
+        elapsed = run_parallel(vote, users, threads)
+        stdout.write(
+            f"  {label:>6}: {voters * picks / elapsed:8.0f} votes/s "
+            f"({voters / elapsed:.0f} voters/s, {elapsed:.2f}s, "
+            f"total={sum(counters.totals(feature_ids).values())})"
+        )
+
+
+_WORDS = (
+    "dark mode export import sync offline search filter sort share notify "
+    "calendar report chart widget theme login profile avatar upload backup "
+    "restore archive tag label comment mention reminder schedule language "
+    "keyboard shortcut accessibility integration webhook api token invoice"
+).split()
+# Compound words make a vocabulary large enough for selective queries.
+_VOCABULARY = [f"{a}{b}" for a in _WORDS for b in _WORDS if a != b]
+
+
+@scenario
+def search(options, stdout):
+    """Full-text search against a table of ``--operations`` features."""
+    from . import search as feature_search
+
+    count = options["operations"]
+    rng = random.Random(0)
+    author = User.objects.create(username="search-author")
+    for start in range(0, count, 5000):
+        Feature.objects.bulk_create(
+            [
+                Feature(
+                    title=" ".join(rng.sample(_VOCABULARY, 3)),
+                    description=" ".join(rng.sample(_VOCABULARY, 12)),
+                    author=author,
+                )
+                for _ in range(start, min(start + 5000, count))
+            ]
+        )
+    Feature.objects.bulk_create(
+        [Feature(title=f"Zeppelin tracker {i}", author=author) for i in range(3)]
+    )
+    started = time.perf_counter()
+    feature_search.ensure_index()
+    feature_search.rebuild()
+    stdout.write(
+        f"{count} features ({connection.vendor}), "
+        f"indexed in {time.perf_counter() - started:.2f}s"
+    )
+
+    queryset = Feature.objects.order_by("-vote_count", "-created_at", "-id")
+    for label, build in (
+        (
+            "icontains",
+            lambda q: queryset.filter(
+                Q(title__icontains=q) | Q(description__icontains=q)
+            ),
+        ),
+        ("full-text", lambda q: feature_search.matching(queryset, q)),
+    ):
+        timings = []
+        # A term in ~1% of features, one in three, and one in none.
+        for query in ("darkmode", "zeppelin", "nosuchterm"):
+            started = time.perf_counter()
+            list(build(query)[:20])
+            timings.append(time.perf_counter() - started)
+        stdout.write(
+            f"  {label:>9}: {1000 * sum(timings) / len(timings):8.2f} ms "
+            "per first page (mean of 3 queries)"
+        )
+
+
+@scenario
+def similar(options, stdout):
+    """Duplicate lookup against ``--operations`` titles: full scan vs LSH index."""
+    from . import similarity
+
+    count = options["operations"]
+    rng = random.Random(0)
+    author = User.objects.create(username="similar-author")
+    for start in range(0, count, 5000):
+        Feature.objects.bulk_create(
+            [
+                Feature(title=" ".join(rng.sample(_VOCABULARY, 3)), author=author)
+                for _ in range(start, min(start + 5000, count))
+            ]
+        )
+    started = time.perf_counter()
+    similarity.rebuild()
+    stdout.write(
+        f"{count} features ({connection.vendor}), "
+        f"indexed in {time.perf_counter() - started:.2f}s"
+    )
+
+    threshold = conf.get("DUPLICATE_SIMILARITY")
+    # Existing titles with their words reordered stand in for duplicates.
+    queries = [
+        " ".join(reversed(title.split()))
+        for title in Feature.objects.order_by("?").values_list("title", flat=True)[:5]
+    ]
+
+    def scan(query):
+        shingles = similarity.shingles(query)
+        return [
+            pk
+            for pk, title in Feature.objects.values_list("pk", "title").iterator()
+            if similarity.jaccard(shingles, similarity.shingles(title)) >= threshold
+        ]
+
+    for label, lookup in (
+        ("full scan", scan),
+        ("lsh index", similarity.similar),
+    ):
+        started = time.perf_counter()
+        for query in queries:
+            lookup(query)
+        elapsed = (time.perf_counter() - started) / len(queries)
+        stdout.write(f"  {label:>9}: {1000 * elapsed:8.2f} ms per lookup")
+
+
+def wsgi_call(app, method, path, headers):
+    """Send one bodiless request straight to a WSGI app; return its status."""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "wsgi.input": io.BytesIO(),
+        **{f"HTTP_{name.upper().replace('-', '_')}": v for name, v in headers},
+    }
+    wsgiref.util.setup_testing_defaults(environ)
+    statuses = []
+    body = app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b"".join(body)
+    body.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_call(app, method, path, headers):
+    """Send one bodiless request straight to an ASGI app; return its status."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")]
+        + [(name.lower().encode(), v.encode()) for name, v in headers],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 0),
+    }
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await app(scope, receive, send)
+    return statuses[0]
+
+
+def _report(stdout, label, latencies, elapsed, failures):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95)]
+    stdout.write(
+        f"  {label:>13}: {len(latencies) / elapsed:7.0f} req/s, "
+        f"p50 {1000 * p50:6.1f} ms, p95 {1000 * p95:6.1f} ms"
+        + (f", {failures} failed" if failures else "")
+    )
+
+
+@scenario
+def asgi(options, stdout):
+    """Feature list reads and upvotes: sync views under WSGI vs async under ASGI.
+
+    Both servers take ``--threads`` concurrent clients; WSGI runs a thread per
+    client, ASGI one event loop.
+    """
+    from django.core.wsgi import get_wsgi_application
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from feature_voting.asgi import application as asgi_app
+
+    wsgi_app = get_wsgi_application()
+    clients = options["threads"]
+    requests = options["operations"]
+    author = User.objects.create(username="asgi-author")
+    Feature.objects.bulk_create(
+        [Feature(title=f"Listed {i}", author=author) for i in range(200)]
+    )
+    stdout.write(
+        f"{requests} requests per run from {clients} concurrent clients "
+        f"({connection.vendor})"
+    )
+
+    for server in ("wsgi", "asgi"):
+        targets = list(
+            Feature.objects.bulk_create(
+                [Feature(title=f"Target {i}", author=author) for i in range(20)]
+            )
+        )
+        voters = User.objects.filter(
+            pk__in=create_users(requests // len(targets) + 1, prefix=f"{server}-voter")
+        )
+        tokens = [str(AccessToken.for_user(user)) for user in voters]
+        calls = {
+            "list": [("GET", "/api/features/", ())] * requests,
+            "upvote": [
+                (
+                    "POST",
+                    f"/api/features/{targets[i % len(targets)].pk}/upvote/",
+                    (("Authorization", f"Bearer {tokens[i // len(targets)]}"),),
+                )
+                for i in range(requests)
+            ],
+        }
+        for name, batch in calls.items():
+            latencies, failures = [], 0
+
+            if server == "wsgi":
+
+                def call(request):
+                    nonlocal failures
+                    started = time.perf_counter()
+                    if wsgi_call(wsgi_app, *request) >= 400:
+                        failures += 1
+                    latencies.append(time.perf_counter() - started)
+
+                elapsed = run_parallel(call, batch, clients)
+            else:
+
+                async def run():
+                    pending = iter(batch)
+
+                    async def client():
+                        nonlocal failures
+                        for request in pending:
+                            started = time.perf_counter()
+                            if await asgi_call(asgi_app, *request) >= 400:
+                                failures += 1
+                            latencies.append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    await asyncio.gather(*(client() for _ in range(clients)))
+                    return time.perf_counter() - started
+
+                elapsed = asyncio.run(run())
+            _report(stdout, f"{server} {name}", latencies, elapsed, failures)
+
+
+@scenario
+def fast_list(options, stdout):
+    """Feature list pages through FeatureSerializer vs the fast list path."""
+    from django.test import Client, override_settings
+
+    pages = max(1, options["operations"] // 100)
+    author = User.objects.create(username="list-author", first_name="Ada")
+    Feature.objects.bulk_create(
+        [
+            Feature(title=f"Listed feature {i}", description="x" * 200, author=author)
+            for i in range(1000)
+        ]
+    )
+    client = Client()
+    client.force_login(User.objects.create(username="list-reader"))
+    stdout.write(f"{pages} list pages of 100 features, signed in ({connection.vendor})")
+
+    bodies = {}
+    for fast in (False, True):
+        with override_settings(FEATURE_VOTING={"FAST_FEATURE_LIST": fast}):
+            started = time.perf_counter()
+            for _ in range(pages):
+                response = client.get("/api/features/", {"page_size": 100})
+            elapsed = time.perf_counter() - started
+        label = "fast" if fast else "serializer"
+        bodies[label] = response.content
+        stdout.write(f"  {label:>10}: {1000 * elapsed / pages:7.2f} ms per page")
+    stdout.write(f"  identical output: {bodies['fast'] == bodies['serializer']}")
+
+
+@scenario
+def response_cache(options, stdout):
+    """Feature list reads with a vote every 20th request, uncached vs cached."""
+    from django.core.cache import cache
+    from django.test import Client, override_settings
+
+    from . import responsecache
+
+    requests = options["operations"]
+    author = User.objects.create(username="cached-author")
+    features = Feature.objects.bulk_create(
+        [
+            Feature(title=f"Cached feature {i}", description="x" * 200, author=author)
+            for i in range(1000)
+        ]
+    )
+    voters = User.objects.bulk_create(
+        [User(username=f"cached-voter-{i}") for i in range(requests // 20 + 1)]
+    )
+    stdout.write(f"{requests} list page reads of 20 features ({connection.vendor})")
+
+    for cached in (False, True):
+        cache.clear()
+        responsecache.stats.clear()
+        with override_settings(FEATURE_VOTING={"RESPONSE_CACHE": cached}):
+            for signed_in in (False, True):
+                Vote.objects.all().delete()
+                Feature.objects.update(vote_count=0)
+                client = Client()
+                if signed_in:
+                    client.force_login(voters[0])
+                started = time.perf_counter()
+                for i in range(requests):
+                    if i % 20 == 0:
+                        voting.cast_vote(features[i % 1000].pk, voters[i // 20].pk)
+                    client.get("/api/features/")
+                elapsed = time.perf_counter() - started
+                label = f"{'cached' if cached else 'uncached'}, " + (
+                    "signed in" if signed_in else "anonymous"
+                )
+                stdout.write(
+                    f"  {label:>21}: {1000 * elapsed / requests:7.2f} ms per read"
+                )
+        if cached:
+            stdout.write(f"  cache: {dict(responsecache.stats)}")
+
+
+# Password hashing makes each login and register call take a few hundred
+# milliseconds; these endpoints are sampled at most this many times a repeat.
+HASHING_SAMPLES = 20
+# A path's latency is only compared against a baseline when both runs took
+# at least this many samples, over all repeats; fewer is mostly noise.
+MIN_GATED_SAMPLES = 100
+# Slowdowns of less than this many milliseconds never count as regressions,
+# whatever the threshold.
+REGRESSION_FLOOR_MS = 1.0
+
+
+def summarize(latencies, queries):
+    """Percentiles (in ms) and typical query count for one measured path.
+
+    The median query count leaves out one-off work such as filling caches
+    on the first request, so it does not depend on the number of samples.
+    """
+    latencies = sorted(latencies)
+
+    def percentile(fraction):
+        index = min(len(latencies) - 1, int(len(latencies) * fraction))
+        return round(1000 * latencies[index], 3)
+
+    return {
+        "samples": len(latencies),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "queries": sorted(queries)[len(queries) // 2],
+    }
+
+
+def combine(summaries):
+    """One summary from those of several repeats: the median of each value,
+    and their samples added up."""
+
+    def median(key):
+        values = sorted(summary[key] for summary in summaries)
+        return values[len(values) // 2]
+
+    return {
+        "samples": sum(summary["samples"] for summary in summaries),
+        "repeats": len(summaries),
+        **{key: median(key) for key in ("p50", "p95", "p99", "queries")},
+    }
+
+
+def compare(baseline, current, threshold):
+    """Return descriptions of paths that regressed against ``baseline``.
+
+    Both are ``{scenario: {size: {path: summary}}}`` result trees. A path
+    regresses when it makes more queries, or when its p95 grows by more
+    than ``threshold`` percent and by at least ``REGRESSION_FLOOR_MS``;
+    latency is only compared when both sides have ``MIN_GATED_SAMPLES``.
+    Paths missing from either side are skipped.
+    """
+    regressions = []
+    for name, sizes in current.items():
+        for size, paths in sizes.items():
+            for path, now in paths.items():
+                before = baseline.get(name, {}).get(size, {}).get(path)
+                if before is None:
+                    continue
+                label = f"{name} {size} {path}"
+                gated = min(now["samples"], before["samples"]) >= MIN_GATED_SAMPLES
+                allowed = max(REGRESSION_FLOOR_MS, before["p95"] * threshold / 100)
+                if gated and now["p95"] - before["p95"] > allowed:
+                    regressions.append(
+                        f"{label}: p95 {before['p95']:.1f} -> {now['p95']:.1f} ms"
+                    )
+                if now["queries"] > before["queries"]:
+                    regressions.append(
+                        f"{label}: {before['queries']} -> {now['queries']} queries"
+                    )
+    return regressions
+
+
+@scenario
+def hot_paths(options, stdout):
+    """Latency and queries of the main endpoints at each of ``--sizes``.
+
+    Each size is a feature count; the database grows to it with
+    ``synthetic.generate`` (as many users, twenty votes per feature) before
+    list, retrieve, upvote, remove_vote, login and register are timed one
+    request at a time through the full middleware and JWT stack. All paths
+    are measured ``--repeats`` times in turn and each summary value is the
+    median over the repeats, so one slow stretch does not skew the result.
+    """
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    from accounts.authentication import tokens_for
+
+    from . import synthetic
+
+    operations = options["operations"]
+    repeats = options["repeats"]
+    results = {}
+    existing = 0
+    for size in sorted(options["sizes"]):
+        added = size - existing
+        synthetic.generate(added, added, 20 * added, report=lambda line: None)
+        existing = size
+        features = list(
+            Feature.objects.order_by("?").values_list("pk", flat=True)[:operations]
+        )
+        voters = User.objects.filter(
+            pk__in=create_users(
+                repeats * operations // len(features) + 1, prefix=f"hot-voter-{size}-"
+            )
+        )
+        tokens = [tokens_for(voter)["access"] for voter in voters]
+        login_user = User.objects.filter(username__startswith="loaduser").first()
+        client = Client()
+
+        def bearer(i):
+            return {"HTTP_AUTHORIZATION": f"Bearer {tokens[i // len(features)]}"}
+
+        calls = {
+            "list": lambda i: client.get("/api/features/", **bearer(0)),
+            "retrieve": lambda i: client.get(
+                f"/api/features/{features[i % len(features)]}/", **bearer(0)
+            ),
+            "upvote": lambda i: client.post(
+                f"/api/features/{features[i % len(features)]}/upvote/", **bearer(i)
+            ),
+            "remove_vote": lambda i: client.delete(
+                f"/api/features/{features[i % len(features)]}/remove_vote/",
+                **bearer(i),
+            ),
+            "login": lambda i: client.post(
+                "/api/auth/login/",
+                {"username": login_user.username, "password": "loadtest"},
+            ),
+            "register": lambda i: client.post(
+                "/api/auth/register/",
+                {
+                    "username": f"hot-new-{size}-{i}",
+                    "password": "benchmark-pw",
+                    "password_confirm": "benchmark-pw",
+                },
+            ),
+        }
+        stdout.write(
+            f"{size:,} features, {Vote.objects.count():,} votes ({connection.vendor})"
+        )
+        rounds = {path: [] for path in calls}
+        failures = Counter()
+        for repeat in range(repeats):
+            for path, call in calls.items():
+                samples = operations
+                if path in ("login", "register"):
+                    samples = min(samples, HASHING_SAMPLES)
+                latencies, queries = [], []
+                # Each repeat votes as other users and registers new names.
+                for i in range(repeat * samples, (repeat + 1) * samples):
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        response = call(i)
+                        latencies.append(time.perf_counter() - started)
+                    queries.append(len(captured))
+                    if response.status_code >= 400:
+                        failures[path] += 1
+                rounds[path].append(summarize(latencies, queries))
+        results[str(size)] = {}
+        for path, summaries in rounds.items():
+            summary = results[str(size)][path] = combine(summaries)
+            stdout.write(
+                f"  {path:>11}: p50 {summary['p50']:7.2f} ms, "
+                f"p95 {summary['p95']:7.2f} ms, p99 {summary['p99']:7.2f} ms, "
+                f"{summary['queries']} queries"
+                + (f", {failures[path]} failed" if failures[path] else "")
+            )
+    return results
@@ -0,0 +1,342 @@
+"""
+Write-behind vote buffer.
+
+When ``FEATURE_VOTING["VOTE_BUFFER"]`` is enabled, ``FeatureViewSet``
+acknowledges upvotes and vote removals after a single validating read and
+queues them in this process. A background thread persists the queue with
+``Vote.objects.bulk_create(ignore_conflicts=True)`` and bulk deletes once it
+holds ``VOTE_BUFFER_MAX_SIZE`` entries or every
+``VOTE_BUFFER_FLUSH_SECONDS``, then recounts the affected features.
+
+Entries are keyed by ``(feature_id, user_id)`` and hold the desired final
+state, so repeated taps by one voter cost a single write. Queued and
+in-flight entries are overlaid on reads (``voted`` and ``pending_delta``)
+so a voter sees their own vote before it reaches the database.
+
+The queue lives in memory: votes acknowledged but not yet flushed are lost
+if the process dies without running its exit handlers.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
+
+from monitoring import metrics
+
+from . import conf, counters
+from .models import Feature, Vote
+from .voting import (
+    ALREADY_VOTED,
+    NOT_FOUND,
+    NOT_VOTED,
+    OWN_FEATURE,
+    UNVOTED,
+    VOTED,
+    VoteResult,
+    announce,
+)
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = metrics.histogram(
+    "vote_buffer_flush_seconds", "Duration of vote buffer flushes that succeeded"
+)
+FLUSH_ERRORS = metrics.counter(
+    "vote_buffer_flush_errors_total", "Vote buffer flushes that failed and requeued"
+)
+FLUSHED_ENTRIES = metrics.counter(
+    "vote_buffer_flushed_entries_total",
+    "Buffered votes written, or dropped because their feature or user was gone",
+    ("result",),
+)
+
+
+class VoteBuffer:
+    def __init__(self, max_size, flush_interval):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._inflight = {}
+        self._deltas = Counter()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self.stats = {
+            "flushes": 0,
+            "flushed_entries": 0,
+            "flush_errors": 0,
+            "dropped_entries": 0,
+            "last_flush_seconds": 0.0,
+            "max_flush_seconds": 0.0,
+        }
+
+    @property
+    def depth(self):
+        """Number of queued entries not yet handed to a flush."""
+        return len(self._pending)
+
+    def cast_vote(self, feature_id, user_id):
+        return self._submit(feature_id, user_id, True)
+
+    def retract_vote(self, feature_id, user_id):
+        return self._submit(feature_id, user_id, False)
+
+    def voted(self, feature_id, user_id):
+        """Return the queued state for the pair, or None if nothing is queued."""
+        key = (feature_id, user_id)
+        with self._lock:
+            entry = self._pending.get(key) or self._inflight.get(key)
+        return entry[0] if entry else None
+
+    def pending_delta(self, feature_id):
+        """Net vote change for ``feature_id`` not yet reflected in the DB."""
+        return self._deltas.get(feature_id, 0)
+
+    def _submit(self, feature_id, user_id, desired):
+        try:
+            feature_id = Feature._meta.pk.to_python(feature_id)
+        except ValidationError:
+            return VoteResult(NOT_FOUND)
+
+        row = (
+            Feature.objects.filter(pk=feature_id)
+            .annotate(
+                voted=Exists(
+                    Vote.objects.filter(feature=OuterRef("pk"), user_id=user_id)
+                ),
+                shard_total=counters.shard_sum(),
+            )
+            .values_list("author_id", F("vote_count") + F("shard_total"), "voted")
+            .first()
+        )
+        if row is None:
+            return VoteResult(NOT_FOUND)
+        author_id, stored_count, db_voted = row
+        if desired and author_id == user_id:
+            return VoteResult(OWN_FEATURE, stored_count)
+
+        key = (feature_id, user_id)
+        step = 1 if desired else -1
+        with self._lock:
+            queued = self._pending.get(key) or self._inflight.get(key)
+            current = db_voted if queued is None else queued[0]
+            if current == desired:
+                outcome = ALREADY_VOTED if desired else NOT_VOTED
+                return VoteResult(
+                    outcome, stored_count + self._deltas.get(feature_id, 0)
+                )
+            # Each entry is (desired state, net count change it carries).
+            net = self._pending[key][1] if key in self._pending else 0
+            self._pending[key] = (desired, net + step)
+            self._deltas[feature_id] += step
+            count = stored_count + self._deltas[feature_id]
+            full = len(self._pending) >= self.max_size
+
+        if full:
+            if self._thread is not None:
+                self._wakeup.set()
+            else:
+                self.flush()
+        return VoteResult(VOTED if desired else UNVOTED, count)
+
+    def flush(self):
+        """Persist everything queued so far. Returns the number of entries."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._inflight, self._pending = self._pending, {}
+            batch = self._inflight
+            started = time.perf_counter()
+            try:
+                dropped = self._write(batch)
+            except Exception:
+                self.stats["flush_errors"] += 1
+                FLUSH_ERRORS.inc()
+                logger.exception("Vote buffer flush of %d entries failed", len(batch))
+                with self._lock:
+                    # Requeue, letting anything submitted meanwhile win but
+                    # keeping the net change the failed entries carried.
+                    for key, (desired, net) in batch.items():
+                        if key in self._pending:
+                            latest, later_net = self._pending[key]
+                            self._pending[key] = (latest, net + later_net)
+                        else:
+                            self._pending[key] = (desired, net)
+                    self._inflight = {}
+                raise
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self._inflight = {}
+                for (feature_id, _), (_, net) in batch.items():
+                    self._deltas[feature_id] -= net
+                    if not self._deltas[feature_id]:
+                        del self._deltas[feature_id]
+            self.stats["flushes"] += 1
+            self.stats["flushed_entries"] += len(batch)
+            self.stats["dropped_entries"] += dropped
+            self.stats["last_flush_seconds"] = elapsed
+            self.stats["max_flush_seconds"] = max(
+                self.stats["max_flush_seconds"], elapsed
+            )
+            FLUSH_SECONDS.observe(elapsed)
+            FLUSHED_ENTRIES.inc("written", amount=len(batch) - dropped)
+            if dropped:
+                FLUSHED_ENTRIES.inc("dropped", amount=dropped)
+            logger.debug("Flushed %d buffered votes in %.3fs", len(batch), elapsed)
+            return len(batch)
+
+    def _write(self, batch):
+        """Store ``batch``; return how many upvotes were dropped."""
+        adds = [key for key, (desired, _) in batch.items() if desired]
+        removes = [key for key, (desired, _) in batch.items() if not desired]
+        kept = adds
+        if adds:
+            # A vote on a feature or by a user deleted since it was queued
+            # would fail the insert on its foreign key at every flush.
+            features = set(
+                Feature.objects.filter(pk__in={f for f, _ in adds}).values_list(
+                    "pk", flat=True
+                )
+            )
+            users = set(
+                User.objects.filter(pk__in={u for _, u in adds}).values_list(
+                    "pk", flat=True
+                )
+            )
+            kept = [(f, u) for f, u in adds if f in features and u in users]
+            if len(kept) < len(adds):
+                logger.warning(
+                    "Dropped %d buffered votes for deleted features or users",
+                    len(adds) - len(kept),
+                )
+        with transaction.atomic():
+            if kept:
+                Vote.objects.bulk_create(
+                    [Vote(feature_id=f, user_id=u) for f, u in kept],
+                    ignore_conflicts=True,
+                    batch_size=500,
+                )
+            for start in range(0, len(removes), 500):
+                condition = Q()
+                for feature_id, user_id in removes[start : start + 500]:
+                    condition |= Q(feature_id=feature_id, user_id=user_id)
+                Vote.objects.filter(condition).delete()
+            touched = {feature_id for feature_id, _ in batch}
+            counters.recount(touched)
+            announce(
+                counters.totals(touched),
+                removed={feature_id for feature_id, _ in removes},
+            )
+        return len(adds) - len(kept)
+
+    def start(self):
+        """Start the background flusher thread (idempotent)."""
+        if self._thread is None and self.flush_interval:
+            self._thread = threading.Thread(
+                target=self._run, name="vote-buffer-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher thread and flush whatever is left."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    pass  # Already logged; entries were requeued.
+        finally:
+            connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def enabled():
+    return bool(conf.get("VOTE_BUFFER"))
+
+
+def get_buffer():
+    """Return this process's vote buffer, starting its flusher on first use."""
+    global _buffer
+
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = VoteBuffer(
+                    conf.get("VOTE_BUFFER_MAX_SIZE"),
+                    conf.get("VOTE_BUFFER_FLUSH_SECONDS"),
+                )
+                _buffer.start()
+                atexit.register(_buffer.stop)
+    return _buffer
+
+
+def voted(feature_id, user_id):
+    """Overlay for reads: queued vote state, or None if nothing is queued."""
+    return _buffer.voted(feature_id, user_id) if _buffer is not None else None
+
+
+def pending_delta(feature_id):
+    """Overlay for reads: queued net vote change for ``feature_id``."""
+    return _buffer.pending_delta(feature_id) if _buffer is not None else 0
+
+
+def stat(name):
+    """A figure from this process's buffer (``depth`` or a ``stats`` key),
+    0 before the buffer exists."""
+    if _buffer is None:
+        return 0
+    return _buffer.depth if name == "depth" else _buffer.stats[name]
+
+
+metrics.gauge(
+    "vote_buffer_depth",
+    "Votes queued in memory, not yet flushed",
+    lambda: stat("depth"),
+)
+metrics.gauge(
+    "vote_buffer_last_flush_seconds",
+    "Duration of the latest vote buffer flush",
+    lambda: stat("last_flush_seconds"),
+    merge="max",
+)
+metrics.gauge(
+    "vote_buffer_max_flush_seconds",
+    "Longest vote buffer flush since the process started",
+    lambda: stat("max_flush_seconds"),
+    merge="max",
+)
+
+
+def reset():
+    """Discard this process's buffer without flushing (used by tests)."""
+    global _buffer
+
+    if _buffer is not None:
+        atexit.unregister(_buffer.stop)
+        _buffer._stopping = True
+        _buffer._wakeup.set()
+    _buffer = None
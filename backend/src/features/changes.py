@@ -0,0 +1,117 @@
+"""
+Incremental changes feed.
+
+Feature saves, deletions and vote count changes append ``FeatureChange``
+rows in the same transaction. A client takes a cursor (the id of the last
+entry it has seen) before its first list load and afterwards asks only for
+entries past it, so an up-to-date poll is one indexed range read returning
+nothing.
+
+``compact`` keeps the log small: entries superseded by a later entry for
+the same feature are dropped, and anything older than the retention window
+is removed. Cursors carry the time they were issued, and one older than
+the retention window is reported as expired so the client reloads the
+full list.
+"""
+
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from . import conf
+from .models import FeatureChange
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorExpired(Exception):
+    """Entries following the cursor may have been compacted away."""
+
+
+def settle_cutoff():
+    """Time up to which every transaction is assumed to have committed."""
+    return timezone.now() - timedelta(seconds=conf.get("CHANGES_SETTLE_SECONDS"))
+
+
+def settled(cutoff=None):
+    """Log entries old enough that no earlier-numbered entry can still appear."""
+    return FeatureChange.objects.filter(created_at__lte=cutoff or settle_cutoff())
+
+
+def encode(last_id, issued_at):
+    return f"{last_id}-{int(issued_at.timestamp())}"
+
+
+def decode(cursor):
+    """Return ``(last_id, issued_at)`` for a cursor string."""
+    try:
+        last_id, issued = (int(part) for part in cursor.split("-"))
+        return last_id, datetime.fromtimestamp(issued, tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise InvalidCursor
+
+
+def latest():
+    """Return the cursor a client should take before loading a list."""
+    last_id = settled().aggregate(latest=Max("id"))["latest"] or 0
+    return encode(last_id, timezone.now())
+
+
+def read(cursor):
+    """Return changes after ``cursor``.
+
+    The result is ``(changed_ids, deleted_ids, next_cursor, more)`` with one
+    entry per feature reflecting its latest change. Raises
+    ``InvalidCursor`` or ``CursorExpired``.
+    """
+    last_id, issued_at = decode(cursor)
+    # Entries the client has not seen were written no earlier than the
+    # settle period before the cursor was issued; past the retention window
+    # they may have been removed.
+    retention = timedelta(days=conf.get("CHANGES_RETENTION_DAYS"))
+    settle = timedelta(seconds=conf.get("CHANGES_SETTLE_SECONDS"))
+    if issued_at - settle < timezone.now() - retention:
+        raise CursorExpired
+
+    limit = conf.get("CHANGES_PAGE_SIZE")
+    now = timezone.now()
+    rows = list(
+        settled()
+        .filter(id__gt=last_id)
+        .order_by("id")
+        .values_list("id", "feature_id", "kind")[: limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+    latest_kind = {}
+    for _, feature_id, kind in rows:
+        latest_kind[feature_id] = kind
+    deleted = [pk for pk, kind in latest_kind.items() if kind == FeatureChange.DELETED]
+    changed = [pk for pk, kind in latest_kind.items() if kind != FeatureChange.DELETED]
+    if rows:
+        last_id = rows[-1][0]
+    # While entries remain unread, the cursor keeps its original issue time.
+    return changed, deleted, encode(last_id, issued_at if more else now), more
+
+
+def compact():
+    """Drop superseded and expired entries. Returns the number removed.
+
+    Removing an entry for which the same feature has a later one never
+    changes what a client is told, so only the retention cut-off can expire
+    cursors.
+    """
+    superseded, _ = FeatureChange.objects.filter(
+        Exists(
+            FeatureChange.objects.filter(
+                feature_id=OuterRef("feature_id"), id__gt=OuterRef("id")
+            )
+        )
+    ).delete()
+    cutoff = timezone.now() - timedelta(days=conf.get("CHANGES_RETENTION_DAYS"))
+    expired, _ = FeatureChange.objects.filter(created_at__lt=cutoff).delete()
+    return superseded + expired
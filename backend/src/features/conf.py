@@ -0,0 +1,73 @@
+"""
+Settings for the features app.
+
+Values are read from the ``FEATURE_VOTING`` dict in the Django settings,
+falling back to the defaults below, e.g.::
+
+    FEATURE_VOTING = {"SHARD_PROMOTION_RATE": 50}
+"""
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Most features one bulk_vote request may touch.
+    "BULK_VOTE_MAX_FEATURES": 100,
+    # Counter rows created when a feature is promoted to sharded counting.
+    "VOTE_SHARDS": 16,
+    # Votes per second (seen by one process) that promote a feature to
+    # sharded counting. None disables automatic promotion.
+    "SHARD_PROMOTION_RATE": None,
+    # How long a summed sharded vote count may be served from cache.
+    "SHARD_READ_CACHE_SECONDS": 2,
+    # How often each process re-reads which features are sharded.
+    "SHARD_REFRESH_SECONDS": 5,
+    # Queue API votes in memory and write them in batches (see buffer.py).
+    "VOTE_BUFFER": False,
+    # Queued entries that trigger an immediate flush.
+    "VOTE_BUFFER_MAX_SIZE": 500,
+    # Seconds between background flushes; 0 flushes only when full.
+    "VOTE_BUFFER_FLUSH_SECONDS": 1.0,
+    # Build feature list pages from plain rows, skipping FeatureSerializer,
+    # and render them with orjson when installed (see fastlist.py).
+    "FAST_FEATURE_LIST": False,
+    # Cache feature list and detail responses (see responsecache.py).
+    "RESPONSE_CACHE": False,
+    # Cache alias holding cached responses; must be shared by all workers.
+    "RESPONSE_CACHE_ALIAS": "default",
+    # Lifetime of a cached response that no write has invalidated.
+    "RESPONSE_CACHE_SECONDS": 300,
+    # Longest wait for another worker to build a missing cached response.
+    "RESPONSE_CACHE_LOCK_SECONDS": 5,
+    # Dotted path of the leaderboard storage class (see leaderboard.py).
+    "LEADERBOARD_BACKEND": "features.leaderboard.LocalLeaderboard",
+    # Features each process keeps ranked; also the largest ``?n=`` served.
+    "LEADERBOARD_SIZE": 1000,
+    # Seconds between background reloads of the leaderboard from the database.
+    "LEADERBOARD_REFRESH_SECONDS": 30,
+    # Age difference worth a tenfold difference in votes in the hot ranking.
+    "HOT_GRAVITY_SECONDS": 45000,
+    # Window of recent votes the trending ranking is computed from.
+    "TRENDING_WINDOW_HOURS": 24,
+    # Lowest title trigram similarity (0-1) reported as a likely duplicate.
+    "DUPLICATE_SIMILARITY": 0.5,
+    # Most change log entries read by one changes feed request.
+    "CHANGES_PAGE_SIZE": 500,
+    # Age below which change log entries are not served yet, so entries
+    # from transactions that commit out of id order are not skipped.
+    "CHANGES_SETTLE_SECONDS": 1.0,
+    # Days of change log kept by compact_feature_changes.
+    "CHANGES_RETENTION_DAYS": 7,
+    # Minimum gap between two events on one live stream.
+    "STREAM_COALESCE_SECONDS": 0.25,
+    # Idle time after which a live stream sends a keepalive comment.
+    "STREAM_KEEPALIVE_SECONDS": 15,
+    # Lifetime of a live stream before the client must reconnect.
+    "STREAM_MAX_SECONDS": 300,
+    # Most features one live stream may subscribe to.
+    "STREAM_MAX_FEATURES": 100,
+}
+
+
+def get(name):
+    """Return the configured value for ``name``."""
+    return getattr(settings, "FEATURE_VOTING", {}).get(name, DEFAULTS[name])
@@ -0,0 +1,224 @@
+"""
+Sharded vote counters for viral features.
+
+Every vote on an unsharded feature updates its ``Feature`` row, so a feature
+receiving a burst of votes serializes all of them on one row lock. Once a
+feature is promoted, votes instead increment one of ``counter_shards``
+``VoteCounterShard`` rows picked at random, and readers sum the shards.
+
+The true count is always ``Feature.vote_count + sum(shard counts)``, so a
+process that has not yet noticed a promotion (and keeps bumping the feature
+row) still produces the right total. ``fold`` moves shard totals back into
+``Feature.vote_count`` so that list ordering catches up.
+"""
+
+import random
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from . import conf, responsecache
+from .models import Feature, Vote, VoteCounterShard
+
+_lock = threading.Lock()
+_sharded = {}
+_sharded_loaded_at = None
+_window_started_at = 0.0
+_window_counts = {}
+
+
+def shard_count(feature_id):
+    """Return how many shards absorb votes for ``feature_id`` (0 if none)."""
+    global _sharded, _sharded_loaded_at
+
+    now = time.monotonic()
+    if (
+        _sharded_loaded_at is None
+        or now - _sharded_loaded_at > conf.get("SHARD_REFRESH_SECONDS")
+    ):
+        _sharded = dict(
+            Feature.objects.filter(counter_shards__gt=0).values_list(
+                "pk", "counter_shards"
+            )
+        )
+        _sharded_loaded_at = now
+    return _sharded.get(feature_id, 0)
+
+
+def add(feature_id, shards, delta):
+    """Apply ``delta`` to a randomly chosen shard of ``feature_id``."""
+    updated = VoteCounterShard.objects.filter(
+        feature_id=feature_id, shard=random.randrange(shards)
+    ).update(count=F("count") + delta)
+    if not updated:
+        # Demoted since we last refreshed; fall back to the feature row.
+        Feature.objects.filter(pk=feature_id).update(
+            vote_count=F("vote_count") + delta
+        )
+
+
+def total(feature):
+    """Return the vote count for ``feature``, summing shards if it has any."""
+    return row_total(feature.pk, feature.vote_count, feature.counter_shards)
+
+
+def row_total(pk, vote_count, counter_shards):
+    """``total`` for a feature read as plain column values."""
+    if not counter_shards:
+        return vote_count
+    key = f"features:vote-total:{pk}"
+    value = cache.get(key)
+    if value is None:
+        value = (
+            Feature.objects.filter(pk=pk)
+            .annotate(shard_total=Coalesce(Sum("counter_shard_rows__count"), 0))
+            .values_list(F("vote_count") + F("shard_total"), flat=True)
+            .get()
+        )
+        cache.set(key, value, conf.get("SHARD_READ_CACHE_SECONDS"))
+    return value
+
+
+def shard_sum():
+    """Expression for the summed shard counts of the outer Feature row."""
+    return Coalesce(
+        Subquery(
+            VoteCounterShard.objects.filter(feature=OuterRef("pk"))
+            .order_by()
+            .values("feature")
+            .annotate(total=Sum("count"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def totals(feature_ids):
+    """Return ``{feature_id: vote count including shards}`` in one query."""
+    return dict(
+        Feature.objects.filter(pk__in=feature_ids)
+        .annotate(shard_total=Coalesce(Sum("counter_shard_rows__count"), 0))
+        .values_list("pk", F("vote_count") + F("shard_total"))
+    )
+
+
+def recount(feature_ids):
+    """Recompute stored counts for ``feature_ids`` from the Vote table.
+
+    The count happens inside the UPDATE so votes cast concurrently are not
+    lost. Shard rows keep their counts; the feature row absorbs the
+    difference.
+    """
+    vote_total = (
+        Vote.objects.filter(feature=OuterRef("pk"))
+        .order_by()
+        .values("feature")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    shard_total = (
+        VoteCounterShard.objects.filter(feature=OuterRef("pk"))
+        .order_by()
+        .values("feature")
+        .annotate(total=Sum("count"))
+        .values("total")
+    )
+    return Feature.objects.filter(pk__in=feature_ids).update(
+        vote_count=Coalesce(Subquery(vote_total, output_field=IntegerField()), Value(0))
+        - Coalesce(Subquery(shard_total, output_field=IntegerField()), Value(0))
+    )
+
+
+def record_write(feature_id):
+    """Count a vote write and promote the feature once it runs hot."""
+    global _window_started_at, _window_counts
+
+    threshold = conf.get("SHARD_PROMOTION_RATE")
+    if threshold is None:
+        return
+    with _lock:
+        now = time.monotonic()
+        if now - _window_started_at >= 1:
+            _window_started_at = now
+            _window_counts = {}
+        writes = _window_counts[feature_id] = _window_counts.get(feature_id, 0) + 1
+    if writes == threshold and feature_id not in _sharded:
+        promote(feature_id)
+
+
+def promote(feature_id, shards=None):
+    """Switch ``feature_id`` to sharded counting."""
+    shards = shards or conf.get("VOTE_SHARDS")
+    with transaction.atomic():
+        VoteCounterShard.objects.bulk_create(
+            [VoteCounterShard(feature_id=feature_id, shard=i) for i in range(shards)],
+            ignore_conflicts=True,
+        )
+        Feature.objects.filter(pk=feature_id, counter_shards=0).update(
+            counter_shards=shards
+        )
+    _sharded[feature_id] = Feature.objects.values_list(
+        "counter_shards", flat=True
+    ).get(pk=feature_id)
+
+
+def fold(feature_id, demote=False):
+    """Move shard totals into ``Feature.vote_count``; optionally unshard.
+
+    Returns the number of votes moved.
+    """
+    with transaction.atomic():
+        counts = dict(
+            VoteCounterShard.objects.select_for_update()
+            .filter(feature_id=feature_id)
+            .values_list("pk", "count")
+        )
+        moved = sum(counts.values())
+        if moved:
+            Feature.objects.filter(pk=feature_id).update(
+                vote_count=F("vote_count") + moved
+            )
+            # Subtract exactly what was read rather than zeroing, so a write
+            # that slipped in after the read is kept.
+            VoteCounterShard.objects.filter(pk__in=counts).update(
+                count=F("count")
+                - Case(
+                    *[When(pk=pk, then=Value(n)) for pk, n in counts.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+        if demote:
+            Feature.objects.filter(pk=feature_id).update(counter_shards=0)
+            VoteCounterShard.objects.filter(feature_id=feature_id, count=0).delete()
+            _sharded.pop(feature_id, None)
+        if moved:
+            # Totals are unchanged, but list ordering reads vote_count.
+            responsecache.invalidate()
+    cache.delete(f"features:vote-total:{feature_id}")
+    return moved
+
+
+def reset():
+    """Forget per-process state (used by tests)."""
+    global _sharded_loaded_at, _window_started_at, _window_counts
+
+    _sharded.clear()
+    _sharded_loaded_at = None
+    _window_started_at = 0.0
+    _window_counts = {}
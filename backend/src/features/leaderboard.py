@@ -0,0 +1,305 @@
+"""
+Precomputed top-N leaderboard.
+
+Each process keeps the highest-ranked features, ordered like the feature
+list by ``(vote_count, created_at, id)``, in a pluggable backend so that
+``GET /api/features/top/`` only ever reads memory. ``start`` (called by
+the WSGI and ASGI entry points) runs a background thread that loads the
+store from the database at once and again every
+``LEADERBOARD_REFRESH_SECONDS``, to pick up writes made by other
+processes; in between, ``vote_count_changed`` and Feature save/delete
+signals keep it current. Until the first load finishes, ``top`` waits up
+to ``STARTUP_WAIT_SECONDS`` for it. Processes without the thread, such as
+management commands, serve nothing unless ``load`` is called.
+
+``LEADERBOARD_BACKEND`` names the backend class; ``LocalLeaderboard`` keeps
+everything in process memory. A shared sorted-set store can be plugged in
+by implementing ``LeaderboardBackend``.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.fields import DateTimeField
+
+from . import conf, counters
+from .models import Feature
+from .signals import vote_count_changed
+
+
+class LeaderboardBackend:
+    """Storage interface for the leaderboard.
+
+    Entries are dicts with ``id``, ``title``, ``vote_count`` and
+    ``created_at`` (a datetime).
+    """
+
+    def rebuild(self, entries, exhaustive):
+        """Replace the contents with ``entries``, the current top rows.
+
+        ``exhaustive`` is True when ``entries`` holds every feature.
+        """
+        raise NotImplementedError
+
+    def update(self, entry):
+        """Insert or reposition ``entry`` if it ranks high enough to keep."""
+        raise NotImplementedError
+
+    def set_vote_count(self, feature_id, vote_count):
+        """Update a tracked feature's count; return False if it is untracked."""
+        raise NotImplementedError
+
+    def qualifies(self, vote_count):
+        """Whether an untracked feature with ``vote_count`` might rank."""
+        raise NotImplementedError
+
+    def get(self, feature_id):
+        """Return the tracked entry for ``feature_id``, or None."""
+        raise NotImplementedError
+
+    def remove(self, feature_id):
+        raise NotImplementedError
+
+    def top(self, n):
+        """Return up to the first ``n`` entries; fewer if fewer are tracked."""
+        raise NotImplementedError
+
+
+class LocalLeaderboard(LeaderboardBackend):
+    """In-process sorted list of the top features.
+
+    Tracks exactly the features ranking above a floor key (the last row
+    loaded by ``rebuild``), so everything untracked is known to rank below
+    every tracked entry. Entries that sink past the floor are dropped, and
+    the list is trimmed back to ``capacity`` when it grows past twice that.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._lock = threading.RLock()
+        self._keys = []
+        self._entries = {}
+        self._floor = None
+
+    @staticmethod
+    def _key(entry):
+        # Ascending order of this key is the list's descending order.
+        return (
+            -entry["vote_count"],
+            -entry["created_at"].timestamp(),
+            -entry["id"].int,
+        )
+
+    def rebuild(self, entries, exhaustive):
+        with self._lock:
+            self._entries = {entry["id"]: dict(entry) for entry in entries}
+            self._keys = sorted(
+                (self._key(entry), entry["id"]) for entry in self._entries.values()
+            )
+            self._floor = None if exhaustive or not self._keys else self._keys[-1][0]
+
+    def update(self, entry):
+        with self._lock:
+            self._discard(entry["id"])
+            key = self._key(entry)
+            if self._floor is not None and key > self._floor:
+                return
+            self._entries[entry["id"]] = dict(entry)
+            bisect.insort(self._keys, (key, entry["id"]))
+            if len(self._keys) > 2 * self.capacity:
+                for _, feature_id in self._keys[self.capacity :]:
+                    del self._entries[feature_id]
+                del self._keys[self.capacity :]
+                self._floor = self._keys[-1][0]
+
+    def set_vote_count(self, feature_id, vote_count):
+        with self._lock:
+            entry = self._entries.get(feature_id)
+            if entry is None:
+                return False
+            self.update({**entry, "vote_count": vote_count})
+            return True
+
+    def qualifies(self, vote_count):
+        floor = self._floor
+        return floor is None or -vote_count <= floor[0]
+
+    def get(self, feature_id):
+        entry = self._entries.get(feature_id)
+        return dict(entry) if entry is not None else None
+
+    def remove(self, feature_id):
+        with self._lock:
+            self._discard(feature_id)
+
+    def top(self, n):
+        # Untracked features all rank below every tracked one, so the tracked
+        # entries are an exact prefix of the ranking however many there are.
+        with self._lock:
+            return [dict(self._entries[fid]) for _, fid in self._keys[:n]]
+
+    def _discard(self, feature_id):
+        entry = self._entries.pop(feature_id, None)
+        if entry is not None:
+            index = bisect.bisect_left(self._keys, (self._key(entry), feature_id))
+            del self._keys[index]
+
+
+logger = logging.getLogger(__name__)
+
+# Longest a request waits for the first load after the process starts.
+STARTUP_WAIT_SECONDS = 5
+
+_backend = None
+_loaded_at = None
+_loaded = threading.Event()
+_refresher = None
+_stopping = threading.Event()
+_start_lock = threading.Lock()
+_datetime_field = DateTimeField()
+
+
+def get_backend():
+    global _backend
+
+    if _backend is None:
+        backend_class = import_string(conf.get("LEADERBOARD_BACKEND"))
+        _backend = backend_class(conf.get("LEADERBOARD_SIZE"))
+    return _backend
+
+
+def load():
+    """Reload the backend with the current top features from the database."""
+    global _loaded_at
+
+    capacity = conf.get("LEADERBOARD_SIZE")
+    rows = list(
+        Feature.objects.order_by("-vote_count", "-created_at", "-id")
+        .annotate(total=F("vote_count") + counters.shard_sum())
+        .values("id", "title", "total", "created_at")[:capacity]
+    )
+    entries = [
+        _entry(row["id"], row["title"], row["total"], row["created_at"])
+        for row in rows
+    ]
+    get_backend().rebuild(entries, exhaustive=len(entries) < capacity)
+    _loaded_at = time.monotonic()
+    _loaded.set()
+
+
+def start():
+    """Start this process's background refresher, once (also after fork)."""
+    global _refresher
+
+    with _start_lock:
+        if _refresher is not None and _refresher.is_alive():
+            return
+        _stopping.clear()
+        _refresher = threading.Thread(
+            target=_refresh, name="leaderboard-refresher", daemon=True
+        )
+        _refresher.start()
+
+
+def _refresh():
+    while not _stopping.is_set():
+        try:
+            load()
+        except DatabaseError:
+            logger.exception("Could not refresh the leaderboard")
+        finally:
+            connection.close()
+        _stopping.wait(conf.get("LEADERBOARD_REFRESH_SECONDS"))
+
+
+def _restart_after_fork():
+    # Threads do not survive fork(); workers forked from a preloaded parent
+    # start their own refresher.
+    global _refresher
+
+    if _refresher is not None:
+        _refresher = None
+        start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def top(n):
+    """Return the top ``n`` features as response-ready dicts, from memory."""
+    if _refresher is not None:
+        _loaded.wait(STARTUP_WAIT_SECONDS)
+    if _loaded_at is None:
+        return []
+    return [
+        {
+            "id": str(entry["id"]),
+            "title": entry["title"],
+            "vote_count": entry["vote_count"],
+            "created_at": _datetime_field.to_representation(entry["created_at"]),
+        }
+        for entry in get_backend().top(n)
+    ]
+
+
+def reset():
+    """Drop this process's leaderboard (used by tests)."""
+    global _backend, _loaded_at, _refresher
+
+    _stopping.set()
+    _refresher = None
+    _backend = None
+    _loaded_at = None
+    _loaded.clear()
+
+
+def _entry(feature_id, title, vote_count, created_at):
+    return {
+        "id": feature_id,
+        "title": title,
+        "vote_count": vote_count,
+        "created_at": created_at,
+    }
+
+
+@receiver(vote_count_changed)
+def _on_vote_count_changed(sender, feature_id, vote_count, **kwargs):
+    if _loaded_at is None:
+        return
+    backend = get_backend()
+    if backend.set_vote_count(feature_id, vote_count) or not backend.qualifies(
+        vote_count
+    ):
+        return
+    row = Feature.objects.filter(pk=feature_id).values("title", "created_at").first()
+    if row is not None:
+        backend.update(_entry(feature_id, row["title"], vote_count, row["created_at"]))
+
+
+@receiver(post_save, sender=Feature)
+def _on_feature_saved(sender, instance, created, **kwargs):
+    if _loaded_at is None:
+        return
+    backend = get_backend()
+    existing = backend.get(instance.pk)
+    if existing is not None:
+        backend.update({**existing, "title": instance.title})
+    elif created:
+        entry = _entry(
+            instance.pk, instance.title, instance.vote_count, instance.created_at
+        )
+        backend.update(entry)
+
+
+@receiver(post_delete, sender=Feature)
+def _on_feature_deleted(sender, instance, **kwargs):
+    if _loaded_at is not None:
+        get_backend().remove(instance.pk)
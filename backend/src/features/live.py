@@ -0,0 +1,139 @@
+"""
+Live vote-count push over Server-Sent Events.
+
+``GET /api/features/stream/?ids=<id>,<id>`` opens an event stream that
+first reports the current counts of the listed features and then pushes
+their changes as ``vote_count`` events whose data maps feature ids to
+totals. Updates are coalesced per connection: after an event is sent,
+further changes accumulate for ``STREAM_COALESCE_SECONDS`` and only the
+latest count of each feature goes out, so a viral feature costs a client
+at most one update per interval.
+
+Fan-out is an in-memory pub/sub fed by ``vote_count_changed``, so a stream
+only sees votes handled by its own process. The view is async and must be
+served by an ASGI server (``feature_voting.asgi``) to avoid tying up a
+worker thread per client. Streams close after ``STREAM_MAX_SECONDS``, which
+also bounds streams whose client went away unnoticed (Django 4.2 does not
+watch for disconnects while streaming); the ``retry`` hint makes browsers
+reconnect on their own.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.dispatch import receiver
+
+from . import buffer, conf, counters
+from .models import Feature
+from .signals import vote_count_changed
+
+
+class Subscription:
+    """One client's interest in a set of features."""
+
+    def __init__(self, feature_ids, loop):
+        self.feature_ids = frozenset(feature_ids)
+        self.loop = loop
+        self.ready = asyncio.Event()
+        self.pending = {}
+
+
+class Broker:
+    """Thread-safe fan-out of vote counts to subscriptions on event loops."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, feature_ids):
+        subscription = Subscription(feature_ids, asyncio.get_running_loop())
+        with self._lock:
+            for feature_id in subscription.feature_ids:
+                self._subscriptions[feature_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for feature_id in subscription.feature_ids:
+                subscribers = self._subscriptions.get(feature_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[feature_id]
+
+    def subscriber_count(self, feature_id):
+        with self._lock:
+            return len(self._subscriptions.get(feature_id, ()))
+
+    def publish(self, feature_id, vote_count):
+        """Queue ``vote_count`` for every subscriber; callable from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(feature_id, ()))
+            for subscription in subscriptions:
+                subscription.pending[feature_id] = vote_count
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.ready.set)
+            except RuntimeError:
+                pass  # The client's event loop has already shut down.
+
+    def take(self, subscription):
+        """Return and clear the updates queued for ``subscription``."""
+        with self._lock:
+            pending, subscription.pending = subscription.pending, {}
+        return pending
+
+    async def listen(self, feature_ids, initial=None):
+        """Yield SSE messages for ``feature_ids`` until the stream times out."""
+        subscription = self.subscribe(feature_ids)
+        loop = subscription.loop
+        coalesce = conf.get("STREAM_COALESCE_SECONDS")
+        keepalive = conf.get("STREAM_KEEPALIVE_SECONDS")
+        deadline = loop.time() + conf.get("STREAM_MAX_SECONDS")
+        try:
+            yield "retry: 3000\n\n"
+            if initial:
+                yield _event(initial)
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    await asyncio.wait_for(
+                        subscription.ready.wait(), min(keepalive, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                subscription.ready.clear()
+                updates = self.take(subscription)
+                if updates:
+                    yield _event(updates)
+                    await asyncio.sleep(coalesce)
+        finally:
+            self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+@sync_to_async
+def current_counts(feature_ids):
+    """Return ``{feature_id: total}`` for the existing features among ids."""
+    features = Feature.objects.filter(pk__in=feature_ids).only(
+        "id", "vote_count", "counter_shards"
+    )
+    return {
+        feature.pk: counters.total(feature) + buffer.pending_delta(feature.pk)
+        for feature in features
+    }
+
+
+def _event(counts):
+    data = json.dumps({str(pk): count for pk, count in counts.items()})
+    return f"event: vote_count\ndata: {data}\n\n"
+
+
+@receiver(vote_count_changed)
+def _on_vote_count_changed(sender, feature_id, vote_count, **kwargs):
+    broker.publish(feature_id, vote_count)
@@ -0,0 +1,241 @@
+"""
+Concurrent load against the whole application, in-process.
+
+``run`` drives ``feature_voting.wsgi.application`` from one thread per
+client, or ``feature_voting.asgi.application`` from one event loop, so
+lock contention on votes and starvation of the threads that run sync code
+show up the way they would behind a real server, with no server, load
+generator or other service to start.
+
+Readers alternate between the feature list and a target feature's detail.
+Voters sign in as users of their own and toggle their vote on targets,
+upvoting where they have not voted and removing the vote where they have,
+so every request is expected to succeed. With one target every voter
+hammers the same feature; with many, votes spread across them.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import counters, voting
+from .benchmarks import asgi_call, create_users, wsgi_call
+from .models import Feature, Vote
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Client:
+    """One simulated client: the requests it makes and what came of them."""
+
+    kind = None
+
+    def __init__(self, rng, target_ids):
+        self.rng = rng
+        self.target_ids = target_ids
+        self.latencies = []
+        self.statuses = Counter()
+
+    def request(self):
+        """Return the next ``(method, path, headers)`` to send."""
+        raise NotImplementedError
+
+    def record(self, started, status):
+        self.latencies.append(time.perf_counter() - started)
+        self.statuses[status] += 1
+
+
+class Reader(Client):
+    kind = "read"
+
+    detail = True
+
+    def request(self):
+        self.detail = not self.detail
+        if self.detail:
+            return ("GET", f"/api/features/{self.rng.choice(self.target_ids)}/", ())
+        return ("GET", "/api/features/", ())
+
+
+class Voter(Client):
+    kind = "vote"
+
+    def __init__(self, rng, target_ids, tokens):
+        super().__init__(rng, target_ids)
+        self.tokens = tokens
+        self.voted = set()
+        self.pending = None
+
+    def request(self):
+        token = self.rng.choice(self.tokens)
+        target = self.rng.choice(self.target_ids)
+        self.pending = (token, target)
+        headers = (("Authorization", f"Bearer {token}"),)
+        if self.pending in self.voted:
+            return ("DELETE", f"/api/features/{target}/remove_vote/", headers)
+        return ("POST", f"/api/features/{target}/upvote/", headers)
+
+    def record(self, started, status):
+        super().record(started, status)
+        if status < 400:  # Only a vote that went through changes the state.
+            self.voted ^= {self.pending}
+
+
+def run(
+    server="wsgi",
+    readers=8,
+    voters=8,
+    duration=10.0,
+    features=200,
+    targets=1,
+    users_per_voter=50,
+    seed=0,
+    report=print,
+):
+    """Load the app for ``duration`` seconds and ``report`` the outcome.
+
+    Expects an empty database; returns ``{kind: {"requests", "errors"}}``.
+    """
+    rng = random.Random(seed)
+    author = User.objects.create(username="load-author")
+    feature_ids = [
+        feature.pk
+        for feature in Feature.objects.bulk_create(
+            [Feature(title=f"Load feature {i}", author=author) for i in range(features)]
+        )
+    ]
+    target_ids = feature_ids[:targets]
+    clients = [Reader(rng, target_ids) for _ in range(readers)]
+    for i in range(voters):
+        tokens = [
+            str(AccessToken.for_user(user))
+            for user in User.objects.filter(
+                pk__in=create_users(users_per_voter, prefix=f"load-voter-{i}-")
+            )
+        ]
+        clients.append(Voter(rng, target_ids, tokens))
+    report(
+        f"{readers} readers and {voters} voters on {len(target_ids)} of "
+        f"{features} features for {duration:g}s ({server}, {connection.vendor})"
+    )
+
+    before = Counter(voting.stats)
+    elapsed = (_run_wsgi if server == "wsgi" else _run_asgi)(clients, duration)
+    retries = voting.stats["retries"] - before["retries"]
+
+    summary = {}
+    for kind in ("read", "vote"):
+        group = [client for client in clients if client.kind == kind]
+        if not group:
+            continue
+        latencies = sorted(t for client in group for t in client.latencies)
+        statuses = sum((client.statuses for client in group), Counter())
+        errors = sum(n for status, n in statuses.items() if status >= 400)
+        summary[kind] = {"requests": len(latencies), "errors": errors}
+        report(f"{kind}s: {len(latencies) / elapsed:,.0f} req/s, " + _errors(statuses))
+        if latencies:
+            report(
+                "  "
+                + ", ".join(
+                    f"p{p} {1000 * _percentile(latencies, p):.1f} ms"
+                    for p in (50, 95, 99)
+                )
+            )
+            for line in _histogram(latencies):
+                report(f"  {line}")
+    # Sharded features keep part of their count in shard rows, so compare
+    # full totals rather than Feature.vote_count.
+    stored = counters.totals(target_ids)
+    actual = dict(
+        Vote.objects.filter(feature_id__in=target_ids)
+        .values("feature_id")
+        .annotate(total=Count("id"))
+        .values_list("feature_id", "total")
+    )
+    drifted = sum(1 for pk, total in stored.items() if total != actual.get(pk, 0))
+    report(
+        f"database: {retries} lock retries, "
+        f"{voting.stats['conflicts'] - before['conflicts']} vote conflicts, "
+        f"{drifted} target vote counts out of step"
+    )
+    return summary
+
+
+def _run_wsgi(clients, duration):
+    from django.core.wsgi import get_wsgi_application
+
+    app = get_wsgi_application()
+    barrier = threading.Barrier(len(clients) + 1)
+    deadline = None
+
+    def work(client):
+        barrier.wait()
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                client.record(started, wsgi_call(app, *client.request()))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work, args=(c,)) for c in clients]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    deadline = started + duration
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def _run_asgi(clients, duration):
+    from feature_voting.asgi import application
+
+    async def work(client, deadline):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.record(started, await asgi_call(application, *client.request()))
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(work(c, started + duration) for c in clients))
+        return time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def _percentile(latencies, p):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+
+def _errors(statuses):
+    total = sum(statuses.values())
+    failed = {status: n for status, n in statuses.items() if status >= 400}
+    if not failed:
+        return "no errors"
+    detail = ", ".join(f"{n} x {status}" for status, n in sorted(failed.items()))
+    return f"{100 * sum(failed.values()) / total:.2f}% errors ({detail})"
+
+
+def _histogram(latencies, width=40):
+    counts = Counter()
+    for latency in latencies:
+        ms = 1000 * latency
+        counts[next((b for b in BUCKETS_MS if ms <= b), None)] += 1
+    peak = max(counts.values())
+    lines = []
+    for bound in BUCKETS_MS + (None,):
+        if not counts[bound]:
+            continue
+        label = f"<= {bound} ms" if bound else f"> {BUCKETS_MS[-1]} ms"
+        bar = "#" * max(1, round(width * counts[bound] / peak))
+        lines.append(f"{label:>10} {counts[bound]:>8} {bar}")
+    return lines
@@ -0,0 +1,108 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from features.benchmarks import SCENARIOS, benchmark_database, compare
+
+
+class Command(BaseCommand):
+    help = "Run feature-voting benchmark scenarios against a throwaway database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Scenarios to run (default: all). Choices: {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Concurrent worker threads (default: 8)",
+        )
+        parser.add_argument(
+            "--operations",
+            type=int,
+            default=2000,
+            help="Operations per measured run (default: 2000)",
+        )
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000, 10000],
+            help="Feature counts to measure hot_paths at (default: 1000 10000)",
+        )
+        parser.add_argument(
+            "--repeats",
+            type=int,
+            default=3,
+            help="Times hot_paths measures every path; results are the median "
+            "over them (default: 3)",
+        )
+        parser.add_argument(
+            "--json",
+            help="Write the results of scenarios that report them to this file",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Fail if results regressed against this earlier --json file",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=20.0,
+            help="Allowed p95 slowdown against the baseline, in percent; "
+            "slowdowns under 1 ms, and paths with under 100 samples, are not "
+            "gated (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        names = options["scenarios"] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(unknown)}")
+        if min(options["sizes"]) < 1:
+            raise CommandError("Sizes must be positive")
+        if options["repeats"] < 1:
+            raise CommandError("--repeats must be positive")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        results = {}
+        with benchmark_database():
+            vendor = connection.vendor
+            for name in names:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{name}:"))
+                result = SCENARIOS[name](options, self.stdout)
+                if result is not None:
+                    results[name] = result
+
+        if options["json"]:
+            with open(options["json"], "w") as f:
+                json.dump(
+                    {
+                        "vendor": vendor,
+                        "operations": options["operations"],
+                        "results": results,
+                    },
+                    f,
+                    indent=2,
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f"Results written to {options['json']}")
+            )
+        if baseline is not None:
+            if baseline.get("vendor") != vendor:
+                self.stderr.write(
+                    f"Baseline was measured on {baseline.get('vendor')}, "
+                    f"this run on {vendor}"
+                )
+            regressions = compare(baseline["results"], results, options["threshold"])
+            if regressions:
+                raise CommandError(
+                    "Regressions against the baseline:\n  " + "\n  ".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from features import changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact the feature changes log, keeping "
+        "FEATURE_VOTING['CHANGES_RETENTION_DAYS'] days of history"
+    )
+
+    def handle(self, *args, **options):
+        removed = changes.compact()
+        self.stdout.write(
+            self.style.SUCCESS(f"Removed {removed} change log entry(ies).")
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from features import counters
+from features.models import Feature
+
+
+class Command(BaseCommand):
+    help = "Fold sharded vote counters back into Feature.vote_count"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--demote",
+            action="store_true",
+            help="Also switch folded features back to unsharded counting",
+        )
+
+    def handle(self, *args, **options):
+        sharded = Feature.objects.filter(counter_shards__gt=0).values_list(
+            "pk", flat=True
+        )
+        folded = 0
+        moved = 0
+        for pk in sharded.iterator():
+            moved += counters.fold(pk, demote=options["demote"])
+            folded += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Folded {moved} vote(s) from {folded} sharded feature(s)."
+            )
+        )
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from features import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, features and votes with realistic skew "
+        "for performance work"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=10000, help="Users (default: 10000)"
+        )
+        parser.add_argument(
+            "--features", type=int, default=2000, help="Features (default: 2000)"
+        )
+        parser.add_argument(
+            "--votes",
+            type=int,
+            default=100000,
+            help="Approximate number of votes (default: 100000)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed (default: 0)"
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=180,
+            help="Days of history to spread features over (default: 180)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Rows per insert or COPY (default: 10000)",
+        )
+        parser.add_argument(
+            "--password",
+            default="loadtest",
+            help="Password of every generated user (default: loadtest)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            votes = synthetic.generate(
+                options["users"],
+                options["features"],
+                options["votes"],
+                seed=options["seed"],
+                days=options["days"],
+                batch_size=options["batch_size"],
+                password=options["password"],
+                report=self.stdout.write,
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {options['users']} user(s), {options['features']} "
+                f"feature(s) and {votes} vote(s). Run update_rankings, "
+                "rollup_votes --rebuild, rebuild_similarity_index and "
+                "rebuild_search_index to index them."
+            )
+        )
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from features import loadtest
+from features.benchmarks import benchmark_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the whole app in-process with concurrent readers and voters "
+        "against a throwaway database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--server",
+            choices=["wsgi", "asgi"],
+            default="wsgi",
+            help="Application to drive: a thread per client under WSGI, one "
+            "event loop under ASGI (default: wsgi)",
+        )
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=8,
+            help="Concurrent clients reading the list and details (default: 8)",
+        )
+        parser.add_argument(
+            "--voters",
+            type=int,
+            default=8,
+            help="Concurrent clients upvoting and removing votes (default: 8)",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=10.0,
+            help="Seconds to keep up the load (default: 10)",
+        )
+        parser.add_argument(
+            "--features",
+            type=int,
+            default=200,
+            help="Features in the database (default: 200)",
+        )
+        parser.add_argument(
+            "--targets",
+            type=int,
+            default=1,
+            help="Features that details are read from and votes go to; 1 puts "
+            "every voter on the same feature (default: 1)",
+        )
+        parser.add_argument(
+            "--users-per-voter",
+            type=int,
+            default=50,
+            help="Distinct users each voter signs in as (default: 50)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["readers"] + options["voters"] < 1:
+            raise CommandError("Need at least one reader or voter")
+        if not 1 <= options["targets"] <= options["features"]:
+            raise CommandError("--targets must be between 1 and --features")
+
+        with benchmark_database():
+            summary = loadtest.run(
+                server=options["server"],
+                readers=options["readers"],
+                voters=options["voters"],
+                duration=options["duration"],
+                features=options["features"],
+                targets=options["targets"],
+                users_per_voter=options["users_per_voter"],
+                seed=options["seed"],
+                report=self.stdout.write,
+            )
+        requests = sum(kind["requests"] for kind in summary.values())
+        errors = sum(kind["errors"] for kind in summary.values())
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {requests:,} requests, {errors:,} failed")
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from features import search
+
+
+class Command(BaseCommand):
+    help = "Create the feature search index and refill the SQLite shadow table"
+
+    def handle(self, *args, **options):
+        search.ensure_index()
+        if connection.vendor != "sqlite":
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{connection.vendor} search index is maintained by the database."
+                )
+            )
+            return
+        indexed = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} feature(s)."))
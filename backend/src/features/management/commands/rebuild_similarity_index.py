@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from features import similarity
+
+
+class Command(BaseCommand):
+    help = "Recompute the duplicate-detection buckets for every feature"
+
+    def handle(self, *args, **options):
+        indexed = similarity.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} feature(s)."))
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+from features import counters
+from features.voting import announce
+from features.models import Feature, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair drift between stored vote counts (Feature.vote_count plus any "
+        "counter shards) and the Vote table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of features to check per batch (default: 1000)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted features without updating them",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+
+        checked = 0
+        repaired = 0
+        last_pk = None
+        while True:
+            batch = Feature.objects.order_by("pk")
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            stored = dict(
+                batch.annotate(
+                    shard_total=Coalesce(Sum("counter_shard_rows__count"), 0)
+                ).values_list("pk", F("vote_count") + F("shard_total"))[:batch_size]
+            )
+            if not stored:
+                break
+            last_pk = max(stored)
+            checked += len(stored)
+
+            actual = dict(
+                Vote.objects.filter(feature_id__in=stored)
+                .values("feature_id")
+                .annotate(total=Count("id"))
+                .values_list("feature_id", "total")
+            )
+            drifted = [
+                pk for pk, count in stored.items() if actual.get(pk, 0) != count
+            ]
+            if not drifted:
+                continue
+
+            for pk in drifted:
+                self.stdout.write(
+                    f"Feature {pk}: stored {stored[pk]}, actual {actual.get(pk, 0)}"
+                )
+            if not dry_run:
+                with transaction.atomic():
+                    counters.recount(drifted)
+                    announce({pk: actual.get(pk, 0) for pk in drifted})
+            repaired += len(drifted)
+
+        verb = "Found" if dry_run else "Repaired"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {checked} features. {verb} {repaired} drifted vote count(s)."
+            )
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from features import rollups
+
+
+class Command(BaseCommand):
+    help = "Fold recent vote changes into the hourly and daily vote rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recompute every rollup from the Vote table (for backfilling)",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            written = rollups.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt {written} rollup row(s).")
+            )
+            return
+        rolled = rollups.catch_up()
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {rolled} feature(s)."))
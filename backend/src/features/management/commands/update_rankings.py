@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from features import rankings
+
+
+class Command(BaseCommand):
+    help = "Recompute the hot and trending scores used by ?ordering="
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Features written per UPDATE (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        updated = rankings.refresh(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} feature(s)."))
@@ -2,6 +2,7 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from django.db.models import Count
 from .models import Feature
+from .pagination import KeysetPagination
 from .simple_serializers import SimpleFeatureSerializer
 
 
@@ -11,7 +12,9 @@ class MinimalFeatureViewSet(viewsets.ModelViewSet):
     queryset = Feature.objects.all()
     serializer_class = SimpleFeatureSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         """Return features ordered by creation date."""
-        return Feature.objects.select_related("author").order_by("-created_at")
+        return Feature.objects.select_related("author").order_by(*self.keyset_ordering)
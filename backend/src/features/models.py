@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
 
 
@@ -38,28 +41,92 @@ class Feature(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, help_text="When the feature was last updated"
     )
+    vote_count = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text="Denormalized number of votes, maintained by upvote/remove_vote",
+    )
+    counter_shards = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of VoteCounterShard rows absorbing votes (0 = unsharded)",
+    )
+    hot_score = models.FloatField(
+        default=0,
+        editable=False,
+        help_text="Time-decayed vote score, refreshed by update_rankings",
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        help_text="Recent votes per hour, refreshed by update_rankings",
+    )
 
     class Meta:
-        # ordering = ["-vote_count", "-created_at"]
+        ordering = ["-vote_count", "-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["-vote_count", "-created_at", "-id"],
+                name="feature_vote_rank_idx",
+            ),
+            models.Index(fields=["-created_at", "-id"], name="feature_recent_idx"),
+            models.Index(fields=["-hot_score", "-id"], name="feature_hot_idx"),
+            models.Index(
+                fields=["-trending_score", "-hot_score", "-id"],
+                name="feature_trending_idx",
+            ),
+        ]
         verbose_name = "Feature Request"
         verbose_name_plural = "Feature Requests"
 
+    # Columns other code updates atomically in place (the vote engine,
+    # counter promotion, update_rankings). Saving an existing feature leaves
+    # them alone, so an instance loaded before a concurrent change cannot
+    # write its stale values back.
+    maintained_fields = ("vote_count", "counter_shards", "hot_score", "trending_score")
+
     def __str__(self):
         return self.title
 
-    @property
-    def vote_count(self):
-        """Get the current vote count."""
-        return self.votes.count()
+    def save(self, *args, **kwargs):
+        """Save the feature and record the change in the changes feed."""
+        kind = FeatureChange.CREATED if self._state.adding else FeatureChange.UPDATED
+        if not self._state.adding and not args and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.maintained_fields
+            ]
+        if self._state.adding:
+            from .rankings import hot_score
+
+            # Rank new features as "hot" straight away rather than after the
+            # next update_rankings run.
+            self.hot_score = hot_score(self.vote_count, timezone.now())
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            FeatureChange.objects.create(feature_id=self.pk, kind=kind)
 
     def upvote(self, user):
-        """Add a vote from a user if they haven't voted already."""
-        vote, created = Vote.objects.get_or_create(feature=self, user=user)
-        return created  # Returns True if vote was created, False if already existed
+        """Add a vote from a user if they haven't voted already.
+
+        Authors cannot vote for their own feature.
+        """
+        from .voting import cast_vote
+
+        result = cast_vote(self.pk, user.pk)
+        if result.vote_count is not None:
+            self.vote_count = result.vote_count
+        return result.changed  # False if the vote already existed
 
     def remove_vote(self, user):
         """Remove a user's vote."""
-        return Vote.objects.filter(feature=self, user=user).delete()[0] > 0
+        from .voting import retract_vote
+
+        result = retract_vote(self.pk, user.pk)
+        if result.vote_count is not None:
+            self.vote_count = result.vote_count
+        return result.changed
 
     def has_user_voted(self, user):
         """Check if a user has voted for this feature."""
@@ -79,8 +146,142 @@ class Vote(models.Model):
 
     class Meta:
         unique_together = ["feature", "user"]  # One vote per user per feature
+        indexes = [models.Index(fields=["created_at"], name="vote_created_idx")]
         verbose_name = "Vote"
         verbose_name_plural = "Votes"
 
     def __str__(self):
         return f"{self.user.username} voted for {self.feature.title}"
+
+
+class VoteCounterShard(models.Model):
+    """
+    One of several counter rows that absorb vote writes for a busy feature.
+
+    A feature's true vote count is its ``vote_count`` plus the sum of its
+    shard counts; individual shards may go negative when a vote is removed
+    through a different shard than the one it was added to.
+    """
+
+    feature = models.ForeignKey(
+        Feature, on_delete=models.CASCADE, related_name="counter_shard_rows"
+    )
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ["feature", "shard"]
+        verbose_name = "Vote Counter Shard"
+        verbose_name_plural = "Vote Counter Shards"
+
+    def __str__(self):
+        return f"{self.feature_id} shard {self.shard}: {self.count}"
+
+
+class FeatureSimilarityBucket(models.Model):
+    """
+    LSH bucket a feature's title falls into, used to find likely duplicates.
+
+    Each feature has one row per MinHash band (see ``features.similarity``);
+    features sharing any bucket are candidate duplicates.
+    """
+
+    feature = models.ForeignKey(
+        Feature, on_delete=models.CASCADE, related_name="similarity_buckets"
+    )
+    bucket = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        unique_together = ["feature", "bucket"]
+        verbose_name = "Feature Similarity Bucket"
+        verbose_name_plural = "Feature Similarity Buckets"
+
+    def __str__(self):
+        return f"{self.feature_id} in {self.bucket}"
+
+
+class FeatureChange(models.Model):
+    """
+    Append-only log entry recording that a feature changed.
+
+    Entries are written in the same transaction as the change and read by
+    the changes feed in ``id`` order. ``feature_id`` is not a foreign key so
+    that deletions stay in the log.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    VOTES = "votes"
+    UNVOTED = "unvoted"
+    KIND_CHOICES = [
+        (CREATED, "Created"),
+        (UPDATED, "Updated"),
+        (DELETED, "Deleted"),
+        (VOTES, "Vote count changed"),
+        (UNVOTED, "Votes removed"),
+    ]
+
+    feature_id = models.UUIDField(db_index=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Feature Change"
+        verbose_name_plural = "Feature Changes"
+
+    def __str__(self):
+        return f"{self.kind} {self.feature_id}"
+
+
+class VoteRollup(models.Model):
+    """
+    Net votes a feature gained during one hour or day.
+
+    Filled from ``Vote`` rows and the changes log by ``rollup_votes`` (see
+    ``features.rollups``); the sum of a feature's rows for either period is
+    its vote total as of the last run.
+    """
+
+    HOUR = "hour"
+    DAY = "day"
+    PERIOD_CHOICES = [(HOUR, "Hour"), (DAY, "Day")]
+
+    feature = models.ForeignKey(
+        Feature, on_delete=models.CASCADE, related_name="vote_rollups"
+    )
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateTimeField(help_text="Start of the bucket (UTC)")
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ["feature", "period", "start"]
+        verbose_name = "Vote Rollup"
+        verbose_name_plural = "Vote Rollups"
+
+    def __str__(self):
+        return f"{self.feature_id} {self.period} {self.start:%Y-%m-%d %H:%M}"
+
+
+class VoteRollupProgress(models.Model):
+    """
+    Id of the last changes log entry, and creation time of the last votes,
+    folded into ``VoteRollup``.
+    """
+
+    last_change_id = models.BigIntegerField(default=0)
+    last_vote_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Vote Rollup Progress"
+        verbose_name_plural = "Vote Rollup Progress"
+
+    def __str__(self):
+        return f"Rolled up to change {self.last_change_id}"
+
+
+@receiver(post_delete, sender=Feature)
+def _record_deletion(sender, instance, **kwargs):
+    # A receiver rather than a delete() override so queryset and cascade
+    # deletes are logged too; it runs inside the deletion's transaction.
+    FeatureChange.objects.create(feature_id=instance.pk, kind=FeatureChange.DELETED)
@@ -0,0 +1,174 @@
+"""
+Keyset (cursor) pagination for feature lists.
+
+Pages are selected with a ``WHERE (vote_count, created_at, id) < cursor``
+style filter on the same columns the list is ordered and indexed by, so the
+cost of a page does not depend on how deep the client has scrolled and no
+``COUNT(*)`` is issued. Cursors encode the sort key of the row at the page
+edge rather than an offset, so features gaining votes while a client pages
+do not shift every following page.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a unique, multi-column ordering.
+
+    Views may set ``keyset_ordering`` to override ``ordering``; the last
+    field must be unique (normally ``id``). Numeric annotations may be
+    used as well as model fields, and pages may be read as ``.values()``
+    rows.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-vote_count", "-created_at", "-id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, page_size = self._window(queryset, request, view)
+        return self._page(list(queryset[: page_size + 1]), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` reading the page with the async ORM."""
+        queryset, page_size = self._window(queryset, request, view)
+        return self._page([row async for row in queryset[: page_size + 1]], page_size)
+
+    def _window(self, queryset, request, view):
+        """Order and filter ``queryset`` for the requested page."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request, queryset.model)
+
+        reverse = self.cursor is not None and self.cursor[0]
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self._after(ordering, self.cursor[1]))
+        return queryset, page_size
+
+    def _page(self, rows, page_size):
+        """Trim the ``page_size + 1`` rows read and record the page links."""
+        cursor = self.cursor
+        reverse = cursor is not None and cursor[0]
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self._position(rows[-1])
+            if cursor is not None and (has_more or not reverse):
+                self.previous_position = self._position(rows[0])
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(False, self.next_position)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(True, self.previous_position)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def encode_cursor(self, reverse, position):
+        payload = json.dumps({"r": int(reverse), "p": position}, separators=(",", ":"))
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        """Return ``(reverse, values)`` from the request, or None."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            raw = payload["p"]
+            if len(raw) != len(self.ordering):
+                raise ValueError
+            values = [
+                self._to_python(model, name.lstrip("-"), value)
+                for name, value in zip(self.ordering, raw)
+            ]
+            return bool(payload["r"]), values
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _to_python(model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # An annotation such as a search rank; JSON kept its type.
+            if not isinstance(value, (int, float)):
+                raise ValueError
+            return value
+        return field.to_python(value)
+
+    def _position(self, row):
+        values = []
+        for name in self.ordering:
+            name = name.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value if isinstance(value, (int, float)) else str(value))
+        return values
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in ordering)
+
+    @staticmethod
+    def _after(ordering, values):
+        """Build ``(f1, f2, ...) > (v1, v2, ...)`` in ``ordering`` order."""
+        condition = Q()
+        for i, name in enumerate(ordering):
+            field = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            clause = Q(**{f"{field}__{lookup}": values[i]})
+            for prev_name, prev_value in zip(ordering[:i], values[:i]):
+                clause &= Q(**{prev_name.lstrip("-"): prev_value})
+            condition |= clause
+        return condition
@@ -0,0 +1,118 @@
+"""
+Precomputed "hot" and "trending" orderings for feature lists.
+
+``hot_score`` follows the Reddit formula: the log of a feature's votes plus
+its creation time divided by ``HOT_GRAVITY_SECONDS``, so a feature must
+collect ten times the votes of one that gravity period newer to rank level
+with it. Because age enters as creation time rather than time elapsed,
+the score only changes when votes do and older features sink without
+being rewritten.
+
+``trending_score`` is vote velocity: votes cast within the last
+``TRENDING_WINDOW_HOURS`` per hour of the window, from ``Vote.created_at``.
+
+Both are stored on ``Feature`` in indexed columns and refreshed by the
+``update_rankings`` command, so ``?ordering=hot`` and ``?ordering=trending``
+read an index in order instead of scoring every feature per request.
+"""
+
+import math
+from datetime import timedelta
+
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.filters import BaseFilterBackend
+
+from . import conf, counters, responsecache
+from .models import Feature, Vote
+
+# Scores count time from here to keep the values small.
+EPOCH = 1_700_000_000
+
+ORDERINGS = {
+    "hot": ("-hot_score", "-id"),
+    "trending": ("-trending_score", "-hot_score", "-id"),
+}
+
+
+def hot_score(votes, created_at):
+    """Return the hot score of a feature with ``votes`` made at ``created_at``."""
+    age = (created_at.timestamp() - EPOCH) / conf.get("HOT_GRAVITY_SECONDS")
+    return math.log10(max(votes, 1)) + age
+
+
+def refresh(batch_size=1000):
+    """Recompute every feature's scores. Returns the number that changed.
+
+    Features are read in one pass with their current totals and only rows
+    whose scores moved are written back.
+    """
+    window = conf.get("TRENDING_WINDOW_HOURS")
+    since = timezone.now() - timedelta(hours=window)
+    recent = dict(
+        Vote.objects.filter(created_at__gte=since)
+        .order_by()
+        .values("feature_id")
+        .annotate(votes=Count("id"))
+        .values_list("feature_id", "votes")
+    )
+    rows = (
+        Feature.objects.order_by()
+        .annotate(shard_total=counters.shard_sum())
+        .values_list(
+            "pk",
+            "created_at",
+            "vote_count",
+            "shard_total",
+            "hot_score",
+            "trending_score",
+        )
+    )
+    updated = 0
+    stale = []
+    for pk, created_at, vote_count, shard_total, hot, trending in rows.iterator(
+        chunk_size=batch_size
+    ):
+        new_hot = hot_score(vote_count + shard_total, created_at)
+        new_trending = recent.get(pk, 0) / window
+        if new_hot != hot or new_trending != trending:
+            stale.append(Feature(pk=pk, hot_score=new_hot, trending_score=new_trending))
+        if len(stale) == batch_size:
+            updated += Feature.objects.bulk_update(
+                stale, ["hot_score", "trending_score"]
+            )
+            stale = []
+    if stale:
+        updated += Feature.objects.bulk_update(stale, ["hot_score", "trending_score"])
+    if updated:
+        responsecache.invalidate()
+    return updated
+
+
+class FeatureRankingFilter(BaseFilterBackend):
+    """``?ordering=hot|trending`` for feature lists.
+
+    The view's keyset ordering switches to the chosen score columns; other
+    values keep the default vote ordering.
+    """
+
+    ordering_param = "ordering"
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = ORDERINGS.get(request.query_params.get(self.ordering_param))
+        if ordering is None:
+            return queryset
+        view.keyset_ordering = ordering
+        return queryset.order_by(*ordering)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.ordering_param,
+                "required": False,
+                "in": "query",
+                "description": "Order by time-decayed score (hot) or recent "
+                "vote velocity (trending) instead of total votes",
+                "schema": {"type": "string", "enum": list(ORDERINGS)},
+            }
+        ]
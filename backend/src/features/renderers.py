@@ -0,0 +1,41 @@
+"""
+JSON rendering through ``orjson`` when it is installed.
+
+``FastJSONRenderer`` produces exactly the bytes of DRF's ``JSONRenderer``
+with the default settings (compact, UTF-8, U+2028/U+2029 escaped) for data
+made of strings, integers, booleans, None, lists and string-keyed dicts,
+such as the fast feature list. Floats are not covered: ``orjson`` spells
+some differently and writes NaN as null, so responses that may hold them
+should keep ``JSONRenderer``. Whatever ``orjson`` refuses (indented output,
+other types, oversized integers) goes through ``JSONRenderer`` itself, as
+does everything when ``orjson`` is missing.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not api_settings.COMPACT_JSON
+            or not api_settings.UNICODE_JSON
+            or not api_settings.STRICT_JSON
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these two separators for JavaScript's sake.
+        return rendered.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
@@ -0,0 +1,221 @@
+"""
+Shared cache of feature list and detail responses.
+
+With ``RESPONSE_CACHE`` on, ``FeatureViewSet.list`` and ``retrieve`` keep
+what they serialize, together with its ETag stamps, in the
+``RESPONSE_CACHE_ALIAS`` cache. Entries hold the response an anonymous
+reader gets; for a signed-in reader the entry's ``has_voted`` flags are
+replaced from one indexed ``Vote`` lookup, so they share the same entries.
+
+Keys carry version numbers that are bumped after every commit that can
+change a response: vote changes (``vote_count_changed``, whichever path
+wrote them), feature saves and deletions, author renames, counter folds
+and ranking refreshes. Lists share one version, since a vote anywhere can
+reorder them; each feature's detail has its own. Versions start from the
+clock, so one evicted from the cache is never reused with stale entries.
+
+When an entry is missing, the first caller takes a short lock and builds
+it while the others wait for it, so a bump does not send every worker to
+the database at once.
+
+Every worker must see the same cache for bumps to reach it: the default
+local-memory cache only suits a single process (set ``CACHE_DIR`` to use
+a file cache shared on one host). The cache is bypassed while
+``VOTE_BUFFER`` is on, because queued votes are only visible to the
+process holding them.
+"""
+
+import hashlib
+import time
+from collections import Counter
+from typing import NamedTuple
+from uuid import UUID
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import conf
+from .models import Feature, Vote
+from .signals import vote_count_changed
+
+LISTS = "lists"
+# Interval at which callers waiting for another's build look for its entry.
+POLL_SECONDS = 0.01
+# User fields shown in feature responses.
+AUTHOR_FIELDS = {"username", "first_name", "last_name"}
+
+# Process-wide counters: "hits", "misses", and "waits" for lookups that
+# were served an entry built by another caller.
+stats = Counter()
+
+
+class Entry(NamedTuple):
+    data: object
+    stamps: list
+    many: bool
+
+
+def enabled():
+    return conf.get("RESPONSE_CACHE") and not conf.get("VOTE_BUFFER")
+
+
+def list_key(request):
+    """Return the cache key for the list page ``request`` asks for."""
+    url = hashlib.blake2b(request.build_absolute_uri().encode(), digest_size=16)
+    return f"features:response:list:{_version(LISTS)}:{url.hexdigest()}"
+
+
+def detail_key(pk):
+    """Return the cache key for a feature's detail, or None if ``pk`` is invalid."""
+    try:
+        pk = UUID(str(pk))
+    except ValueError:
+        return None
+    return f"features:response:detail:{pk}:{_version(pk)}"
+
+
+def entry(data, stamps, many):
+    """Return an ``Entry`` for a response, with the requester's votes removed."""
+
+    def anonymous(item):
+        return {**item, "has_voted": False}
+
+    if many:
+        data = {**data, "results": [anonymous(item) for item in data["results"]]}
+    else:
+        data = anonymous(data)
+    stamps = [
+        (pk, updated, votes, False, *rest) for pk, updated, votes, _, *rest in stamps
+    ]
+    return Entry(data, stamps, many)
+
+
+def fetch(key, build):
+    """Return the entry cached under ``key``, calling ``build`` on a miss.
+
+    ``build`` returns ``(entry, sharded)``; entries listing a feature with
+    sharded counters expire with the sharded total cache
+    (``SHARD_READ_CACHE_SECONDS``) instead of ``RESPONSE_CACHE_SECONDS``.
+    One caller at a time builds a missing entry; others wait up to
+    ``RESPONSE_CACHE_LOCK_SECONDS`` for it before building it themselves.
+    """
+    store = _cache()
+    cached = store.get(key)
+    if cached is not None:
+        stats["hits"] += 1
+        return cached
+
+    lock = f"{key}:lock"
+    wait = conf.get("RESPONSE_CACHE_LOCK_SECONDS")
+    locked = store.add(lock, 1, wait)
+    if not locked:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(POLL_SECONDS)
+            cached = store.get(key)
+            if cached is not None:
+                stats["waits"] += 1
+                return cached
+
+    stats["misses"] += 1
+    try:
+        built, sharded = build()
+        timeout = conf.get(
+            "SHARD_READ_CACHE_SECONDS" if sharded else "RESPONSE_CACHE_SECONDS"
+        )
+        store.set(key, built, timeout)
+    finally:
+        if locked:
+            store.delete(lock)
+    return built
+
+
+def personalize(cached, user):
+    """Return ``(data, stamps)`` for ``cached`` as ``user`` should see it."""
+    if not user.is_authenticated:
+        return cached.data, cached.stamps
+    voted = set(
+        Vote.objects.filter(
+            user_id=user.pk, feature_id__in=[stamp[0] for stamp in cached.stamps]
+        ).values_list("feature_id", flat=True)
+    )
+    if not voted:
+        return cached.data, cached.stamps
+
+    ids = {str(pk) for pk in voted}
+
+    def mark(item):
+        return {**item, "has_voted": True} if item["id"] in ids else item
+
+    if cached.many:
+        results = [mark(item) for item in cached.data["results"]]
+        data = {**cached.data, "results": results}
+    else:
+        data = mark(cached.data)
+    stamps = [
+        (pk, updated, votes, pk in voted, *rest)
+        for pk, updated, votes, _, *rest in cached.stamps
+    ]
+    return data, stamps
+
+
+def invalidate(feature_ids=()):
+    """Expire cached lists and the details of ``feature_ids`` on commit."""
+    if conf.get("RESPONSE_CACHE"):
+        scopes = [LISTS, *feature_ids]
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def _cache():
+    return caches[conf.get("RESPONSE_CACHE_ALIAS")]
+
+
+def _version_key(scope):
+    # Feature ids arrive as UUIDs or, from raw SQL, as strings.
+    return f"features:response-version:{scope if scope == LISTS else UUID(str(scope))}"
+
+
+def _version(scope):
+    store = _cache()
+    key = _version_key(scope)
+    version = store.get(key)
+    if version is None:
+        store.add(key, time.time_ns(), None)
+        version = store.get(key) or time.time_ns()
+    return version
+
+
+def _bump(scopes):
+    store = _cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            store.incr(key)
+        except ValueError:
+            # Evicted; restart from the clock, past any version handed out.
+            store.set(key, time.time_ns(), None)
+
+
+@receiver(vote_count_changed)
+def _on_vote_count_changed(sender, feature_id, **kwargs):
+    # Sent once the vote has committed.
+    if conf.get("RESPONSE_CACHE"):
+        _bump([LISTS, feature_id])
+
+
+@receiver(post_save, sender=Feature)
+@receiver(post_delete, sender=Feature)
+def _on_feature_changed(sender, instance, **kwargs):
+    invalidate([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def _on_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        # New users have no features; logins only save last_login.
+        return
+    if conf.get("RESPONSE_CACHE"):
+        invalidate(instance.authored_features.values_list("pk", flat=True))
@@ -0,0 +1,229 @@
+"""
+Hourly and daily vote rollups for vote-over-time charts.
+
+``catch_up`` runs in two steps. New votes are counted from ``Vote`` rows
+created since the previous run, bucketed on ``Vote.created_at``. Removed
+votes leave no row, so every vote write also logs a ``FeatureChange`` entry
+in its transaction, whatever path it takes (single votes, bulk votes, the
+write-behind buffer or reconciliation), and removals are logged as
+``UNVOTED``. For each feature named by the settled entries past a stored
+high-water mark, whatever its current total still differs from the sum of
+its rollups is charged one vote per removal entry to the bucket of that
+entry, and the rest (reconciliation, or entries compacted away) to the
+bucket of its latest entry. Vote writes themselves do no extra work, and
+because every run reconciles against the live total, a run that is late or
+finds entries compacted away folds the missed votes into a later bucket
+instead of losing them.
+
+``rebuild`` recomputes every bucket from ``Vote.created_at`` once, for
+backfilling; after that, rollup reads never touch ``Vote``.
+"""
+
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import changes, counters
+from .models import FeatureChange, Vote, VoteRollup, VoteRollupProgress
+
+# Most recent buckets returned by ``series`` for each period.
+POINTS = {VoteRollup.HOUR: 168, VoteRollup.DAY: 90}
+
+
+def truncate(moment, period):
+    """Return the start of the UTC hour or day containing ``moment``."""
+    moment = moment.astimezone(dt_timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+    return moment.replace(hour=0) if period == VoteRollup.DAY else moment
+
+
+def catch_up(batch_size=1000):
+    """Fold new votes and logged vote changes into the rollups.
+
+    Returns the number of features whose rollups changed.
+    """
+    rolled = set()
+    with transaction.atomic():
+        progress = _progress()
+        # Votes created up to the cutoff have committed, like settled entries.
+        until = changes.settle_cutoff()
+        votes = Vote.objects.filter(created_at__lte=until)
+        if progress.last_vote_at is not None:
+            votes = votes.filter(created_at__gt=progress.last_vote_at)
+        additions = {}
+        for period in POINTS:
+            buckets = (
+                votes.order_by()
+                .annotate(start=Trunc("created_at", period, tzinfo=dt_timezone.utc))
+                .values("feature_id", "start")
+                .annotate(votes=Count("id"))
+                .values_list("feature_id", "start", "votes")
+            )
+            for feature_id, start, count in buckets.iterator(chunk_size=batch_size):
+                additions[(feature_id, period, start)] = count
+                if len(additions) == batch_size:
+                    rolled |= _apply(additions)
+                    additions = {}
+        rolled |= _apply(additions)
+        progress.last_vote_at = until
+        progress.save(update_fields=["last_vote_at"])
+
+    while True:
+        with transaction.atomic():
+            progress = _progress()
+            entries = list(
+                changes.settled(until)
+                .filter(id__gt=progress.last_change_id)
+                .exclude(kind=FeatureChange.DELETED)
+                .order_by("id")
+                .values_list("id", "feature_id", "kind", "created_at")[:batch_size]
+            )
+            if not entries:
+                return len(rolled)
+            rolled |= _apply(_corrections(entries, until))
+            progress.last_change_id = entries[-1][0]
+            progress.save(update_fields=["last_change_id"])
+
+
+def _progress():
+    progress, _ = VoteRollupProgress.objects.select_for_update().get_or_create(pk=1)
+    return progress
+
+
+def _corrections(entries, until):
+    """Return ``{(feature_id, period, start): votes}`` still to be rolled up
+    for the features named by ``entries``."""
+    latest = {}
+    removals = {}
+    for _, feature_id, kind, at in entries:
+        latest[feature_id] = at
+        if kind == FeatureChange.UNVOTED:
+            removals.setdefault(feature_id, []).append(at)
+    totals = counters.totals(latest)
+    # Votes past the cutoff are left for the next run's additions.
+    later = dict(
+        Vote.objects.filter(feature_id__in=totals, created_at__gt=until)
+        .order_by()
+        .values("feature_id")
+        .annotate(votes=Count("id"))
+        .values_list("feature_id", "votes")
+    )
+    # Day rows sum to the same total as hour rows and are far fewer.
+    rolled = dict(
+        VoteRollup.objects.filter(feature_id__in=totals, period=VoteRollup.DAY)
+        .order_by()
+        .values("feature_id")
+        .annotate(votes=Sum("votes"))
+        .values_list("feature_id", "votes")
+    )
+    corrections = {}
+    for pk, total in totals.items():
+        remaining = total - later.get(pk, 0) - rolled.get(pk, 0)
+        # Each logged removal took away at least one vote.
+        charges = [(at, -1) for at in removals.get(pk, [])[: max(0, -remaining)]]
+        remaining += len(charges)
+        if remaining:
+            charges.append((latest[pk], remaining))
+        for at, votes in charges:
+            for period in POINTS:
+                key = (pk, period, truncate(at, period))
+                corrections[key] = corrections.get(key, 0) + votes
+    return corrections
+
+
+def _apply(deltas):
+    """Add ``{(feature_id, period, start): votes}`` to the rollups; return the
+    ids of the features that changed."""
+    deltas = {key: votes for key, votes in deltas.items() if votes}
+    if not deltas:
+        return set()
+    existing = {
+        (row.feature_id, row.period, row.start): row.votes
+        for row in VoteRollup.objects.filter(
+            feature_id__in={pk for pk, _, _ in deltas},
+            start__in={start for _, _, start in deltas},
+        )
+    }
+    VoteRollup.objects.bulk_create(
+        [
+            VoteRollup(
+                feature_id=pk,
+                period=period,
+                start=start,
+                votes=existing.get((pk, period, start), 0) + votes,
+            )
+            for (pk, period, start), votes in deltas.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["feature", "period", "start"],
+        update_fields=["votes"],
+    )
+    return {pk for pk, _, _ in deltas}
+
+
+def rebuild(batch_size=5000):
+    """Recompute all rollups from ``Vote`` rows. Returns the rows written.
+
+    The high-water mark moves to the end of the settled log, so the next
+    ``catch_up`` only handles later votes.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        mark = changes.settled().aggregate(latest=Max("id"))["latest"] or 0
+        VoteRollup.objects.all().delete()
+        written = 0
+        for period in POINTS:
+            buckets = (
+                Vote.objects.filter(created_at__lte=now)
+                .order_by()
+                .annotate(start=Trunc("created_at", period, tzinfo=dt_timezone.utc))
+                .values("feature_id", "start")
+                .annotate(votes=Count("id"))
+                .values_list("feature_id", "start", "votes")
+            )
+            rows = []
+            for feature_id, start, votes in buckets.iterator(chunk_size=batch_size):
+                rows.append(
+                    VoteRollup(
+                        feature_id=feature_id, period=period, start=start, votes=votes
+                    )
+                )
+                if len(rows) == batch_size:
+                    written += len(VoteRollup.objects.bulk_create(rows))
+                    rows = []
+            written += len(VoteRollup.objects.bulk_create(rows))
+        VoteRollupProgress.objects.update_or_create(
+            pk=1, defaults={"last_change_id": mark, "last_vote_at": now}
+        )
+    return written
+
+
+def series(feature_id, period):
+    """Return ``[(start, votes, total)]`` for a feature's latest buckets.
+
+    Buckets in which the feature's votes did not change are omitted;
+    ``total`` is the running vote total at the end of each bucket.
+    """
+    rows = list(
+        VoteRollup.objects.filter(feature_id=feature_id, period=period)
+        .order_by("-start")
+        .values_list("start", "votes")[: POINTS[period]]
+    )
+    if not rows:
+        return []
+    rows.reverse()
+    running = (
+        VoteRollup.objects.filter(
+            feature_id=feature_id, period=period, start__lt=rows[0][0]
+        ).aggregate(total=Sum("votes"))["total"]
+        or 0
+    )
+    points = []
+    for start, votes in rows:
+        running += votes
+        points.append((start, votes, running))
+    return points
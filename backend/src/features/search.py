@@ -0,0 +1,207 @@
+"""
+Full-text search over feature titles and descriptions.
+
+PostgreSQL matches a weighted ``tsvector`` expression (title above
+description) covered by the GIN index ``feature_search_idx`` and ranks
+results with ``ts_rank``. SQLite keeps an FTS5 shadow table,
+``features_feature_fts``, updated from Feature save and delete signals.
+FTS5 rows are keyed by integers, so ``features_feature_fts_ids`` gives each
+feature a ``rowid`` of its own from an AUTOINCREMENT key. Other databases
+fall back to ``icontains`` scans.
+
+The index and shadow table are created after ``migrate`` (see
+``ensure_index``) because they cannot be expressed as model fields.
+Features written without signals, such as by ``bulk_create``, reach the
+SQLite table through the ``rebuild_search_index`` command.
+"""
+
+import re
+
+from django.db import connections, router, transaction
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Feature
+
+FTS_TABLE = "features_feature_fts"
+FTS_IDS_TABLE = "features_feature_fts_ids"
+PG_INDEX = "feature_search_idx"
+
+_PG_VECTOR = (
+    "setweight(to_tsvector('english', {prefix}title), 'A') || "
+    "setweight(to_tsvector('english', {prefix}description), 'B')"
+)
+_PG_QUERY = "websearch_to_tsquery('english', %s)"
+
+
+def _connection():
+    return connections[router.db_for_write(Feature)]
+
+
+def _pg_vector(connection, qualified=True):
+    table = connection.ops.quote_name(Feature._meta.db_table)
+    return _PG_VECTOR.format(prefix=f"{table}." if qualified else "")
+
+
+def matching(queryset, query):
+    """Restrict ``queryset`` to features matching ``query``.
+
+    On PostgreSQL the result is annotated with ``search_rank``.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        vector = _pg_vector(connection)
+        return queryset.filter(
+            RawSQL(f"({vector}) @@ {_PG_QUERY}", [query], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({vector}, {_PG_QUERY})", [query], output_field=FloatField()
+            )
+        )
+    if connection.vendor == "sqlite":
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return queryset.none()
+        # Quoting every term keeps FTS5 operators in user input literal.
+        match = " ".join(f'"{term}"' for term in terms)
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT feature_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [match],
+            )
+        )
+    return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query))
+
+
+class FeatureSearchFilter(BaseFilterBackend):
+    """``?search=`` filter for feature lists backed by the text index.
+
+    When results are ranked, the view's keyset ordering switches to rank.
+    """
+
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+        queryset = matching(queryset, query)
+        if "search_rank" in queryset.query.annotations:
+            view.keyset_ordering = ("-search_rank", "-id")
+            queryset = queryset.order_by(*view.keyset_ordering)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Full-text search over titles and descriptions",
+                "schema": {"type": "string"},
+            }
+        ]
+
+
+def ensure_index(using=None):
+    """Create the search index or shadow table if it does not exist yet."""
+    connection = connections[using] if using else _connection()
+    table = connection.ops.quote_name(Feature._meta.db_table)
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        if Feature._meta.db_table not in tables:
+            return  # Not migrated yet.
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {table} "
+                f"USING GIN (({_pg_vector(connection, qualified=False)}))"
+            )
+        elif connection.vendor == "sqlite":
+            if FTS_TABLE in tables and FTS_IDS_TABLE in tables:
+                return
+            # A shadow table from before the id table existed is keyed by
+            # hashed ids that may collide, so it is replaced.
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "feature_id UNINDEXED, title, description, "
+                "tokenize='porter unicode61')"
+            )
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {FTS_IDS_TABLE} ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "feature_id CHAR(32) NOT NULL UNIQUE)"
+            )
+    if connection.vendor == "sqlite":
+        rebuild(connection.alias)
+
+
+def create_index_after_migrate(sender, using, **kwargs):
+    ensure_index(using)
+
+
+def rebuild(using=None):
+    """Refill the SQLite shadow table from the Feature table.
+
+    Returns the number of features indexed (0 on other databases).
+    """
+    connection = connections[using] if using else _connection()
+    if connection.vendor != "sqlite":
+        return 0
+    table = connection.ops.quote_name(Feature._meta.db_table)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        # Features keep their rowids across rebuilds; deleted ones give
+        # theirs up for good.
+        cursor.execute(
+            f"DELETE FROM {FTS_IDS_TABLE} "
+            f"WHERE feature_id NOT IN (SELECT id FROM {table})"
+        )
+        cursor.execute(
+            f"INSERT OR IGNORE INTO {FTS_IDS_TABLE} (feature_id) SELECT id FROM {table}"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, feature_id, title, description) "
+            f"SELECT ids.id, feature.id, feature.title, feature.description "
+            f"FROM {table} feature JOIN {FTS_IDS_TABLE} ids "
+            "ON ids.feature_id = feature.id"
+        )
+        return cursor.rowcount
+
+
+@receiver(post_save, sender=Feature)
+def _index_feature(sender, instance, using, **kwargs):
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        feature_id = Feature._meta.pk.get_db_prep_value(instance.pk, connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT OR IGNORE INTO {FTS_IDS_TABLE} (feature_id) VALUES (%s)",
+                [feature_id],
+            )
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {FTS_TABLE} "
+                "(rowid, feature_id, title, description) "
+                f"SELECT id, feature_id, %s, %s FROM {FTS_IDS_TABLE} "
+                "WHERE feature_id = %s",
+                [instance.title, instance.description, feature_id],
+            )
+
+
+@receiver(post_delete, sender=Feature)
+def _unindex_feature(sender, instance, using, **kwargs):
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        feature_id = Feature._meta.pk.get_db_prep_value(instance.pk, connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                f"(SELECT id FROM {FTS_IDS_TABLE} WHERE feature_id = %s)",
+                [feature_id],
+            )
+            cursor.execute(
+                f"DELETE FROM {FTS_IDS_TABLE} WHERE feature_id = %s", [feature_id]
+            )
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from drf_spectacular.utils import extend_schema_field
+from . import buffer, conf, counters
 from .models import Feature
 
 
@@ -59,17 +60,21 @@ class FeatureSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.IntegerField)
     def get_vote_count(self, obj: Feature) -> int:
-        """Get the current vote count."""
-        # Use annotated field if available, otherwise count votes
-        if hasattr(obj, "vote_count") and isinstance(obj.vote_count, int):
-            return obj.vote_count
-        return obj.votes.count()
+        """Get the current vote count, including shards and queued votes."""
+        return counters.total(obj) + buffer.pending_delta(obj.pk)
 
     @extend_schema_field(serializers.BooleanField)
     def get_has_voted(self, obj: Feature) -> bool:
         """Check if the current user has voted for this feature."""
         request = self.context.get("request")
         if request and request.user.is_authenticated:
+            queued = buffer.voted(obj.pk, request.user.pk)
+            if queued is not None:
+                return queued
+            # Annotated by FeatureViewSet.get_queryset for list/detail reads.
+            annotated = getattr(obj, "user_has_voted", None)
+            if annotated is not None:
+                return annotated
             return obj.has_user_voted(request.user)
         return False
 
@@ -78,3 +83,37 @@ class FeatureSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         validated_data["author"] = request.user
         return super().create(validated_data)
+
+
+class BulkVoteSerializer(serializers.Serializer):
+    """Input for voting on several features in one request."""
+
+    upvote = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        default=list,
+        help_text="IDs of features to upvote",
+    )
+    remove = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        default=list,
+        help_text="IDs of features to remove your vote from",
+    )
+
+    def validate(self, attrs):
+        upvote, remove = set(attrs["upvote"]), set(attrs["remove"])
+        if not upvote and not remove:
+            raise serializers.ValidationError(
+                "Provide at least one feature ID in upvote or remove"
+            )
+        if upvote & remove:
+            raise serializers.ValidationError(
+                "A feature cannot be in both upvote and remove"
+            )
+        limit = conf.get("BULK_VOTE_MAX_FEATURES")
+        if len(upvote) + len(remove) > limit:
+            raise serializers.ValidationError(
+                f"At most {limit} features can be voted on per request"
+            )
+        return attrs
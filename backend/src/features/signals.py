@@ -0,0 +1,5 @@
+import django.dispatch
+
+# Sent after a vote change commits, with ``feature_id`` and the feature's new
+# total ``vote_count``. Bulk paths send one signal per touched feature.
+vote_count_changed = django.dispatch.Signal()
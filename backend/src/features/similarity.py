@@ -0,0 +1,137 @@
+"""
+Duplicate detection for feature titles.
+
+Titles are reduced to sets of character trigrams and summarised with a
+MinHash signature of ``BANDS * ROWS`` values. Each band of ``ROWS`` values
+is hashed into a ``FeatureSimilarityBucket`` row, so titles whose trigram
+sets are similar (Jaccard above roughly ``(1 / BANDS) ** (1 / ROWS)``) very
+likely share a bucket. A lookup reads the handful of features sharing a
+bucket with the query and scores only those exactly, instead of comparing
+the query with every title.
+
+Buckets are rewritten whenever a feature is saved and removed with it by
+cascade. ``rebuild_similarity_index`` fills them for features written
+without signals, such as by ``bulk_create``.
+"""
+
+import hashlib
+import random
+import re
+import zlib
+
+from django.db.models import Count
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import conf, counters
+from .models import Feature, FeatureSimilarityBucket
+
+BANDS = 10
+ROWS = 3
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # Fixed so every process hashes alike.
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(BANDS * ROWS)
+]
+# Candidates scored exactly per lookup; the best-connected are kept.
+MAX_CANDIDATES = 100
+
+
+def shingles(title):
+    """Return the set of character trigrams of a normalised title."""
+    text = " ".join(re.findall(r"\w+", title.lower()))
+    if len(text) < 3:
+        return {text} if text else set()
+    padded = f" {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def jaccard(a, b):
+    """Return the Jaccard similarity of two shingle sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def buckets(shingle_set):
+    """Return the LSH bucket keys for a set of shingles."""
+    if not shingle_set:
+        return []
+    hashed = [zlib.crc32(shingle.encode()) for shingle in shingle_set]
+    signature = [min((a * x + b) % _PRIME for x in hashed) for a, b in _PERMUTATIONS]
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(repr((band, values)).encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def similar(title, limit=5, exclude=None):
+    """Return up to ``limit`` features whose titles resemble ``title``.
+
+    Each result is a ``(feature, similarity)`` pair, most similar first;
+    only features at or above ``DUPLICATE_SIMILARITY`` are returned.
+    """
+    query = shingles(title)
+    keys = buckets(query)
+    if not keys:
+        return []
+    candidates = FeatureSimilarityBucket.objects.filter(bucket__in=keys)
+    if exclude is not None:
+        candidates = candidates.exclude(feature_id=exclude)
+    candidates = (
+        candidates.values("feature_id")
+        .annotate(hits=Count("id"))
+        .order_by("-hits")
+        .values_list("feature_id", flat=True)[:MAX_CANDIDATES]
+    )
+    features = Feature.objects.filter(pk__in=list(candidates)).only(
+        "id", "title", "vote_count", "counter_shards"
+    )
+    threshold = conf.get("DUPLICATE_SIMILARITY")
+    scored = [
+        (feature, score)
+        for feature in features
+        if (score := jaccard(query, shingles(feature.title))) >= threshold
+    ]
+    scored.sort(key=lambda pair: (-pair[1], -counters.total(pair[0])))
+    return scored[:limit]
+
+
+def index(feature):
+    """Replace the buckets stored for ``feature``."""
+    FeatureSimilarityBucket.objects.filter(feature=feature).delete()
+    FeatureSimilarityBucket.objects.bulk_create(
+        [
+            FeatureSimilarityBucket(feature=feature, bucket=key)
+            for key in set(buckets(shingles(feature.title)))
+        ]
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recompute buckets for every feature. Returns the number indexed."""
+    FeatureSimilarityBucket.objects.all().delete()
+    titles = Feature.objects.order_by().values_list("pk", "title")
+    count = 0
+    rows = []
+    for pk, title in titles.iterator(chunk_size=batch_size):
+        rows.extend(
+            FeatureSimilarityBucket(feature_id=pk, bucket=key)
+            for key in set(buckets(shingles(title)))
+        )
+        count += 1
+        if len(rows) >= batch_size * BANDS:
+            FeatureSimilarityBucket.objects.bulk_create(rows)
+            rows = []
+    FeatureSimilarityBucket.objects.bulk_create(rows)
+    return count
+
+
+@receiver(post_save, sender=Feature)
+def _index_feature(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index(instance)
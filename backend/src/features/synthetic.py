@@ -0,0 +1,279 @@
+"""
+Synthetic users, features and votes at production scale.
+
+``generate`` writes as many rows as asked for, with the skew that makes
+real data slow: feature popularity follows a Zipf distribution (a few
+features collect most votes), authorship is concentrated in a few users,
+features are weighted towards recent days and each feature's votes arrive
+in bursts after it is created. Output depends only on the seed, sizes and
+the users already present.
+
+Rows are written in large batches of plain ``INSERT`` statements, or with
+``COPY`` on PostgreSQL, with ids, timestamps, ``vote_count`` and
+``hot_score`` set directly and a single password hash shared by every
+user. Neither goes through the model layer, so ``auto_now`` fields keep
+the generated times and signals do not run: the similarity and search
+indexes, trending scores and rollups are left for their rebuild commands.
+"""
+
+import csv
+import io
+import math
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Feature, Vote
+from .rankings import hot_score
+
+# Exponent of the Zipf distribution of votes over features.
+ZIPF_EXPONENT = 1.1
+# Typical length of one burst of votes on a feature.
+BURST_SECONDS = 2 * 3600
+
+_WORDS = (
+    "dark mode offline sync export import search filter sort tag share "
+    "notification reminder calendar widget shortcut theme profile avatar "
+    "comment reaction mention draft archive history undo template report "
+    "chart dashboard api webhook integration backup upload preview"
+).split()
+
+
+class Writer:
+    """Buffer rows of one model and write them ``batch_size`` at a time.
+
+    Rows are tuples of values for ``fields``; ``progress`` is called with
+    the number of rows written so far after every batch. A writer whose
+    rows refer to another's flushes that one first.
+    """
+
+    def __init__(self, model, fields, batch_size, progress, refers_to=None):
+        self.model = model
+        self.refers_to = refers_to
+        self.fields = [model._meta.get_field(name) for name in fields]
+        self.batch_size = batch_size
+        self.progress = progress
+        self.rows = []
+        self.written = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.refers_to is not None:
+            self.refers_to.flush()
+        if connection.vendor == "postgresql":
+            self._copy()
+        else:
+            self._insert()
+        self.written += len(self.rows)
+        self.rows = []
+        self.progress(self.written)
+
+    def _prepared(self, row):
+        return [
+            field.get_db_prep_value(value, connection) if value is not None else None
+            for field, value in zip(self.fields, row)
+        ]
+
+    def _columns(self):
+        return ", ".join(connection.ops.quote_name(f.column) for f in self.fields)
+
+    def _copy(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in self.rows:
+            writer.writerow(self._prepared(row))
+        buffer.seek(0)
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table} ({self._columns()}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+    def _insert(self):
+        # Not bulk_create: it fills auto_now and auto_now_add fields with
+        # the current time, whatever the rows say.
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        placeholders = ", ".join(["%s"] * len(self.fields))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} ({self._columns()}) VALUES ({placeholders})",
+                [self._prepared(row) for row in self.rows],
+            )
+
+
+def generate(
+    users,
+    features,
+    votes,
+    seed=0,
+    days=180,
+    batch_size=10000,
+    password="loadtest",
+    report=print,
+):
+    """Write ``users`` users, ``features`` features and about ``votes`` votes.
+
+    ``report`` receives progress lines. Returns the number of votes written.
+    """
+    if users < 2 and votes:
+        raise ValueError("Votes need at least two users")
+    if features and not users:
+        raise ValueError("Features need at least one user")
+    now = timezone.now()
+    first_user = (User.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+    # Reruns into a filled database add different rows rather than clash.
+    rng = random.Random(f"{seed}:{first_user}")
+
+    _users(rng, first_user, users, days, now, password, batch_size, report)
+    counts = _vote_counts(rng, features, votes, users - 1)
+    written = _features_and_votes(
+        rng, first_user, users, counts, days, now, batch_size, report
+    )
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [User]):
+            cursor.execute(sql)
+    return written
+
+
+def _users(rng, first_id, count, days, now, password, batch_size, report):
+    encoded = make_password(password)  # Hashing is the slow part; do it once.
+    writer = Writer(
+        User,
+        [
+            "id",
+            "username",
+            "email",
+            "password",
+            "first_name",
+            "last_name",
+            "is_active",
+            "is_staff",
+            "is_superuser",
+            "date_joined",
+        ],
+        batch_size,
+        _progress("users", count, report),
+    )
+    for user_id in range(first_id, first_id + count):
+        joined = now - timedelta(days=days * (1 + rng.random()))
+        writer.add(
+            (
+                user_id,
+                f"loaduser{user_id}",
+                f"loaduser{user_id}@example.com",
+                encoded,
+                "",
+                "",
+                True,
+                False,
+                False,
+                joined,
+            )
+        )
+    writer.flush()
+
+
+def _vote_counts(rng, features, votes, max_votes):
+    """Return per-feature vote counts following a Zipf distribution."""
+    if not features:
+        return []
+    norm = sum(1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(features))
+    counts = [
+        min(
+            max_votes,
+            int(votes * (1 / (rank + 1) ** ZIPF_EXPONENT) / norm + rng.random()),
+        )
+        for rank in range(features)
+    ]
+    rng.shuffle(counts)  # Popularity is unrelated to creation order.
+    return counts
+
+
+def _features_and_votes(rng, first_user, users, counts, days, now, batch_size, report):
+    feature_writer = Writer(
+        Feature,
+        [
+            "id",
+            "title",
+            "description",
+            "author",
+            "vote_count",
+            "counter_shards",
+            "hot_score",
+            "trending_score",
+            "created_at",
+            "updated_at",
+        ],
+        batch_size,
+        _progress("features", len(counts), report),
+    )
+    vote_writer = Writer(
+        Vote,
+        ["feature", "user", "created_at"],
+        batch_size,
+        _progress("votes", sum(counts), report),
+        refers_to=feature_writer,
+    )
+    for count in counts:
+        feature_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+        # Weighted towards recent features, and towards prolific authors.
+        created = now - timedelta(days=days * rng.random() ** 2)
+        author = first_user + int(users * rng.random() ** 3)
+        words = rng.sample(_WORDS, 3)
+        feature_writer.add(
+            (
+                feature_id,
+                f"{words[0].capitalize()} {words[1]} {words[2]}",
+                " ".join(rng.choices(_WORDS, k=rng.randint(0, 40))),
+                author,
+                count,
+                0,
+                hot_score(count, created),
+                0.0,
+                created,
+                created,
+            )
+        )
+
+        if not count:
+            continue
+        span = (now - created).total_seconds()
+        bursts = [rng.random() * span for _ in range(1 + int(math.log2(count)))]
+        voters = rng.sample(range(users - 1), count)
+        for offset in voters:
+            voter = first_user + offset
+            if voter >= author:
+                voter += 1  # Skip the author.
+            at = min(span, rng.choice(bursts) + rng.expovariate(1 / BURST_SECONDS))
+            vote_writer.add((feature_id, voter, created + timedelta(seconds=at)))
+    feature_writer.flush()
+    vote_writer.flush()
+    return vote_writer.written
+
+
+def _progress(label, total, report):
+    started = time.perf_counter()
+
+    def progress(written):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        report(
+            f"{label}: {written:,}/{total:,} "
+            f"({written / elapsed:,.0f} rows/s, {elapsed:.1f}s)"
+        )
+
+    return progress
@@ -1,9 +1,23 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from io import StringIO
+from uuid import UUID, uuid4
+from django.db import connection
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
-from django.urls import reverse
+from django.core.management import call_command
+from django.urls import resolve, reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Feature, Vote
+from monitoring import metrics
+from . import async_views, benchmarks, buffer, changes, counters, leaderboard, live
+from . import loadtest, rankings, responsecache, rollups, search, similarity, voting
+from .models import Feature, FeatureChange, Vote, VoteCounterShard, VoteRollup
+from .signals import vote_count_changed
 
 
 class FeatureModelTest(TestCase):
@@ -37,6 +51,32 @@ class FeatureModelTest(TestCase):
         self.assertFalse(result)  # Should return False for duplicate vote
         self.assertEqual(self.feature.vote_count, 1)
 
+    def test_vote_count_is_stored(self):
+        """Test that upvote/remove_vote keep the stored vote count in step."""
+        other_user = User.objects.create_user(
+            username="otheruser", password="testpass123"
+        )
+
+        self.feature.upvote(other_user)
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 1)
+
+        self.assertTrue(self.feature.remove_vote(other_user))
+        self.assertEqual(self.feature.vote_count, 0)
+        self.assertFalse(self.feature.remove_vote(other_user))
+        self.assertEqual(Feature.objects.get(pk=self.feature.pk).vote_count, 0)
+
+    def test_saving_a_stale_instance_keeps_the_vote_count(self):
+        """Test that an edit loaded before a vote does not undo the vote."""
+        stale = Feature.objects.get(pk=self.feature.pk)
+        self.feature.upvote(User.objects.create_user(username="otheruser"))
+        stale.title = "Edited"
+        stale.save()
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.title, "Edited")
+        self.assertEqual(self.feature.vote_count, 1)
+
     def test_has_user_voted(self):
         """Test checking if user has voted."""
         other_user = User.objects.create_user(
@@ -48,6 +88,146 @@ class FeatureModelTest(TestCase):
         self.assertTrue(self.feature.has_user_voted(other_user))
 
 
+class ReconcileVoteCountsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="author", password="pw123456")
+        self.voter = User.objects.create_user(username="voter", password="pw123456")
+        self.feature = Feature.objects.create(title="Drifted", author=self.user)
+        self.feature.upvote(self.voter)
+
+    def test_repairs_drift(self):
+        """Test that drifted counters are recomputed from the Vote table."""
+        Feature.objects.filter(pk=self.feature.pk).update(vote_count=7)
+
+        out = StringIO()
+        call_command("reconcile_vote_counts", batch_size=1, stdout=out)
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 1)
+        self.assertIn("Repaired 1 drifted", out.getvalue())
+
+    def test_dry_run_leaves_counts(self):
+        """Test that --dry-run only reports drift."""
+        Feature.objects.filter(pk=self.feature.pk).update(vote_count=7)
+
+        call_command("reconcile_vote_counts", dry_run=True, stdout=StringIO())
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 7)
+
+
+class FeatureAdminTest(TestCase):
+    def setUp(self):
+        counters.reset()
+        cache.clear()
+        self.author = User.objects.create(username="author")
+        self.voters = [User.objects.create(username=f"voter{i}") for i in range(3)]
+        self.plain = Feature.objects.create(title="Plain", author=self.author)
+        self.sharded = Feature.objects.create(title="Sharded", author=self.author)
+        counters.promote(self.sharded.pk, shards=4)
+        for voter in self.voters:
+            self.plain.upvote(voter)
+            self.sharded.upvote(voter)
+        self.client.force_login(
+            User.objects.create(username="admin", is_staff=True, is_superuser=True)
+        )
+
+    def test_reset_votes_action(self):
+        """Test that resetting deletes the votes and zeroes every counter."""
+        response = self.client.post(
+            reverse("admin:features_feature_changelist"),
+            {
+                "action": "reset_votes",
+                "_selected_action": [self.plain.pk, self.sharded.pk],
+            },
+            follow=True,
+        )
+        self.assertContains(response, "removed 6 vote(s) from 2 feature(s)")
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(
+            counters.totals([self.plain.pk, self.sharded.pk]),
+            {self.plain.pk: 0, self.sharded.pk: 0},
+        )
+        self.assertTrue(self.plain.upvote(self.voters[0]))
+
+
+class ShardedCounterTest(TestCase):
+    def setUp(self):
+        counters.reset()
+        cache.clear()
+        self.author = User.objects.create(username="author")
+        self.voters = [User.objects.create(username=f"voter{i}") for i in range(3)]
+        self.feature = Feature.objects.create(title="Viral", author=self.author)
+
+    def shard_sum(self):
+        return VoteCounterShard.objects.filter(feature=self.feature).aggregate(
+            total=Sum("count")
+        )["total"]
+
+    def test_votes_go_to_shards(self):
+        """Test that sharded votes bypass the feature row but sum correctly."""
+        counters.promote(self.feature.pk, shards=4)
+        for voter in self.voters:
+            self.assertTrue(self.feature.upvote(voter))
+        self.assertEqual(self.feature.vote_count, 3)
+        self.assertTrue(self.feature.remove_vote(self.voters[0]))
+        self.assertEqual(self.feature.vote_count, 2)
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.counter_shards, 4)
+        self.assertEqual(self.feature.vote_count, 0)
+        self.assertEqual(self.shard_sum(), 2)
+        self.assertEqual(counters.total(self.feature), 2)
+
+    def test_saving_a_stale_instance_keeps_sharding(self):
+        """Test that an edit loaded before promotion does not unshard."""
+        stale = Feature.objects.get(pk=self.feature.pk)
+        counters.promote(self.feature.pk, shards=4)
+        self.feature.upvote(self.voters[0])
+        Feature.objects.filter(pk=self.feature.pk).update(hot_score=5.0)
+        stale.title = "Edited"
+        stale.save()
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.counter_shards, 4)
+        self.assertEqual(self.feature.hot_score, 5.0)
+        cache.clear()
+        self.assertEqual(counters.total(self.feature), 1)
+
+    def test_fold_moves_shard_totals(self):
+        """Test folding shards into the feature row, with demotion."""
+        counters.promote(self.feature.pk, shards=4)
+        for voter in self.voters:
+            self.feature.upvote(voter)
+
+        call_command("fold_vote_shards", demote=True, stdout=StringIO())
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 3)
+        self.assertEqual(self.feature.counter_shards, 0)
+        self.assertIsNone(self.shard_sum())
+
+    def test_reconcile_accounts_for_shards(self):
+        """Test that shard counts are not reported as drift."""
+        counters.promote(self.feature.pk, shards=4)
+        for voter in self.voters:
+            self.feature.upvote(voter)
+
+        out = StringIO()
+        call_command("reconcile_vote_counts", stdout=out)
+        self.assertIn("Repaired 0 drifted", out.getvalue())
+
+    @override_settings(FEATURE_VOTING={"SHARD_PROMOTION_RATE": 2, "VOTE_SHARDS": 4})
+    def test_automatic_promotion(self):
+        """Test that a feature is promoted once its write rate crosses the limit."""
+        for voter in self.voters:
+            self.feature.upvote(voter)
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.counter_shards, 4)
+        self.assertEqual(self.feature.vote_count + self.shard_sum(), 3)
+
+
 class FeatureAPITest(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -62,7 +242,8 @@ class FeatureAPITest(APITestCase):
         url = reverse("feature-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
 
     def test_create_feature_authenticated(self):
         """Test creating a feature when authenticated."""
@@ -102,6 +283,1127 @@ class FeatureAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("cannot vote for your own feature", response.data["error"])
 
+    def test_upvote_twice(self):
+        """Test that a repeated upvote is rejected without changing the count."""
+        other_user = User.objects.create_user(
+            username="otheruser", password="testpass123"
+        )
+        self.client.force_authenticate(user=other_user)
+
+        url = reverse("feature-upvote", kwargs={"pk": self.feature.pk})
+        self.client.post(url)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("already voted", response.data["error"])
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 1)
+
+    def test_upvote_missing_feature(self):
+        """Test that upvoting an unknown feature returns 404."""
+        self.client.force_authenticate(user=self.user)
+        url = reverse(
+            "feature-upvote", kwargs={"pk": "00000000-0000-0000-0000-000000000000"}
+        )
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_remove_vote(self):
+        """Test removing a vote and removing it again."""
+        other_user = User.objects.create_user(
+            username="otheruser", password="testpass123"
+        )
+        self.feature.upvote(other_user)
+        self.client.force_authenticate(user=other_user)
+
+        url = reverse("feature-remove-vote", kwargs={"pk": self.feature.pk})
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["vote_count"], 0)
+        self.assertFalse(response.data["has_voted"])
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkVoteTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.voter = User.objects.create(username="voter")
+        self.features = [
+            Feature.objects.create(title=f"Pick {i}", author=self.author)
+            for i in range(3)
+        ]
+        self.own = Feature.objects.create(title="Mine", author=self.voter)
+        self.client.force_authenticate(user=self.voter)
+        self.url = reverse("feature-bulk-vote")
+
+    def test_bulk_vote(self):
+        """Test per-feature outcomes and counts from one bulk request."""
+        self.features[0].upvote(self.voter)
+        self.features[2].upvote(self.voter)
+        missing = "00000000-0000-0000-0000-000000000000"
+        with self.assertNumQueries(7):
+            response = self.client.post(
+                self.url,
+                {
+                    "upvote": [
+                        str(self.features[0].pk),
+                        str(self.features[1].pk),
+                        str(self.own.pk),
+                        missing,
+                    ],
+                    "remove": [str(self.features[2].pk)],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {row["id"]: row for row in response.data["results"]}
+        self.assertEqual(results[str(self.features[0].pk)]["outcome"], "already_voted")
+        self.assertEqual(results[str(self.features[1].pk)]["outcome"], "voted")
+        self.assertEqual(results[str(self.features[1].pk)]["vote_count"], 1)
+        self.assertEqual(results[str(self.features[2].pk)]["outcome"], "unvoted")
+        self.assertEqual(results[str(self.features[2].pk)]["vote_count"], 0)
+        self.assertEqual(results[str(self.own.pk)]["outcome"], "own_feature")
+        self.assertEqual(results[missing]["outcome"], "not_found")
+        self.assertEqual(
+            set(Vote.objects.values_list("feature_id", flat=True)),
+            {self.features[0].pk, self.features[1].pk},
+        )
+
+    def test_bulk_vote_validation(self):
+        """Test that empty and contradictory requests are rejected."""
+        response = self.client.post(self.url, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        pk = str(self.features[0].pk)
+        response = self.client.post(
+            self.url, {"upvote": [pk], "remove": [pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_overlapping_ids_are_rejected(self):
+        """Test that an id in both lists, however spelled, votes on nothing."""
+        pk = self.features[0].pk
+        response = self.client.post(
+            self.url,
+            {"upvote": [str(pk), str(self.features[1].pk)], "remove": [pk.hex.upper()]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("both upvote and remove", str(response.data))
+        self.assertFalse(Vote.objects.exists())
+
+
+class ConcurrentVoteTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pw123456")
+        self.feature = Feature.objects.create(title="Viral", author=self.author)
+        self.voters = [User.objects.create(username=f"voter{i}") for i in range(8)]
+
+    def _fire(self, calls):
+        """Run ``calls`` in parallel threads and collect outcomes or errors."""
+        barrier = threading.Barrier(len(calls))
+        outcomes, errors = [], []
+
+        def worker(func, *args):
+            try:
+                barrier.wait()
+                outcomes.append(func(*args).outcome)
+            except Exception as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=call) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return outcomes
+
+    def test_parallel_votes(self):
+        """Test parallel votes, including double-taps, never error or drift."""
+        calls = [
+            (voting.cast_vote, self.feature.pk, voter.pk)
+            for voter in self.voters
+            for _ in range(2)
+        ]
+        outcomes = self._fire(calls)
+
+        self.assertEqual(outcomes.count(voting.VOTED), len(self.voters))
+        self.assertEqual(outcomes.count(voting.ALREADY_VOTED), len(self.voters))
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, len(self.voters))
+        self.assertEqual(self.feature.votes.count(), len(self.voters))
+
+    def test_parallel_removals(self):
+        """Test that racing removals decrement the counter exactly once."""
+        voter = self.voters[0]
+        self.feature.upvote(voter)
+
+        outcomes = self._fire(
+            [(voting.retract_vote, self.feature.pk, voter.pk) for _ in range(4)]
+        )
+
+        self.assertEqual(outcomes.count(voting.UNVOTED), 1)
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 0)
+
+
+class FeatureListQueryCountTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.voter = User.objects.create(username="voter")
+        self.client.force_authenticate(user=self.voter)
+
+    def add_features(self, count):
+        for i in range(count):
+            feature = Feature.objects.create(title=f"Feature {i}", author=self.author)
+            if i % 2:
+                feature.upvote(self.voter)
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("feature-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_query_count_independent_of_page_length(self):
+        """Test that has_voted does not cost a query per feature."""
+        self.add_features(2)
+        few, _ = self.list_queries()
+        self.add_features(10)
+        many, response = self.list_queries()
+
+        self.assertEqual(few, many)
+        self.assertEqual(few, 1)
+        voted = [item["has_voted"] for item in response.data["results"]]
+        self.assertEqual(voted.count(True), 6)
+
+
+class FastFeatureListTest(APITestCase):
+    def setUp(self):
+        author = User.objects.create(
+            username="author", first_name="Zoë", last_name="O\u2028Brien"
+        )
+        self.voter = User.objects.create(username="voter")
+        for i, description in enumerate(["", "Line\nbreak \"quoted\"", "Emoji 🚀"]):
+            feature = Feature.objects.create(
+                title=f"Feature {i} \u2029", description=description, author=author
+            )
+            if i:
+                feature.upvote(self.voter)
+        counters.promote(feature.pk)
+        feature.upvote(User.objects.create(username="other"))
+
+    def responses(self, params):
+        url = reverse("feature-list")
+        slow = self.client.get(url, params)
+        with override_settings(FEATURE_VOTING={"FAST_FEATURE_LIST": True}):
+            fast = self.client.get(url, params)
+        return slow, fast
+
+    def test_matches_serializer_output(self):
+        """Test that the fast path returns the serializer's exact bytes."""
+        for user in (None, self.voter):
+            self.client.force_authenticate(user=user)
+            for params in ({}, {"page_size": 2}, {"ordering": "hot"}):
+                slow, fast = self.responses(params)
+                self.assertEqual(fast.status_code, status.HTTP_200_OK)
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast["ETag"], slow["ETag"])
+                self.assertIs(type(fast.data["results"][0]), dict)  # Not serialized.
+                if slow.data["next"]:
+                    slow, fast = self.responses(
+                        {**params, "cursor": slow.data["next"].split("cursor=")[1]}
+                    )
+                    self.assertEqual(fast.content, slow.content)
+
+    @override_settings(FEATURE_VOTING={"FAST_FEATURE_LIST": True})
+    def test_fast_page_is_one_query(self):
+        """Test that the fast path still reads a page in one query."""
+        self.client.force_authenticate(user=self.voter)
+        cache.clear()
+        with self.assertNumQueries(2):  # The page, plus one sharded total.
+            etag = self.client.get(reverse("feature-list"))["ETag"]
+        response = self.client.get(reverse("feature-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class KeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.voters = [User.objects.create(username=f"voter{i}") for i in range(3)]
+        self.features = [
+            Feature.objects.create(title=f"Feature {i}", author=self.author)
+            for i in range(7)
+        ]
+        for feature, votes in zip(self.features, [3, 1, 1, 0, 2, 1, 0]):
+            for voter in self.voters[:votes]:
+                feature.upvote(voter)
+        self.expected = list(
+            Feature.objects.order_by("-vote_count", "-created_at", "-id").values_list(
+                "id", flat=True
+            )
+        )
+
+    def ids(self, response):
+        return [UUID(item["id"]) for item in response.data["results"]]
+
+    def test_walk_forward_and_back(self):
+        """Test that next links visit every feature once, in order."""
+        url = reverse("feature-list") + "?page_size=3"
+        seen, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            seen.extend(self.ids(response))
+            url = response.data["next"]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]["previous"])
+
+        response = self.client.get(pages[1]["previous"])
+        self.assertEqual(self.ids(response), self.expected[:3])
+
+    def test_page_stable_when_earlier_features_gain_votes(self):
+        """Test that votes on already-seen features do not shift later pages."""
+        first = self.client.get(reverse("feature-list") + "?page_size=3")
+        seen = Feature.objects.get(pk=self.expected[2])
+        late_voter = User.objects.create(username="late")
+        seen.upvote(late_voter)
+
+        second = self.client.get(first.data["next"])
+        self.assertEqual(self.ids(second)[0], self.expected[3])
+
+    def test_invalid_cursor(self):
+        """Test that a tampered cursor is rejected."""
+        response = self.client.get(reverse("feature-list") + "?cursor=bogus")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(
+    FEATURE_VOTING={
+        "VOTE_BUFFER": True,
+        "VOTE_BUFFER_MAX_SIZE": 3,
+        "VOTE_BUFFER_FLUSH_SECONDS": 0,
+    }
+)
+class BufferedVoteTest(APITestCase):
+    def setUp(self):
+        buffer.reset()
+        self.addCleanup(buffer.reset)
+        metrics.reset()
+        self.author = User.objects.create(username="author")
+        self.voter = User.objects.create(username="voter")
+        self.feature = Feature.objects.create(title="Buffered", author=self.author)
+        self.client.force_authenticate(user=self.voter)
+        self.upvote_url = reverse("feature-upvote", kwargs={"pk": self.feature.pk})
+        self.remove_url = reverse(
+            "feature-remove-vote", kwargs={"pk": self.feature.pk}
+        )
+        self.detail_url = reverse("feature-detail", kwargs={"pk": self.feature.pk})
+
+    def test_read_your_writes_before_flush(self):
+        """Test that a queued vote is visible to the voter before it is stored."""
+        response = self.client.post(self.upvote_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["vote_count"], 1)
+        self.assertFalse(Vote.objects.exists())
+
+        response = self.client.get(self.detail_url)
+        self.assertTrue(response.data["has_voted"])
+        self.assertEqual(response.data["vote_count"], 1)
+
+        response = self.client.post(self.upvote_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_flush_persists_votes(self):
+        """Test that a flush writes queued votes and the stored count."""
+        self.client.post(self.upvote_url)
+        self.assertEqual(buffer.get_buffer().flush(), 1)
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 1)
+        self.assertTrue(self.feature.has_user_voted(self.voter))
+        self.assertEqual(buffer.get_buffer().depth, 0)
+        self.assertEqual(buffer.pending_delta(self.feature.pk), 0)
+
+    def test_vote_then_remove_nets_out(self):
+        """Test that a vote removed before flushing leaves no trace."""
+        self.client.post(self.upvote_url)
+        response = self.client.delete(self.remove_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["vote_count"], 0)
+
+        buffer.get_buffer().flush()
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 0)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_votes_for_deleted_features_do_not_block_the_queue(self):
+        """Test that a queued vote whose feature is gone is dropped."""
+        other = Feature.objects.create(title="Kept", author=self.author)
+        self.client.post(self.upvote_url)
+        self.client.post(reverse("feature-upvote", kwargs={"pk": other.pk}))
+        self.feature.delete()
+
+        with self.assertLogs("features.buffer", "WARNING"):
+            self.assertEqual(buffer.get_buffer().flush(), 2)
+        self.assertEqual(buffer.get_buffer().depth, 0)
+        self.assertEqual(buffer.get_buffer().stats["dropped_entries"], 1)
+        self.assertEqual(
+            list(Vote.objects.values_list("feature_id", flat=True)), [other.pk]
+        )
+        self.assertEqual(buffer.pending_delta(self.feature.pk), 0)
+
+    def test_queue_and_flushes_reach_metrics(self):
+        """Test that depth, flushes and flush time are published."""
+        self.client.post(self.upvote_url)
+        self.assertIn("vote_buffer_depth 1\n", metrics.render())
+
+        buffer.get_buffer().flush()
+        text = metrics.render()
+        self.assertIn("vote_buffer_depth 0\n", text)
+        self.assertIn("vote_buffer_flush_seconds_count 1\n", text)
+        self.assertIn('vote_buffer_flushed_entries_total{result="written"} 1', text)
+        self.assertIn("# TYPE vote_buffer_max_flush_seconds gauge", text)
+        self.assertIn("# TYPE vote_buffer_flush_errors_total counter", text)
+
+    def test_size_trigger_flushes(self):
+        """Test that reaching the size limit flushes the queue."""
+        for i in range(3):
+            self.client.force_authenticate(
+                user=User.objects.create(username=f"burst{i}")
+            )
+            self.client.post(self.upvote_url)
+
+        self.feature.refresh_from_db()
+        self.assertEqual(self.feature.vote_count, 3)
+        self.assertEqual(buffer.get_buffer().stats["flushes"], 1)
+
+
+class RankingTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.voters = [User.objects.create(username=f"voter{i}") for i in range(3)]
+        now = timezone.now()
+        # A week-old favourite, a day-old feature and a brand new one.
+        self.old = Feature.objects.create(title="Old", author=self.author)
+        self.recent = Feature.objects.create(title="Recent", author=self.author)
+        self.new = Feature.objects.create(title="New", author=self.author)
+        Feature.objects.filter(pk=self.old.pk).update(
+            created_at=now - timedelta(days=7)
+        )
+        Feature.objects.filter(pk=self.recent.pk).update(
+            created_at=now - timedelta(days=1)
+        )
+        for voter in self.voters:
+            self.old.upvote(voter)
+        for voter in self.voters[:2]:
+            self.recent.upvote(voter)
+        Vote.objects.filter(feature=self.old).update(created_at=now - timedelta(days=6))
+
+    def titles(self, ordering, **params):
+        response = self.client.get(
+            reverse("feature-list"), {"ordering": ordering, **params}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["title"] for row in response.data["results"]]
+
+    def test_hot_and_trending_orderings(self):
+        """Test that age decays hot scores and only recent votes trend."""
+        self.assertEqual(self.titles("hot"), ["New", "Recent", "Old"])
+        out = StringIO()
+        call_command("update_rankings", stdout=out)
+        self.assertIn("Updated 3 feature(s)", out.getvalue())
+
+        self.assertEqual(self.titles("hot"), ["New", "Recent", "Old"])
+        self.assertEqual(self.titles("trending"), ["Recent", "New", "Old"])
+        self.assertEqual(self.titles("bogus"), ["Old", "Recent", "New"])
+        recent = Feature.objects.get(pk=self.recent.pk)
+        self.assertEqual(recent.trending_score, 2 / 24)
+
+    def test_refresh_writes_only_changed_scores(self):
+        """Test that a second refresh with no new votes updates nothing."""
+        rankings.refresh()
+        self.assertEqual(rankings.refresh(), 0)
+        self.new.upvote(self.voters[0])
+        self.assertEqual(rankings.refresh(), 1)
+
+    def test_pages_follow_ranking(self):
+        """Test that keyset pages walk the hot ordering."""
+        rankings.refresh()
+        response = self.client.get(
+            reverse("feature-list"), {"ordering": "hot", "page_size": 2}
+        )
+        titles = [row["title"] for row in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        titles += [row["title"] for row in response.data["results"]]
+        self.assertEqual(titles, ["New", "Recent", "Old"])
+
+
+class SearchTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.dark = Feature.objects.create(
+            title="Dark mode",
+            description="Easier on the eyes at night",
+            author=self.author,
+        )
+        self.export = Feature.objects.create(
+            title="CSV export", description="Download reports", author=self.author
+        )
+        self.url = reverse("feature-list")
+
+    def search(self, query):
+        response = self.client.get(self.url, {"search": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["title"] for row in response.data["results"]]
+
+    def test_search_titles_and_descriptions(self):
+        """Test matching on title and description words, with stemming."""
+        self.assertEqual(self.search("dark"), ["Dark mode"])
+        self.assertEqual(self.search("reporting"), ["CSV export"])
+        self.assertEqual(self.search('export "OR" dark'), [])
+        self.assertEqual(self.search("---"), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Test that saved and deleted features update the index."""
+        self.export.title = "Spreadsheet export"
+        self.export.save()
+        self.assertEqual(self.search("spreadsheet"), ["Spreadsheet export"])
+        self.assertEqual(self.search("csv"), [])
+
+        self.dark.delete()
+        self.assertEqual(self.search("dark"), [])
+        self.assertEqual(search.rebuild(), 1)
+
+    def test_ids_sharing_high_bits_get_rows_of_their_own(self):
+        """Test that features whose UUIDs differ only in low bits both index."""
+        for low, title in ((1, "Offline sync"), (2, "Offline maps")):
+            Feature.objects.create(
+                id=UUID(int=(7 << 65) | low), title=title, author=self.author
+            )
+        self.assertEqual(
+            sorted(self.search("offline")), ["Offline maps", "Offline sync"]
+        )
+        self.assertEqual(search.rebuild(), 4)
+        self.assertEqual(len(self.search("offline")), 2)
+
+    def test_admin_search_uses_index(self):
+        """Test that the admin changelist search goes through the index."""
+        admin_user = User.objects.create(
+            username="admin", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin_user)
+        response = self.client.get(
+            reverse("admin:features_feature_changelist"), {"q": "night"}
+        )
+        self.assertContains(response, "Dark mode")
+        self.assertNotContains(response, "CSV export")
+
+
+class SimilarFeatureTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.dark = Feature.objects.create(title="Dark mode", author=self.author)
+        Feature.objects.create(title="CSV export", author=self.author)
+        self.client.force_authenticate(user=self.author)
+
+    def similar(self, query):
+        response = self.client.get(reverse("feature-similar"), {"q": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["title"] for row in response.data]
+
+    def test_create_reports_possible_duplicates(self):
+        """Test that creating a feature lists similar existing ones."""
+        response = self.client.post(
+            reverse("feature-list"), {"title": "Dark mode!"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        duplicates = response.data["possible_duplicates"]
+        self.assertEqual([row["id"] for row in duplicates], [str(self.dark.pk)])
+        self.assertEqual(duplicates[0]["similarity"], 1.0)
+
+    def test_similar_titles(self):
+        """Test that near matches are found and unrelated titles are not."""
+        self.assertEqual(self.similar("dark-mode"), ["Dark mode"])
+        self.assertEqual(self.similar("Add a dark mode"), ["Dark mode"])
+        self.assertEqual(self.similar("Push notifications"), [])
+        self.assertEqual(self.similar(""), [])
+
+    def test_index_follows_edits(self):
+        """Test that an edited title is matched by its new text only."""
+        self.dark.title = "Night theme"
+        self.dark.save()
+        self.assertEqual(self.similar("Dark mode"), [])
+        self.assertEqual(self.similar("night theme"), ["Night theme"])
+        self.assertEqual(similarity.rebuild(), 2)
+        self.assertEqual(self.similar("night theme"), ["Night theme"])
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.voter = User.objects.create(username="voter")
+        self.feature = Feature.objects.create(title="Cached", author=self.author)
+        self.client.force_authenticate(user=self.voter)
+        self.list_url = reverse("feature-list")
+        self.detail_url = reverse("feature-detail", kwargs={"pk": self.feature.pk})
+
+    def test_unchanged_list_is_not_modified(self):
+        """Test that a matching ETag gets a 304 from one query."""
+        etag = self.client.get(self.list_url)["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_vote_changes_etag(self):
+        """Test that votes and edits invalidate list and detail ETags."""
+        list_etag = self.client.get(self.list_url)["ETag"]
+        detail_etag = self.client.get(self.detail_url)["ETag"]
+
+        self.feature.upvote(self.voter)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["results"][0]["has_voted"])
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        detail_etag = response["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=detail_etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.feature.title = "Renamed"
+        self.feature.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.data["title"], "Renamed")
+
+    def test_etag_is_per_user(self):
+        """Test that another user's ETag does not match."""
+        etag = self.client.get(self.list_url)["ETag"]
+        self.client.force_authenticate(user=self.author)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(FEATURE_VOTING={"RESPONSE_CACHE": True})
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username="author")
+        self.voter = User.objects.create(username="voter")
+        self.feature = Feature.objects.create(title="Cached", author=self.author)
+        self.other = Feature.objects.create(title="Other", author=self.author)
+        self.feature.upvote(self.voter)
+        self.list_url = reverse("feature-list")
+        self.detail_url = reverse("feature-detail", kwargs={"pk": self.feature.pk})
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        with override_settings(FEATURE_VOTING={"RESPONSE_CACHE": False}):
+            uncached = self.client.get(url)
+        self.assertEqual(response.content, uncached.content)
+        self.assertEqual(response["ETag"], uncached["ETag"])
+        return response
+
+    def test_reads_are_shared(self):
+        """Test that cached reads match uncached ones for every requester."""
+        for url in (self.list_url, self.detail_url):
+            cache.clear()
+            self.get(url, 1)  # Built once...
+            self.get(url, 0)  # ...then served to anonymous readers...
+            self.client.force_authenticate(user=self.voter)
+            response = self.get(url, 1)  # ...and to users, plus their votes.
+            self.assertIn('"has_voted":true', response.content.decode())
+            self.client.force_authenticate(user=None)
+
+    def test_cached_etag_is_not_modified(self):
+        """Test that a matching ETag gets a 304 without querying."""
+        etag = self.client.get(self.list_url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_invalidate(self):
+        """Test that votes, edits, renames and deletions expire entries."""
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.upvote(self.voter)
+        response = self.get(self.list_url, 1)
+        self.assertEqual(response.data["results"][1]["vote_count"], 1)
+        self.get(self.detail_url, 0)  # Another feature's vote keeps it.
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.feature.remove_vote(self.voter)
+        self.assertEqual(self.get(self.detail_url, 1).data["vote_count"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.feature.title = "Renamed"
+            self.feature.save()
+            self.author.first_name = "Ada"
+            self.author.save()
+        response = self.get(self.detail_url, 1)
+        self.assertEqual(response.data["title"], "Renamed")
+        self.assertEqual(response.data["author"]["first_name"], "Ada")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.feature.delete()
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+        self.assertEqual(len(self.get(self.list_url, 1).data["results"]), 1)
+
+    @override_settings(
+        FEATURE_VOTING={"RESPONSE_CACHE": True, "RESPONSE_CACHE_LOCK_SECONDS": 5}
+    )
+    def test_one_caller_builds_a_missing_entry(self):
+        """Test that callers wait for the entry another caller is building."""
+        key = "features:response:test"
+        self.assertTrue(cache.add(f"{key}:lock", 1))
+        built = responsecache.entry({"id": "1", "has_voted": True}, [], many=False)
+        threading.Timer(0.05, cache.set, (key, built)).start()
+
+        waited = responsecache.fetch(key, lambda: self.fail("Built twice"))
+        self.assertEqual(waited, built)
+        self.assertFalse(waited.data["has_voted"])
+
+
+@override_settings(FEATURE_VOTING={"CHANGES_SETTLE_SECONDS": 0})
+class ChangesFeedTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.voter = User.objects.create(username="voter")
+        self.feature = Feature.objects.create(title="Tracked", author=self.author)
+        self.url = reverse("feature-changes")
+        self.cursor = self.client.get(self.url).data["cursor"]
+
+    def poll(self):
+        response = self.client.get(self.url, {"since": self.cursor})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.cursor = response.data["cursor"]
+        return response.data
+
+    def test_up_to_date_poll_is_one_query(self):
+        """Test that polling with a current cursor returns nothing cheaply."""
+        with self.assertNumQueries(1):
+            data = self.poll()
+        self.assertEqual(data["changed"], [])
+        self.assertEqual(data["deleted"], [])
+
+    def test_reports_votes_edits_and_deletes(self):
+        """Test that each kind of change shows up once per feature."""
+        self.feature.upvote(self.voter)
+        self.feature.title = "Renamed"
+        self.feature.save()
+        data = self.poll()
+        self.assertEqual(len(data["changed"]), 1)
+        self.assertEqual(data["changed"][0]["title"], "Renamed")
+        self.assertEqual(data["changed"][0]["vote_count"], 1)
+
+        feature_id = str(self.feature.pk)
+        self.feature.delete()
+        data = self.poll()
+        self.assertEqual(data["changed"], [])
+        self.assertEqual(data["deleted"], [feature_id])
+        self.assertEqual(self.poll()["deleted"], [])
+
+    def test_compaction(self):
+        """Test that compaction keeps the latest entry per feature."""
+        self.feature.upvote(self.voter)
+        self.feature.remove_vote(self.voter)
+        changes.compact()
+        self.assertEqual(FeatureChange.objects.count(), 1)
+        self.assertEqual(len(self.poll()["changed"]), 1)
+
+        last_id, _ = changes.decode(self.cursor)
+        stale = changes.encode(last_id, timezone.now() - timedelta(days=8))
+        response = self.client.get(self.url, {"since": stale})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        response = self.client.get(self.url, {"since": "bogus"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(FEATURE_VOTING={"CHANGES_SETTLE_SECONDS": 0})
+class VoteRollupTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.voters = [User.objects.create(username=f"voter{i}") for i in range(3)]
+        self.feature = Feature.objects.create(title="Charted", author=self.author)
+        self.url = reverse("feature-stats", kwargs={"pk": self.feature.pk})
+
+    def points(self, bucket):
+        response = self.client.get(self.url, {"bucket": bucket})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row["votes"], row["total"]) for row in response.data["points"]]
+
+    def test_catch_up_follows_votes_and_removals(self):
+        """Test that only new log entries are folded in, removals included."""
+        for voter in self.voters:
+            self.feature.upvote(voter)
+        self.assertEqual(rollups.catch_up(), 1)
+        self.assertEqual(self.points("day"), [(3, 3)])
+        self.assertEqual(self.points("hour"), [(3, 3)])
+        self.assertEqual(rollups.catch_up(), 0)
+
+        self.feature.remove_vote(self.voters[0])
+        voting.bulk_vote(self.voters[0].pk, remove_ids=[self.feature.pk])
+        call_command("rollup_votes", stdout=StringIO())
+        self.assertEqual(self.points("day"), [(2, 2)])
+
+    def test_votes_and_removals_land_in_their_own_buckets(self):
+        """Test that votes count when cast and removals when logged."""
+        for voter in self.voters:
+            self.feature.upvote(voter)
+        now = timezone.now()
+        Vote.objects.update(created_at=now - timedelta(days=2))
+        rollups.catch_up()
+
+        self.feature.remove_vote(self.voters[0])
+        FeatureChange.objects.filter(kind=FeatureChange.UNVOTED).update(
+            created_at=now - timedelta(days=1)
+        )
+        self.feature.upvote(User.objects.create(username="latecomer"))
+        self.assertEqual(rollups.catch_up(), 1)
+        self.assertEqual(self.points("day"), [(3, 3), (-1, 2), (1, 3)])
+
+    def test_rebuild_from_votes(self):
+        """Test that a rebuild buckets existing votes by when they were cast."""
+        for voter in self.voters:
+            self.feature.upvote(voter)
+        Vote.objects.filter(user=self.voters[0]).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        out = StringIO()
+        call_command("rollup_votes", "--rebuild", stdout=out)
+        self.assertIn("Rebuilt 4 rollup row(s)", out.getvalue())
+        self.assertEqual(self.points("day"), [(1, 1), (2, 3)])
+        self.assertEqual(rollups.catch_up(), 0)
+
+        admin_user = User.objects.create(
+            username="admin", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin_user)
+        response = self.client.get(
+            reverse("admin:features_feature_change", args=[self.feature.pk])
+        )
+        self.assertContains(response, "3 votes, daily since")
+
+    def test_stats_reads_only_rollups(self):
+        """Test the stats endpoint's queries and errors."""
+        self.feature.upvote(self.voters[0])
+        rollups.catch_up()
+        with self.assertNumQueries(3):
+            self.assertEqual(self.points("day"), [(1, 1)])
+        response = self.client.get(self.url, {"bucket": "week"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        missing = reverse("feature-stats", kwargs={"pk": self.author.pk})
+        self.assertEqual(self.client.get(missing).status_code, 404)
+        self.assertEqual(VoteRollup.objects.filter(feature=self.feature).count(), 2)
+
+
+@override_settings(FEATURE_VOTING={"STREAM_COALESCE_SECONDS": 0.05})
+class LiveStreamTest(TestCase):
+    def setUp(self):
+        author = User.objects.create(username="author")
+        self.feature = Feature.objects.create(title="Live", author=author)
+        self.url = reverse("feature-stream")
+
+    async def test_stream_pushes_coalesced_counts(self):
+        """Test that a burst of votes reaches the client as one update."""
+        feature_id = str(self.feature.pk)
+        response = await self.async_client.get(self.url, {"ids": feature_id})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+        self.assertIn(f'"{feature_id}": 0'.encode(), await anext(stream))
+        for count in (1, 2, 3):
+            vote_count_changed.send(
+                sender=Feature, feature_id=self.feature.pk, vote_count=count
+            )
+        self.assertEqual(
+            await anext(stream),
+            f'event: vote_count\ndata: {{"{feature_id}": 3}}\n\n'.encode(),
+        )
+
+        await stream.aclose()
+
+    async def test_closing_stream_unsubscribes(self):
+        """Test that a closed stream stops receiving updates."""
+        stream = live.broker.listen({self.feature.pk})
+        await anext(stream)
+        self.assertEqual(live.broker.subscriber_count(self.feature.pk), 1)
+        await stream.aclose()
+        self.assertEqual(live.broker.subscriber_count(self.feature.pk), 0)
+
+    async def test_rejects_bad_ids(self):
+        """Test that the stream requires valid feature ids."""
+        response = await self.async_client.get(self.url, {"ids": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncFeatureViewTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.voter = User.objects.create(username="voter")
+        self.features = [
+            Feature.objects.create(title=f"Feature {i}", author=self.author)
+            for i in range(3)
+        ]
+        self.features[1].upvote(self.voter)
+        self.list_url = reverse("feature-list")
+        self.detail_url = reverse("feature-detail", args=[self.features[1].pk])
+        self.upvote_url = reverse("feature-upvote", args=[self.features[0].pk])
+        self.remove_url = reverse("feature-remove-vote", args=[self.features[0].pk])
+        self.client.force_login(self.voter)
+        self.async_client.force_login(self.voter)
+        # What the sync viewset answers, for comparison.
+        self.expected = {
+            url: self.client.get(url)
+            for url in (self.list_url, self.list_url + "?page_size=2", self.detail_url)
+        }
+
+    def asgi_urls(self):
+        return self.settings(ROOT_URLCONF="feature_voting.asgi_urls")
+
+    def test_routes(self):
+        """Test that only the hot routes are taken over under ASGI."""
+        urlconf = "feature_voting.asgi_urls"
+        self.assertIs(resolve(self.list_url, urlconf).func, async_views.feature_list)
+        self.assertIs(
+            resolve(self.detail_url, urlconf).func, async_views.feature_detail
+        )
+        top = resolve(reverse("feature-top"), urlconf).func
+        self.assertEqual(top.actions, {"get": "top"})
+
+    async def test_reads_match_sync_views(self):
+        """Test that async list and detail responses equal the sync ones."""
+        with self.asgi_urls():
+            for url, expected in self.expected.items():
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response["ETag"], expected["ETag"])
+
+                response = await self.async_client.get(
+                    url, headers={"If-None-Match": expected["ETag"]}
+                )
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            missing = reverse("feature-detail", args=[uuid4()])
+            response = await self.async_client.get(missing)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_votes_and_fallthrough(self):
+        """Test async votes, auth checks and methods left to the viewset."""
+        with self.asgi_urls():
+            response = await self.async_client.post(self.upvote_url)
+            self.assertEqual(response.data["vote_count"], 1)
+            response = await self.async_client.post(self.upvote_url)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            response = await self.async_client.delete(self.remove_url)
+            self.assertEqual(response.data["vote_count"], 0)
+
+            response = await self.async_client.get(self.upvote_url)
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+            response = await self.async_client.post(
+                self.list_url, {"title": "Created"}, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            response = await AsyncClient().post(self.upvote_url)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class GenerateLoadDataTest(TestCase):
+    def generate(self, **options):
+        out = StringIO()
+        call_command(
+            "generate_load_data",
+            users=50,
+            features=40,
+            votes=400,
+            seed=7,
+            batch_size=64,
+            stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def snapshot(self):
+        return list(
+            Feature.objects.order_by("id").values_list(
+                "id", "title", "author_id", "vote_count", "created_at"
+            )
+        )
+
+    def test_generates_consistent_skewed_data(self):
+        """Test that counts match votes, skew is present and seeds repeat."""
+        output = self.generate()
+        self.assertIn("votes: ", output)
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Feature.objects.count(), 40)
+        totals = dict(
+            Vote.objects.values("feature_id")
+            .annotate(n=Count("id"))
+            .values_list("feature_id", "n")
+        )
+        for pk, vote_count in Feature.objects.values_list("pk", "vote_count"):
+            self.assertEqual(totals.get(pk, 0), vote_count)
+        self.assertFalse(Vote.objects.filter(user=F("feature__author")).exists())
+        self.assertFalse(
+            Vote.objects.filter(created_at__lt=F("feature__created_at")).exists()
+        )
+        counts = sorted(totals.values(), reverse=True)
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+        self.assertTrue(self.client.login(username="loaduser1", password="loadtest"))
+
+        self.assertFalse(
+            Feature.objects.exclude(updated_at=F("created_at")).exists()
+        )
+        self.assertTrue(Feature._meta.get_field("updated_at").auto_now)
+        self.assertTrue(Vote._meta.get_field("created_at").auto_now_add)
+
+        snapshot = self.snapshot()
+        Feature.objects.all().delete()
+        User.objects.all().delete()
+        self.generate()
+        regenerated = self.snapshot()
+        self.assertEqual(
+            [row[:4] for row in regenerated], [row[:4] for row in snapshot]
+        )
+
+        self.generate()  # Adds to the existing rows.
+        self.assertEqual(Feature.objects.count(), 80)
+
+
+class LeaderboardTest(APITestCase):
+    def setUp(self):
+        leaderboard.reset()
+        self.addCleanup(leaderboard.reset)
+        self.author = User.objects.create(username="author")
+        self.voter = User.objects.create(username="voter")
+        self.first = Feature.objects.create(title="First", author=self.author)
+        self.second = Feature.objects.create(title="Second", author=self.author)
+        self.url = reverse("feature-top")
+        leaderboard.load()
+
+    def titles(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["title"] for row in response.data]
+
+    def test_top_follows_votes_without_queries(self):
+        """Test that votes reorder the leaderboard and reads skip the DB."""
+        self.assertEqual(self.titles(), ["Second", "First"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.upvote(self.voter)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(), ["First", "Second"])
+        self.assertEqual(self.client.get(self.url).data[0]["vote_count"], 1)
+
+    def test_created_and_deleted_features(self):
+        """Test that new features appear and deleted ones disappear."""
+        self.assertEqual(self.titles(n=1), ["Second"])
+        Feature.objects.create(title="Third", author=self.author)
+        self.second.delete()
+        self.assertEqual(self.titles(), ["Third", "First"])
+
+    def test_reads_never_query(self):
+        """Test that n is clamped to the board and an unloaded board is empty."""
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(n=50), ["Second", "First"])
+        leaderboard.reset()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(), [])
+
+
+class BenchmarkComparisonTest(TestCase):
+    def results(self, p95, queries, samples=200):
+        summary = benchmarks.summarize([p95 / 1000] * samples, [queries] * samples)
+        return {"hot_paths": {"1000": {"list": summary}}}
+
+    def test_summarize(self):
+        """Test that percentiles are in milliseconds and queries typical."""
+        summary = benchmarks.summarize(
+            [i / 1000 for i in range(100, 0, -1)], [9] + [2] * 99
+        )
+        self.assertEqual(
+            (summary["p50"], summary["p95"], summary["p99"]), (51.0, 96.0, 100.0)
+        )
+        self.assertEqual(summary["queries"], 2)
+
+    def test_repeats_are_combined_by_median(self):
+        """Test that one slow repeat does not move the combined result."""
+        combined = benchmarks.combine(
+            [self.results(p95, 3)["hot_paths"]["1000"]["list"] for p95 in (4, 5, 40)]
+        )
+        self.assertEqual((combined["p95"], combined["samples"]), (5.0, 600))
+
+    def test_regressions_beyond_threshold_are_reported(self):
+        """Test that slower p95s and extra queries fail, noise does not."""
+        baseline = self.results(10.0, 3)
+        for p95, queries, regressions in ((11.9, 3, 0), (12.1, 3, 1), (9.0, 4, 1)):
+            found = benchmarks.compare(baseline, self.results(p95, queries), 20)
+            self.assertEqual(len(found), regressions)
+
+    def test_small_or_short_slowdowns_are_not_gated(self):
+        """Test the absolute floor and the minimum sample count."""
+        baseline = self.results(3.1, 3)
+        self.assertEqual(benchmarks.compare(baseline, self.results(4.0, 3), 20), [])
+        few = self.results(50.0, 3, samples=30)
+        self.assertEqual(benchmarks.compare(few, self.results(90.0, 3, 30), 20), [])
+        # Queries are still compared however few the samples.
+        self.assertEqual(len(benchmarks.compare(few, self.results(50.0, 4, 30), 20)), 1)
+        self.assertEqual(benchmarks.compare({}, self.results(50.0, 9), 20), [])
+
+
+class LoadTestTest(TransactionTestCase):
+    def test_concurrent_votes_on_one_feature(self):
+        """Test that the harness drives voters and readers without errors."""
+        lines = []
+        summary = loadtest.run(
+            readers=1,
+            voters=2,
+            duration=0.5,
+            features=3,
+            users_per_voter=5,
+            report=lines.append,
+        )
+        self.assertGreater(summary["vote"]["requests"], 0)
+        self.assertGreater(summary["read"]["requests"], 0)
+        self.assertEqual(summary["vote"]["errors"], 0)
+        self.assertIn("0 target vote counts out of step", lines[-1])
+
+    @override_settings(FEATURE_VOTING={"SHARD_PROMOTION_RATE": 2, "VOTE_SHARDS": 4})
+    def test_sharded_targets_are_not_reported_as_drift(self):
+        """Test that votes held in counter shards count towards the total."""
+        counters.reset()
+        self.addCleanup(counters.reset)
+        lines = []
+        loadtest.run(
+            readers=0,
+            voters=2,
+            duration=0.5,
+            features=3,
+            users_per_voter=5,
+            report=lines.append,
+        )
+        self.assertTrue(Feature.objects.filter(counter_shards=4).exists())
+        self.assertIn("0 target vote counts out of step", lines[-1])
+
 
 class SchemaTest(APITestCase):
     def test_schema_generation(self):
@@ -1,12 +1,25 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .minimal_views import MinimalFeatureViewSet
+from . import async_views
+from .views import FeatureViewSet, feature_stream
 from .test_views import test_endpoint
 
 router = DefaultRouter()
-router.register(r"features", MinimalFeatureViewSet)
+router.register(r"features", FeatureViewSet)
 
 urlpatterns = [
+    # Before the router, whose detail route would otherwise match "stream".
+    path("api/features/stream/", feature_stream, name="feature-stream"),
     path("api/", include(router.urls)),
     path("api/test/", test_endpoint, name="test-endpoint"),
 ]
+
+# Routes served by the async views under ASGI, ahead of ``urlpatterns`` (see
+# feature_voting/asgi_urls.py). Only UUIDs match ``pk``, so list-level
+# actions such as "top/" still reach the router.
+async_urlpatterns = [
+    path("api/features/", async_views.feature_list),
+    path("api/features/<uuid:pk>/", async_views.feature_detail),
+    path("api/features/<uuid:pk>/upvote/", async_views.feature_upvote),
+    path("api/features/<uuid:pk>/remove_vote/", async_views.feature_remove_vote),
+]
@@ -1,21 +1,31 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.renderers import JSONRenderer
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema, extend_schema_view
-from django.db.models import Count
-from .models import Feature
-from .simple_serializers import SimpleFeatureSerializer as FeatureSerializer
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse, StreamingHttpResponse
+from uuid import UUID
+from . import buffer, changes, conf, counters, etags, fastlist, leaderboard, live
+from . import responsecache, rollups, similarity, voting
+from .models import Feature, Vote, VoteRollup
+from .pagination import KeysetPagination
+from .rankings import FeatureRankingFilter
+from .renderers import FastJSONRenderer
+from .search import FeatureSearchFilter
+from .serializers import BulkVoteSerializer, FeatureSerializer
 
 
 @extend_schema_view(
     list=extend_schema(
         summary="List all features",
-        description="Retrieve a list of all feature requests, ordered by votes (descending) and creation date.",
+        description="Retrieve feature requests ordered by votes (descending) and creation date, one page at a time. Follow the opaque `next`/`previous` cursor links to page. With `search`, only matching features are returned (ranked by relevance on PostgreSQL). `ordering=hot` ranks by votes decayed with age and `ordering=trending` by votes per hour over the last day; both scores are refreshed periodically.",
     ),
     create=extend_schema(
         summary="Create a new feature",
-        description="Create a new feature request with title and optional description. Requires authentication.",
+        description="Create a new feature request with title and optional description. Requires authentication. The response lists existing features with similar titles in `possible_duplicates`.",
     ),
     retrieve=extend_schema(
         summary="Get a specific feature",
@@ -44,18 +54,164 @@ class FeatureViewSet(viewsets.ModelViewSet):
     queryset = Feature.objects.all()
     serializer_class = FeatureSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    filter_backends = [FeatureSearchFilter, FeatureRankingFilter]
+    keyset_ordering = ("-vote_count", "-created_at", "-id")
+    # Reads only need the requester's id (see accounts.authentication).
+    trust_token_claims = True
 
     def get_queryset(self):
-        """Return features ordered by vote count."""
+        """Return features ordered by vote count.
+
+        For authenticated users, whether they voted is annotated in the same
+        query so serializing a page needs no per-feature lookups.
+        """
+        queryset = Feature.objects.select_related("author").order_by(
+            *self.keyset_ordering
+        )
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                user_has_voted=Exists(
+                    Vote.objects.filter(feature=OuterRef("pk"), user_id=user.pk)
+                )
+            )
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """List a page of features, answering 304 if it is unchanged.
+
+        With ``If-None-Match``, the page window is first loaded with only
+        the columns the ETag depends on; the full page is serialized only
+        when the tag no longer matches.
+        """
+        if responsecache.enabled():
+            return self.cached_response(
+                responsecache.list_key(request), self.page_content, many=True
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if request.headers.get("If-None-Match"):
+            paginator = self.pagination_class()
+            stamps = paginator.paginate_queryset(
+                queryset.only(*etags.STAMP_FIELDS), request, view=self
+            )
+            etag = etags.compute(request, stamps)
+            if etags.matches(request, etag):
+                return self.not_modified(etag)
+
+        return self.page_response(self.paginate_queryset(self.page_rows(queryset)))
+
+    def page_rows(self, queryset):
+        """Read list pages as plain rows when the fast list path is on."""
+        if conf.get("FAST_FEATURE_LIST"):
+            return fastlist.rows(queryset, self.keyset_ordering)
+        return queryset
+
+    def page_response(self, page):
+        """Serialize a page of features into a tagged, paginated response."""
+        return self.tagged_response(*self.page_content(page), many=True)
+
+    def page_content(self, page=None):
+        """Return the paginated data and ETag stamps for a page of features.
+
+        Without ``page``, the page the request asks for is read first.
+        """
+        if page is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(self.page_rows(queryset))
+        if conf.get("FAST_FEATURE_LIST"):
+            data, stamps = fastlist.represent(page, self.request)
+        else:
+            data = self.get_serializer(page, many=True).data
+            stamps = etags.stamps(self.request, page)
+        return self.get_paginated_response(data).data, stamps
+
+    def tagged_response(self, data, stamps, many=False):
+        response = Response(data)
+        response["ETag"] = etags.digest(self.request, stamps)
+        if (
+            many
+            and conf.get("FAST_FEATURE_LIST")
+            and type(self.request.accepted_renderer) is JSONRenderer
+        ):
+            # Feature pages hold no floats, so orjson output is exact.
+            self.request.accepted_renderer = FastJSONRenderer()
+        return response
+
+    def cached_response(self, key, build, many):
+        """Serve the ``(data, stamps)`` that ``build()`` returns from the cache.
+
+        Cached entries are shared by all requesters (see ``responsecache``);
+        the requester's own votes are applied to them here.
+        """
+
+        def entry():
+            data, stamps = build()
+            sharded = any(counters.shard_count(stamp[0]) for stamp in stamps)
+            return responsecache.entry(data, stamps, many), sharded
+
+        data, stamps = responsecache.personalize(
+            responsecache.fetch(key, entry), self.request.user
+        )
+        etag = etags.digest(self.request, stamps)
+        if etags.matches(self.request, etag):
+            return self.not_modified(etag)
+        return self.tagged_response(data, stamps, many)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a feature, answering 304 if it is unchanged."""
+        key = responsecache.enabled() and responsecache.detail_key(kwargs["pk"])
+        if key:
+            return self.cached_response(
+                key, lambda: self.instance_content(self.get_object()), many=False
+            )
+
+        if request.headers.get("If-None-Match"):
+            stamp = get_object_or_404(
+                self.get_queryset().only(*etags.STAMP_FIELDS), pk=kwargs["pk"]
+            )
+            etag = etags.compute(request, [stamp])
+            if etags.matches(request, etag):
+                return self.not_modified(etag)
+
+        return self.instance_response(self.get_object())
+
+    def instance_response(self, instance):
+        """Serialize one feature into a tagged response."""
+        return self.tagged_response(*self.instance_content(instance))
+
+    def instance_content(self, instance):
+        """Return the data and ETag stamps for one feature."""
         return (
-            Feature.objects.select_related("author")
-            .prefetch_related("votes")
-            .annotate(vote_count=Count("votes"))
-            .order_by("-vote_count", "-created_at")
+            self.get_serializer(instance).data,
+            etags.stamps(self.request, [instance]),
         )
 
+    def not_modified(self, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response["ETag"] = etag
+        return response
+
+    def get_vote_engine(self):
+        """Return the write-behind buffer if enabled, else the direct engine."""
+        return buffer.get_buffer() if buffer.enabled() else voting
+
+    def create(self, request, *args, **kwargs):
+        """Create a feature and report existing ones it may duplicate."""
+        response = super().create(request, *args, **kwargs)
+        response.data["possible_duplicates"] = self.possible_duplicates
+        return response
+
     def perform_create(self, serializer):
-        """Set the author to the current user when creating a feature."""
+        """Set the author to the current user when creating a feature.
+
+        Likely duplicates are looked up before saving so the new feature
+        does not match itself.
+        """
+        self.possible_duplicates = _similar_data(
+            similarity.similar(serializer.validated_data["title"])
+        )
         serializer.save(author=self.request.user)
 
     def perform_update(self, serializer):
@@ -70,6 +226,172 @@ class FeatureViewSet(viewsets.ModelViewSet):
             raise PermissionError("You can only delete your own features")
         instance.delete()
 
+    @extend_schema(
+        summary="Top features",
+        description="The `n` most-voted features (default 50), served from a precomputed in-memory leaderboard. Counts may trail the database by a few seconds.",
+        parameters=[OpenApiParameter("n", int, description="Number of features")],
+        responses={
+            200: {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string", "format": "uuid"},
+                        "title": {"type": "string"},
+                        "vote_count": {"type": "integer"},
+                        "created_at": {"type": "string", "format": "date-time"},
+                    },
+                },
+            }
+        },
+    )
+    @action(detail=False, methods=["get"])
+    def top(self, request):
+        """Return the top features without querying the database."""
+        try:
+            n = int(request.query_params.get("n", 50))
+        except ValueError:
+            n = 50
+        n = max(1, min(n, conf.get("LEADERBOARD_SIZE")))
+        return Response(leaderboard.top(n))
+
+    @extend_schema(
+        summary="Similar features",
+        description="Existing features whose titles resemble `q`, most similar first. Use it to suggest duplicates while a new feature is being written.",
+        parameters=[OpenApiParameter("q", str, description="Proposed title")],
+        responses={
+            200: {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string", "format": "uuid"},
+                        "title": {"type": "string"},
+                        "vote_count": {"type": "integer"},
+                        "similarity": {"type": "number"},
+                    },
+                },
+            }
+        },
+    )
+    @action(detail=False, methods=["get"])
+    def similar(self, request):
+        """Return features with titles similar to ``?q=``."""
+        query = request.query_params.get("q", "").strip()
+        return Response(_similar_data(similarity.similar(query)) if query else [])
+
+    @extend_schema(
+        summary="Feature changes",
+        description="Features created, edited, deleted or re-counted since `since`, a cursor from a previous response. Without `since`, returns the current cursor only; take it before loading the list. A 410 response means the cursor expired and the list must be reloaded.",
+        parameters=[OpenApiParameter("since", str, description="Cursor")],
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "cursor": {"type": "string"},
+                    "more": {"type": "boolean"},
+                    "changed": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/Feature"},
+                    },
+                    "deleted": {
+                        "type": "array",
+                        "items": {"type": "string", "format": "uuid"},
+                    },
+                },
+            },
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            410: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+    )
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """Return features changed since the client's cursor."""
+        since = request.query_params.get("since")
+        if since is None:
+            return Response(
+                {
+                    "cursor": changes.latest(),
+                    "more": False,
+                    "changed": [],
+                    "deleted": [],
+                }
+            )
+        try:
+            changed, deleted, cursor, more = changes.read(since)
+        except changes.InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except changes.CursorExpired:
+            return Response(
+                {"error": "Cursor expired, reload the feature list"},
+                status=status.HTTP_410_GONE,
+            )
+
+        features = self.get_queryset().filter(pk__in=changed) if changed else []
+        return Response(
+            {
+                "cursor": cursor,
+                "more": more,
+                "changed": self.get_serializer(features, many=True).data,
+                "deleted": [str(pk) for pk in deleted],
+            }
+        )
+
+    @extend_schema(
+        summary="Feature vote history",
+        description="Votes gained per hour (last 7 days of activity) or day (last 90 days of activity), read from precomputed rollups refreshed every few minutes. Buckets without vote changes are omitted; `total` is the running vote count at the end of each bucket.",
+        parameters=[
+            OpenApiParameter(
+                "bucket",
+                str,
+                enum=[VoteRollup.HOUR, VoteRollup.DAY],
+                description="Bucket size",
+            )
+        ],
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "bucket": {"type": "string"},
+                    "points": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "start": {"type": "string", "format": "date-time"},
+                                "votes": {"type": "integer"},
+                                "total": {"type": "integer"},
+                            },
+                        },
+                    },
+                },
+            },
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            404: {"type": "object"},
+        },
+    )
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        """Return a feature's vote history from the rollup tables."""
+        period = request.query_params.get("bucket", VoteRollup.DAY)
+        if period not in rollups.POINTS:
+            return Response(
+                {"error": "bucket must be hour or day"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        feature = get_object_or_404(Feature.objects.only("id"), pk=pk)
+        return Response(
+            {
+                "bucket": period,
+                "points": [
+                    {"start": start, "votes": votes, "total": total}
+                    for start, votes, total in rollups.series(feature.pk, period)
+                ],
+            }
+        )
+
     @extend_schema(
         summary="Upvote a feature",
         description="Add your vote to a feature. Requires authentication. You can only vote once per feature.",
@@ -89,37 +411,91 @@ class FeatureViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def upvote(self, request, pk=None):
         """Upvote a feature request."""
-        try:
-            feature = self.get_object()
+        return self.upvote_response(
+            self.get_vote_engine().cast_vote(pk, request.user.pk)
+        )
 
-            # Check if user is trying to vote for their own feature
-            if feature.author == request.user:
-                return Response(
-                    {"error": "You cannot vote for your own feature"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+    def upvote_response(self, result):
+        """Build the response for a ``cast_vote`` result."""
+        if result.outcome == voting.VOTED:
+            return Response(
+                {
+                    "message": "Feature upvoted successfully",
+                    "vote_count": result.vote_count,
+                    "has_voted": True,
+                }
+            )
+        if result.outcome == voting.NOT_FOUND:
+            return Response(
+                {"error": "Feature not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        if result.outcome == voting.OWN_FEATURE:
+            return Response(
+                {"error": "You cannot vote for your own feature"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            {"error": "You have already voted for this feature"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    @extend_schema(
+        summary="Vote on several features",
+        description="Upvote and/or remove votes from up to 100 features in one request. Requires authentication. Each feature gets its own outcome: voted, unvoted, already_voted, not_voted, own_feature or not_found.",
+        request=BulkVoteSerializer,
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "results": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": "string", "format": "uuid"},
+                                "outcome": {"type": "string"},
+                                "vote_count": {"type": "integer", "nullable": True},
+                                "has_voted": {"type": "boolean"},
+                            },
+                        },
+                    }
+                },
+            },
+            400: {"type": "object"},
+        },
+    )
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
+    def bulk_vote(self, request):
+        """Upvote and remove votes on several features at once."""
+        serializer = BulkVoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upvote = serializer.validated_data["upvote"]
+        remove = serializer.validated_data["remove"]
+        user_id = request.user.pk
 
-            # Try to add the vote
-            vote_added = feature.upvote(request.user)
+        if buffer.enabled():
+            # The buffer batches writes itself; queueing there keeps its
+            # read-your-writes overlay accurate.
+            engine = buffer.get_buffer()
+            results = {pk: engine.retract_vote(pk, user_id) for pk in remove}
+            results.update({pk: engine.cast_vote(pk, user_id) for pk in upvote})
+        else:
+            results = voting.bulk_vote(user_id, upvote, remove)
 
-            if vote_added:
-                return Response(
+        return Response(
+            {
+                "results": [
                     {
-                        "message": "Feature upvoted successfully",
-                        "vote_count": feature.vote_count,
-                        "has_voted": True,
+                        "id": str(pk),
+                        "outcome": result.outcome,
+                        "vote_count": result.vote_count,
+                        "has_voted": result.outcome
+                        in (voting.VOTED, voting.ALREADY_VOTED),
                     }
-                )
-            else:
-                return Response(
-                    {"error": "You have already voted for this feature"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        except Feature.DoesNotExist:
-            return Response(
-                {"error": "Feature not found"}, status=status.HTTP_404_NOT_FOUND
-            )
+                    for pk, result in results.items()
+                ]
+            }
+        )
 
     @extend_schema(
         summary="Remove vote from a feature",
@@ -134,30 +510,65 @@ class FeatureViewSet(viewsets.ModelViewSet):
                 },
             },
             400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            404: {"type": "object", "properties": {"error": {"type": "string"}}},
         },
     )
     @action(detail=True, methods=["delete"], permission_classes=[IsAuthenticated])
     def remove_vote(self, request, pk=None):
         """Remove vote from a feature request."""
-        try:
-            feature = self.get_object()
-            vote_removed = feature.remove_vote(request.user)
-
-            if vote_removed:
-                return Response(
-                    {
-                        "message": "Vote removed successfully",
-                        "vote_count": feature.vote_count,
-                        "has_voted": False,
-                    }
-                )
-            else:
-                return Response(
-                    {"error": "You haven't voted for this feature"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+        return self.remove_vote_response(
+            self.get_vote_engine().retract_vote(pk, request.user.pk)
+        )
 
-        except Feature.DoesNotExist:
+    def remove_vote_response(self, result):
+        """Build the response for a ``retract_vote`` result."""
+        if result.outcome == voting.UNVOTED:
+            return Response(
+                {
+                    "message": "Vote removed successfully",
+                    "vote_count": result.vote_count,
+                    "has_voted": False,
+                }
+            )
+        if result.outcome == voting.NOT_FOUND:
             return Response(
                 {"error": "Feature not found"}, status=status.HTTP_404_NOT_FOUND
             )
+        return Response(
+            {"error": "You haven't voted for this feature"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+def _similar_data(matches):
+    return [
+        {
+            "id": str(feature.pk),
+            "title": feature.title,
+            "vote_count": counters.total(feature),
+            "similarity": round(score, 3),
+        }
+        for feature, score in matches
+    ]
+
+
+async def feature_stream(request):
+    """Stream vote counts for the features in ``?ids=`` as Server-Sent Events."""
+    try:
+        ids = {UUID(value) for value in request.GET.get("ids", "").split(",") if value}
+    except ValueError:
+        return JsonResponse({"error": "Invalid feature id"}, status=400)
+    limit = conf.get("STREAM_MAX_FEATURES")
+    if not 0 < len(ids) <= limit:
+        return JsonResponse(
+            {"error": f"Pass between 1 and {limit} comma-separated ids in ids"},
+            status=400,
+        )
+
+    initial = await live.current_counts(ids)
+    response = StreamingHttpResponse(
+        live.broker.listen(ids, initial), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop nginx buffering the stream.
+    return response
@@ -0,0 +1,557 @@
+"""
+Contention-safe vote engine.
+
+Casting or retracting a vote is an insert-if-absent (or delete-if-present)
+on ``Vote`` plus an atomic adjustment of the denormalized
+``Feature.vote_count`` and a ``FeatureChange`` log entry. On PostgreSQL all
+three happen in a single statement; on SQLite they run as separate
+statements in one transaction. Neither path raises
+``IntegrityError`` when the same user votes twice concurrently: the
+duplicate insert is simply ignored and reported as ``ALREADY_VOTED``.
+
+Features promoted to sharded counting (see ``counters``) take a separate
+path that bumps a random counter shard instead of the feature row.
+"""
+
+import functools
+import random
+import sqlite3
+import time
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from . import counters
+from .models import Feature, FeatureChange, Vote, VoteCounterShard
+from .signals import vote_count_changed
+
+VOTED = "voted"
+UNVOTED = "unvoted"
+ALREADY_VOTED = "already_voted"
+NOT_VOTED = "not_voted"
+OWN_FEATURE = "own_feature"
+NOT_FOUND = "not_found"
+
+# Transient lock errors (SQLite "database is locked", PostgreSQL deadlocks)
+# are retried with jittered backoff this many times before giving up.
+MAX_ATTEMPTS = 10
+RETRY_BACKOFF = 0.01
+
+# Process-wide counters: "retries" for lock retries, "conflicts" for votes
+# that lost to an existing row.
+stats = Counter()
+
+
+class VoteResult(NamedTuple):
+    outcome: str
+    vote_count: Optional[int] = None
+
+    @property
+    def changed(self):
+        return self.outcome in (VOTED, UNVOTED)
+
+
+def cast_vote(feature_id, user_id):
+    """Record a vote by ``user_id`` for ``feature_id`` if not already present."""
+    result = _run(1, feature_id, user_id)
+    if result.outcome == VOTED:
+        counters.record_write(Feature._meta.pk.to_python(feature_id))
+    elif result.outcome == ALREADY_VOTED:
+        stats["conflicts"] += 1
+    return result
+
+
+def retract_vote(feature_id, user_id):
+    """Remove the vote by ``user_id`` for ``feature_id`` if present."""
+    return _run(-1, feature_id, user_id)
+
+
+def bulk_vote(user_id, upvote_ids=(), remove_ids=()):
+    """Cast and retract several votes by ``user_id`` at once.
+
+    Ownership and existing votes are checked for all features in one query;
+    new votes are then written with a single insert that ignores duplicates
+    and removals with a single delete. Returns ``{feature_id: VoteResult}``
+    for every id given. Ids in both ``upvote_ids`` and ``remove_ids`` are
+    rejected upstream by ``BulkVoteSerializer``; callers must not pass them.
+    """
+    requested = {}
+    for raw_ids, delta in ((remove_ids, -1), (upvote_ids, 1)):
+        for raw_id in raw_ids:
+            try:
+                requested[Feature._meta.pk.to_python(raw_id)] = delta
+            except ValidationError:
+                pass
+    return _retrying(functools.partial(_bulk_apply, user_id, requested))
+
+
+def _bulk_apply(user_id, requested):
+    # Validated before the transaction opens: on SQLite a transaction that
+    # reads first cannot wait for the write lock and fails immediately.
+    rows = (
+        Feature.objects.filter(pk__in=requested)
+        .annotate(
+            voted=Exists(
+                Vote.objects.filter(feature=OuterRef("pk"), user_id=user_id)
+            ),
+            shard_total=counters.shard_sum(),
+        )
+        .values_list("pk", "author_id", "voted", F("vote_count") + F("shard_total"))
+    )
+    outcomes = {}
+    totals = {}
+    for feature_id, author_id, voted, total in rows:
+        totals[feature_id] = total
+        if requested[feature_id] > 0:
+            if author_id == user_id:
+                outcomes[feature_id] = OWN_FEATURE
+            else:
+                outcomes[feature_id] = ALREADY_VOTED if voted else VOTED
+        else:
+            outcomes[feature_id] = UNVOTED if voted else NOT_VOTED
+
+    adds = [pk for pk, outcome in outcomes.items() if outcome == VOTED]
+    removes = [pk for pk, outcome in outcomes.items() if outcome == UNVOTED]
+    if adds or removes:
+        write = _bulk_write_orm if _strategy() == "orm" else _bulk_write_sql
+        with transaction.atomic():
+            changed = write(user_id, adds, removes)
+            announce(changed, removed=removes)
+        totals.update(changed)
+        # Rows a concurrent request added or removed first were left alone.
+        for pk in adds:
+            if pk not in changed:
+                outcomes[pk] = ALREADY_VOTED
+        for pk in removes:
+            if pk not in changed:
+                outcomes[pk] = NOT_VOTED
+
+    for feature_id, outcome in outcomes.items():
+        if outcome == VOTED:
+            counters.record_write(feature_id)
+        elif outcome == ALREADY_VOTED:
+            stats["conflicts"] += 1
+    return {
+        feature_id: VoteResult(outcomes[feature_id], totals[feature_id])
+        if feature_id in outcomes
+        else VoteResult(NOT_FOUND)
+        for feature_id in requested
+    }
+
+
+def clear_votes(feature_ids):
+    """Delete every vote on ``feature_ids`` and recount them, shards included.
+
+    Returns the number of votes deleted.
+    """
+    feature_ids = list(feature_ids)
+
+    def apply():
+        with transaction.atomic():
+            deleted, _ = Vote.objects.filter(feature_id__in=feature_ids).delete()
+            VoteCounterShard.objects.filter(feature_id__in=feature_ids).update(count=0)
+            counters.recount(feature_ids)
+            announce(counters.totals(feature_ids), removed=feature_ids)
+        return deleted
+
+    return _retrying(apply)
+
+
+def _strategy():
+    if connection.vendor == "postgresql":
+        return "postgresql"
+    if connection.vendor == "sqlite" and sqlite3.sqlite_version_info >= (3, 35):
+        return "sqlite"
+    return "orm"
+
+
+def _run(delta, feature_id, user_id):
+    try:
+        feature_id = Feature._meta.pk.to_python(feature_id)
+    except ValidationError:
+        return VoteResult(NOT_FOUND)
+
+    strategy = _strategy()
+
+    def apply():
+        shards = counters.shard_count(feature_id) if strategy != "orm" else 0
+        if shards:
+            func = functools.partial(_sharded_apply, delta=delta, shards=shards)
+        else:
+            func = (_CAST if delta > 0 else _RETRACT)[strategy]
+        with transaction.atomic():
+            result = func(feature_id, user_id)
+            if result.changed:
+                announce(
+                    {feature_id: result.vote_count},
+                    removed=[feature_id] if delta < 0 else (),
+                    # The PostgreSQL statements log the change themselves.
+                    logged=strategy == "postgresql" and not shards,
+                )
+        return result
+
+    return _retrying(apply)
+
+
+def _retrying(func):
+    """Call ``func``, retrying transient lock errors with jittered backoff."""
+    # Retrying is only safe when we own the transaction.
+    attempts = 1 if connection.in_atomic_block else MAX_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            return func()
+        except OperationalError as exc:
+            if attempt == attempts or not _is_transient(exc):
+                raise
+            stats["retries"] += 1
+            time.sleep(RETRY_BACKOFF * attempt * (1 + random.random()))
+
+
+def announce(counts, removed=(), logged=False):
+    """Log vote count changes and signal them once the transaction commits.
+
+    ``counts`` maps feature ids to their new totals; features in ``removed``
+    lost votes and are logged as such (see ``rollups``). ``logged`` skips
+    the log entries when the statement that changed the counts wrote them.
+    Must be called inside the transaction that changed the counts.
+    """
+    removed = set(removed)
+    if not logged:
+        FeatureChange.objects.bulk_create(
+            [
+                FeatureChange(
+                    feature_id=pk,
+                    kind=(
+                        FeatureChange.UNVOTED if pk in removed else FeatureChange.VOTES
+                    ),
+                )
+                for pk in counts
+            ]
+        )
+
+    def send():
+        for feature_id, vote_count in counts.items():
+            vote_count_changed.send(
+                sender=Feature, feature_id=feature_id, vote_count=vote_count
+            )
+
+    transaction.on_commit(send)
+
+
+def _is_transient(exc):
+    message = str(exc).lower()
+    return any(
+        marker in message
+        for marker in ("locked", "deadlock", "could not serialize", "busy")
+    )
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return {
+        "feature": qn(Feature._meta.db_table),
+        "vote": qn(Vote._meta.db_table),
+        "shard": qn(VoteCounterShard._meta.db_table),
+        "change": qn(FeatureChange._meta.db_table),
+    }
+
+
+def _params(feature_id, user_id):
+    return {
+        "feature": Feature._meta.pk.get_db_prep_value(feature_id, connection),
+        "user": user_id,
+        "now": Vote._meta.get_field("created_at").get_db_prep_value(
+            timezone.now(), connection
+        ),
+    }
+
+
+# PostgreSQL: one round trip per operation using data-modifying CTEs, the
+# change-log entry included.
+
+_PG_CAST_SQL = """
+WITH target AS (
+    SELECT id, author_id, vote_count FROM {feature} WHERE id = %(feature)s
+), inserted AS (
+    INSERT INTO {vote} (feature_id, user_id, created_at)
+    SELECT id, %(user)s, %(now)s FROM target WHERE author_id <> %(user)s
+    ON CONFLICT (feature_id, user_id) DO NOTHING
+    RETURNING feature_id
+), bumped AS (
+    UPDATE {feature} SET vote_count = vote_count + 1
+    WHERE id IN (SELECT feature_id FROM inserted)
+    RETURNING id, vote_count
+), logged AS (
+    INSERT INTO {change} (feature_id, kind, created_at)
+    SELECT id, %(kind)s, %(now)s FROM bumped
+)
+SELECT author_id, vote_count, (SELECT vote_count FROM bumped) FROM target
+"""
+
+_PG_RETRACT_SQL = """
+WITH target AS (
+    SELECT id, vote_count FROM {feature} WHERE id = %(feature)s
+), deleted AS (
+    DELETE FROM {vote}
+    WHERE feature_id IN (SELECT id FROM target) AND user_id = %(user)s
+    RETURNING feature_id
+), bumped AS (
+    UPDATE {feature} SET vote_count = vote_count - 1
+    WHERE id IN (SELECT feature_id FROM deleted)
+    RETURNING id, vote_count
+), logged AS (
+    INSERT INTO {change} (feature_id, kind, created_at)
+    SELECT id, %(kind)s, %(now)s FROM bumped
+)
+SELECT vote_count, (SELECT vote_count FROM bumped) FROM target
+"""
+
+
+def _pg_cast(feature_id, user_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _PG_CAST_SQL.format(**_tables()),
+            {**_params(feature_id, user_id), "kind": FeatureChange.VOTES},
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return VoteResult(NOT_FOUND)
+    author_id, current, bumped = row
+    if bumped is not None:
+        return VoteResult(VOTED, bumped)
+    if author_id == user_id:
+        return VoteResult(OWN_FEATURE, current)
+    return VoteResult(ALREADY_VOTED, current)
+
+
+def _pg_retract(feature_id, user_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _PG_RETRACT_SQL.format(**_tables()),
+            {**_params(feature_id, user_id), "kind": FeatureChange.UNVOTED},
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return VoteResult(NOT_FOUND)
+    current, bumped = row
+    if bumped is not None:
+        return VoteResult(UNVOTED, bumped)
+    return VoteResult(NOT_VOTED, current)
+
+
+# SQLite: no data-modifying CTEs, so the insert and the counter update are
+# two statements in one transaction (in-process, so no extra network hop).
+# The insert/delete statements are also valid PostgreSQL and are shared with
+# the sharded path.
+
+_INSERT_SQL = """
+INSERT INTO {vote} (feature_id, user_id, created_at)
+SELECT id, %(user)s, %(now)s FROM {feature}
+WHERE id = %(feature)s AND author_id <> %(user)s
+ON CONFLICT (feature_id, user_id) DO NOTHING
+"""
+
+_DELETE_SQL = """
+DELETE FROM {vote} WHERE feature_id = %(feature)s AND user_id = %(user)s
+"""
+
+_SQLITE_BUMP_SQL = """
+UPDATE {feature} SET vote_count = vote_count + %(delta)s
+WHERE id = %(feature)s
+RETURNING vote_count
+"""
+
+_SQLITE_STATE_SQL = """
+SELECT author_id, vote_count FROM {feature} WHERE id = %(feature)s
+"""
+
+
+def _sqlite_cast(feature_id, user_id):
+    return _sqlite_apply(_INSERT_SQL, 1, feature_id, user_id)
+
+
+def _sqlite_retract(feature_id, user_id):
+    return _sqlite_apply(_DELETE_SQL, -1, feature_id, user_id)
+
+
+def _sqlite_apply(sql, delta, feature_id, user_id):
+    tables = _tables()
+    params = _params(feature_id, user_id)
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(**tables), params)
+        if cursor.rowcount == 1:
+            cursor.execute(
+                _SQLITE_BUMP_SQL.format(**tables), {**params, "delta": delta}
+            )
+            return VoteResult(VOTED if delta > 0 else UNVOTED, cursor.fetchone()[0])
+        cursor.execute(_SQLITE_STATE_SQL.format(**tables), params)
+        row = cursor.fetchone()
+    return _unchanged(row, delta, user_id)
+
+
+# Bulk votes on PostgreSQL and SQLite: RETURNING reports which vote rows
+# were really inserted or deleted, so counts are adjusted by exact deltas.
+
+_BULK_INSERT_SQL = """
+INSERT INTO {vote} (feature_id, user_id, created_at) VALUES {values}
+ON CONFLICT (feature_id, user_id) DO NOTHING
+RETURNING feature_id
+"""
+
+_BULK_DELETE_SQL = """
+DELETE FROM {vote} WHERE user_id = %s AND feature_id IN ({placeholders})
+RETURNING feature_id
+"""
+
+_BULK_BUMP_SQL = """
+UPDATE {feature} SET vote_count = vote_count + CASE id {cases} END
+WHERE id IN ({placeholders})
+RETURNING id, vote_count + COALESCE(
+    (SELECT SUM(count) FROM {shard} WHERE feature_id = {feature}.id), 0
+)
+"""
+
+
+def _bulk_write_sql(user_id, adds, removes):
+    """Write votes; return ``{feature_id: new total}`` for changed rows."""
+    tables = _tables()
+    pk_field = Feature._meta.pk
+    feature_ids = {
+        pk: pk_field.get_db_prep_value(pk, connection) for pk in adds + removes
+    }
+    now = _params(None, user_id)["now"]
+    deltas = {}
+    with connection.cursor() as cursor:
+        if adds:
+            cursor.execute(
+                _BULK_INSERT_SQL.format(
+                    values=", ".join(["(%s, %s, %s)"] * len(adds)), **tables
+                ),
+                [
+                    value
+                    for pk in adds
+                    for value in (feature_ids[pk], user_id, now)
+                ],
+            )
+            deltas.update((row[0], 1) for row in cursor.fetchall())
+        if removes:
+            cursor.execute(
+                _BULK_DELETE_SQL.format(
+                    placeholders=", ".join(["%s"] * len(removes)), **tables
+                ),
+                [user_id] + [feature_ids[pk] for pk in removes],
+            )
+            deltas.update((row[0], -1) for row in cursor.fetchall())
+        if not deltas:
+            return {}
+        cursor.execute(
+            _BULK_BUMP_SQL.format(
+                cases=" ".join(["WHEN %s THEN %s"] * len(deltas)),
+                placeholders=", ".join(["%s"] * len(deltas)),
+                **tables,
+            ),
+            [value for item in deltas.items() for value in item] + list(deltas),
+        )
+        rows = cursor.fetchall()
+    return {pk_field.to_python(pk): total for pk, total in rows}
+
+
+def _bulk_write_orm(user_id, adds, removes):
+    if adds:
+        Vote.objects.bulk_create(
+            [Vote(feature_id=pk, user_id=user_id) for pk in adds],
+            ignore_conflicts=True,
+        )
+    if removes:
+        Vote.objects.filter(feature_id__in=removes, user_id=user_id).delete()
+    # Which inserts were ignored is unknown here, so counts are recomputed.
+    counters.recount(adds + removes)
+    return counters.totals(adds + removes)
+
+
+# Sharded features: the vote row changes as above, but the count goes to a
+# random counter shard so concurrent voters do not queue on the feature row.
+
+_SHARDED_STATE_SQL = """
+SELECT author_id, vote_count + COALESCE(
+    (SELECT SUM(count) FROM {shard} WHERE feature_id = %(feature)s), 0
+)
+FROM {feature} WHERE id = %(feature)s
+"""
+
+
+def _sharded_apply(feature_id, user_id, delta, shards):
+    tables = _tables()
+    params = _params(feature_id, user_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            (_INSERT_SQL if delta > 0 else _DELETE_SQL).format(**tables), params
+        )
+        changed = cursor.rowcount == 1
+        if changed:
+            counters.add(feature_id, shards, delta)
+        cursor.execute(_SHARDED_STATE_SQL.format(**tables), params)
+        row = cursor.fetchone()
+    if changed:
+        return VoteResult(VOTED if delta > 0 else UNVOTED, row[1])
+    return _unchanged(row, delta, user_id)
+
+
+# Portable fallback for other backends.
+
+
+def _orm_cast(feature_id, user_id):
+    row = (
+        Feature.objects.filter(pk=feature_id)
+        .values_list("author_id", "vote_count")
+        .first()
+    )
+    if row is None or row[0] == user_id:
+        return _unchanged(row, 1, user_id)
+    try:
+        with transaction.atomic():
+            Vote.objects.create(feature_id=feature_id, user_id=user_id)
+    except IntegrityError:
+        return VoteResult(ALREADY_VOTED, row[1])
+    return VoteResult(VOTED, _orm_bump(feature_id, 1))
+
+
+def _orm_retract(feature_id, user_id):
+    deleted = Vote.objects.filter(feature_id=feature_id, user_id=user_id).delete()
+    if deleted[0]:
+        return VoteResult(UNVOTED, _orm_bump(feature_id, -1))
+    row = (
+        Feature.objects.filter(pk=feature_id)
+        .values_list("author_id", "vote_count")
+        .first()
+    )
+    return _unchanged(row, -1, user_id)
+
+
+def _orm_bump(feature_id, delta):
+    Feature.objects.filter(pk=feature_id).update(vote_count=F("vote_count") + delta)
+    return Feature.objects.values_list("vote_count", flat=True).get(pk=feature_id)
+
+
+def _unchanged(row, delta, user_id):
+    """Classify a no-op from the feature's ``(author_id, vote_count)`` row."""
+    if row is None:
+        return VoteResult(NOT_FOUND)
+    author_id, current = row
+    if delta < 0:
+        return VoteResult(NOT_VOTED, current)
+    if author_id == user_id:
+        return VoteResult(OWN_FEATURE, current)
+    return VoteResult(ALREADY_VOTED, current)
+
+
+_CAST = {"postgresql": _pg_cast, "sqlite": _sqlite_cast, "orm": _orm_cast}
+_RETRACT = {
+    "postgresql": _pg_retract,
+    "sqlite": _sqlite_retract,
+    "orm": _orm_retract,
+}
@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "monitoring"
+
+    def ready(self):
+        from django.db import connections
+
+        from . import queries
+
+        # Every connection, including ones opened before this ran, reports
+        # its queries to the request being recorded.
+        connection_created.connect(queries.instrument)
+        for connection in connections.all(initialized_only=True):
+            queries.instrument(sender=None, connection=connection)
@@ -0,0 +1,38 @@
+"""
+Settings for the monitoring app.
+
+Values are read from the ``MONITORING`` dict in the Django settings,
+falling back to the defaults below, e.g.::
+
+    MONITORING = {"N_PLUS_ONE": "raise"}
+"""
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Count queries and database time for every request (see middleware.py).
+    "QUERY_INSTRUMENTATION": True,
+    # Send the counts to clients in a Server-Timing header. Any client can
+    # read it, so leave it off where the app is public.
+    "SERVER_TIMING": False,
+    # Queries of one shape in one request that count as an N+1.
+    "N_PLUS_ONE_THRESHOLD": 5,
+    # What to do about an N+1: "log" a warning, "raise" NPlusOneDetected
+    # (for test runs) or None to ignore it.
+    "N_PLUS_ONE": "log",
+    # Record request metrics and serve them at /metrics (see metrics.py).
+    "METRICS": True,
+    # If set, /metrics requires "Authorization: Bearer <token>".
+    "METRICS_TOKEN": None,
+    # Directory shared by the worker processes of one host, each of which
+    # writes its metrics there; /metrics serves their sum. None serves only
+    # the answering process's own metrics.
+    "METRICS_DIR": None,
+    # Most seconds between a worker's writes to METRICS_DIR.
+    "METRICS_FLUSH_SECONDS": 5,
+}
+
+
+def get(name):
+    """Return the configured value for ``name``."""
+    return getattr(settings, "MONITORING", {}).get(name, DEFAULTS[name])
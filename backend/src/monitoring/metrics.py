@@ -0,0 +1,283 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Metrics are declared once at import time with ``counter`` or ``histogram``
+and updated from any thread. Each thread adds to a shard of its own, so
+updates take no lock; ``render`` sums the shards when scraped. When a
+thread exits, its shard is folded into the metric's shared totals, so
+short-lived threads do not pile up shards. Existing
+process-wide ``collections.Counter`` stats are published with ``expose``,
+and current values such as queue depths with ``gauge``; both are read at
+scrape time.
+
+With ``METRICS_DIR`` set, each process also writes its totals to a file
+of its own in that directory at most every ``METRICS_FLUSH_SECONDS`` and
+at exit, and ``/metrics`` serves the sum over all the files, whichever
+worker answers. Files of exited workers keep counting towards the totals,
+so empty the directory when the service is restarted.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+from . import conf
+
+# Latency bucket upper bounds, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = {}
+_exposed = []
+_gauges = []
+_file = f"{os.getpid()}-{uuid.uuid4().hex}.json"
+_flushed_at = 0.0
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = {}
+        # Totals of threads that have exited.
+        self._base = {}
+        # Reentrant: a shard can be retired by garbage collection at any time.
+        self._shards_lock = threading.RLock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            # Dropped with the thread's other locals when the thread exits.
+            self._local.owner = owner = _Owner()
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(owner, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._shards.pop(id(shard), None)
+            for key, value in shard.items():
+                self._base[key] = _add(self._base.get(key), value)
+
+    def samples(self):
+        """Return ``{label values: value}`` summed over every thread."""
+        with self._shards_lock:
+            shards = list(self._shards.values())
+            total = {key: _add(None, value) for key, value in self._base.items()}
+        for shard in shards:
+            # list() copies the items without letting the owner thread run.
+            for key, value in list(shard.items()):
+                total[key] = _add(total.get(key), value)
+        return total
+
+
+class _Owner:
+    """Stands for a thread in ``weakref.finalize``; threads are not collected
+    when they exit, their locals are."""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels, buckets):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        # Per-bucket counts (the last for values above every bound), sum.
+        counts = shard.get(labels)
+        if counts is None:
+            counts = shard[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+
+def counter(name, help, labels=()):
+    """Declare a counter; returns the existing one if already declared."""
+    return _declare(Counter, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    """Declare a histogram; returns the existing one if already declared."""
+    return _declare(Histogram, name, help, labels, buckets)
+
+
+def expose(name, help, stats, label):
+    """Publish a ``collections.Counter`` as a counter with one label whose
+    values are its keys."""
+    _exposed.append((name, help, stats, label))
+
+
+def gauge(name, help, read, merge="sum"):
+    """Publish the number ``read()`` returns when scraped as a gauge.
+
+    Across processes the values are added up, or with ``merge="max"`` the
+    largest is kept.
+    """
+    _gauges.append((name, help, read, merge))
+
+
+def _declare(cls, name, help, labels, *args):
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry.setdefault(name, cls(name, help, labels, *args))
+    return metric
+
+
+def snapshot():
+    """This process's metrics as JSON-serializable data."""
+    data = {}
+    for metric in list(_registry.values()):
+        data[metric.name] = {
+            "kind": metric.kind,
+            "help": metric.help,
+            "labels": metric.labels,
+            "buckets": getattr(metric, "buckets", None),
+            "samples": [[list(k), v] for k, v in metric.samples().items()],
+        }
+    for name, help, stats, label in _exposed:
+        data[name] = {
+            "kind": "counter",
+            "help": help,
+            "labels": [label],
+            "buckets": None,
+            "samples": [[[key], value] for key, value in list(stats.items())],
+        }
+    for name, help, read, merge in _gauges:
+        data[name] = {
+            "kind": "gauge",
+            "help": help,
+            "labels": [],
+            "buckets": None,
+            "merge": merge,
+            "samples": [[[], read()]],
+        }
+    return data
+
+
+def flush(force=False):
+    """Write this process's snapshot to ``METRICS_DIR``, if configured.
+
+    Unless ``force`` is set, writes at most every ``METRICS_FLUSH_SECONDS``.
+    """
+    global _flushed_at
+
+    directory = conf.get("METRICS_DIR")
+    now = time.monotonic()
+    if not directory or (
+        not force and now - _flushed_at < conf.get("METRICS_FLUSH_SECONDS")
+    ):
+        return
+    _flushed_at = now
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(descriptor, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(temporary, os.path.join(directory, _file))
+
+
+def collect():
+    """Every process's metrics merged (or this process's without a
+    ``METRICS_DIR``), in the format of ``snapshot``."""
+    directory = conf.get("METRICS_DIR")
+    if not directory:
+        return snapshot()
+    flush(force=True)
+    merged = {}
+    for entry in sorted(os.listdir(directory)):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, entry)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # Removed or replaced while listing.
+        for name, metric in data.items():
+            into = merged.setdefault(name, {**metric, "samples": {}})
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                total = into["samples"].get(key)
+                if metric.get("merge") == "max" and total is not None:
+                    into["samples"][key] = max(total, value)
+                else:
+                    into["samples"][key] = _add(total, value)
+    for metric in merged.values():
+        metric["samples"] = [[list(k), v] for k, v in metric["samples"].items()]
+    return merged
+
+
+def render(data=None):
+    """Metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, metric in sorted((data or collect()).items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric["samples"]):
+            pairs = list(zip(metric["labels"], labels))
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], "+Inf"], value[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(
+                    f"{name}_bucket{_labels(pairs + [('le', le)])} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_labels(pairs)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Forget every recorded value (used by tests)."""
+    for metric in _registry.values():
+        with metric._shards_lock:
+            for shard in metric._shards.values():
+                shard.clear()
+            metric._base.clear()
+
+
+def _add(total, value):
+    if total is None:
+        return list(value) if isinstance(value, list) else value
+    if isinstance(value, list):
+        return [a + b for a, b in zip(total, value)]
+    return total + value
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+atexit.register(flush, force=True)
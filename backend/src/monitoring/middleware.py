@@ -0,0 +1,142 @@
+"""
+Query counts, timing and metrics for every request.
+
+``QueryInstrumentationMiddleware`` records the queries each request runs
+(see queries.py). It reports their number and total database time, and
+the time spent below it in the stack, in a ``Server-Timing`` header and
+an ``INFO`` line on the ``monitoring.middleware`` logger. The line's
+``request_metrics`` attribute carries the same values for structured
+formatters.
+
+Any query shape run ``N_PLUS_ONE_THRESHOLD`` times in one request is
+reported as a likely N+1, with the call site that ran it. ``N_PLUS_ONE``
+selects a warning (the default) or raising ``NPlusOneDetected``, which
+makes the request fail in tests. Views that repeat a query on purpose,
+once per item of a bounded batch, set ``allow_repeated_queries = True``.
+
+With ``METRICS`` on, latency, status and query counts also go to the
+metrics registry (see metrics.py), labelled by view: the DRF viewset
+action (``FeatureViewSet.upvote``), view class or function name, or
+``unmatched`` for requests no view handled.
+"""
+
+import logging
+import time
+from contextlib import nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import conf, metrics, queries
+
+logger = logging.getLogger(__name__)
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Time to respond, by view", ("view", "method")
+)
+RESPONSES = metrics.counter(
+    "http_responses_total", "Responses by view and status", ("view", "status")
+)
+REQUEST_QUERIES = metrics.histogram(
+    "http_request_db_queries",
+    "Database queries per request, by view",
+    ("view",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = metrics.counter(
+    "http_request_db_seconds_total", "Time spent in database queries", ("view",)
+)
+
+
+class NPlusOneDetected(Exception):
+    pass
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with self.recording() as recorder:
+            response = self.get_response(request)
+        self.report(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with self.recording() as recorder:
+            response = await self.get_response(request)
+        self.report(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    def recording(self):
+        if not conf.get("QUERY_INSTRUMENTATION"):
+            return nullcontext()
+        return queries.recording(conf.get("N_PLUS_ONE_THRESHOLD"))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Class-based views: Django's as_view() sets view_class, DRF's cls.
+        view = getattr(view_func, "view_class", getattr(view_func, "cls", None))
+        request.allow_repeated_queries = getattr(
+            view or view_func, "allow_repeated_queries", False
+        )
+        action = getattr(view_func, "actions", {}).get(request.method.lower())
+        name = (view or view_func).__name__
+        request.view_name = f"{name}.{action}" if action else name
+
+    def report(self, request, response, recorder, duration):
+        view = getattr(request, "view_name", "unmatched")
+        if conf.get("METRICS"):
+            REQUEST_SECONDS.observe(duration, view, request.method)
+            RESPONSES.inc(view, str(response.status_code))
+            if recorder is not None:
+                REQUEST_QUERIES.observe(recorder.count, view)
+                REQUEST_DB_SECONDS.inc(view, amount=recorder.duration)
+            metrics.flush()
+        if recorder is None:
+            return
+
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "db_ms": round(1000 * recorder.duration, 2),
+            "duration_ms": round(1000 * duration, 2),
+        }
+        if conf.get("SERVER_TIMING"):
+            response["Server-Timing"] = (
+                f'db;dur={fields["db_ms"]};desc="{recorder.count} queries", '
+                f'app;dur={fields["duration_ms"]}'
+            )
+        logger.info(
+            " ".join(f"{name}=%s" for name in fields),
+            *fields.values(),
+            extra={"request_metrics": fields},
+        )
+
+        mode = conf.get("N_PLUS_ONE")
+        if (
+            not recorder.repeated
+            or mode is None
+            or getattr(request, "allow_repeated_queries", False)
+            # Error reports evaluate the querysets they show, once each.
+            or response.status_code >= 500
+        ):
+            return
+        message = f"Likely N+1 queries in {request.method} {request.path}:" + "".join(
+            f"\n  {recorder.shapes[shape]} x {shape[:300]}\n    from {site}"
+            for shape, site in recorder.repeated.items()
+        )
+        if mode == "raise":
+            raise NPlusOneDetected(message)
+        logger.warning(message)
@@ -0,0 +1,103 @@
+"""
+Per-request query recording.
+
+``instrument`` adds an execute wrapper to each database connection. While
+a ``Recorder`` is active (see ``recording``), every query run in the same
+context is counted, timed and grouped by shape. That includes
+``sync_to_async`` threads started from it, which copy the context. A
+query's shape is its SQL with placeholder lists and inlined numbers
+collapsed, so the same lookup for different rows shares one shape. The
+call site that runs a shape for the ``threshold``-th time is kept, to
+point at the loop behind an N+1.
+"""
+
+import contextvars
+import functools
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+_PLACEHOLDER_LIST = re.compile(r"\((?:%s|\?)(?:,\s*(?:%s|\?))*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+_current = contextvars.ContextVar("query_recorder", default=None)
+
+# Files whose frames are never the call site of a query.
+_INTERNAL = (__file__, os.path.join(os.path.dirname(__file__), "middleware.py"))
+
+
+class Recorder:
+    """Queries seen while recording one request."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        # {shape: call site}, for shapes run at least ``threshold`` times.
+        self.repeated = {}
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        key = shape(sql)
+        self.shapes[key] += 1
+        if self.shapes[key] == self.threshold:
+            self.repeated[key] = call_site()
+
+
+@contextmanager
+def recording(threshold):
+    """Record the queries run in this context for the duration of the block."""
+    recorder = Recorder(threshold)
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+def instrument(sender, connection, **kwargs):
+    """Add the recording wrapper to ``connection`` (a ``connection_created``
+    receiver); the wrapper outlives reconnects, so it is only added once."""
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+def _execute(execute, sql, params, many, context):
+    recorder = _current.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record(sql, time.perf_counter() - started)
+
+
+@functools.lru_cache(maxsize=1024)
+def shape(sql):
+    """``sql`` with placeholder lists and inlined numbers collapsed."""
+    return _NUMBER.sub("N", _PLACEHOLDER_LIST.sub("(...)", sql))
+
+
+def call_site():
+    """``file:line in function`` of the innermost project code running."""
+    root = os.path.join(str(settings.BASE_DIR), "")
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(root)
+            and filename not in _INTERNAL
+            and "site-packages" not in filename
+        ):
+            location = os.path.relpath(filename, root)
+            return f"{location}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
@@ -0,0 +1,193 @@
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import JsonResponse
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.views import View
+from rest_framework.test import APITestCase
+from accounts.authentication import tokens_for
+from features.models import Feature
+from . import metrics
+from .middleware import NPlusOneDetected
+
+
+def authors(request):
+    queryset = Feature.objects.order_by("title")
+    if "joined" in request.GET:
+        queryset = queryset.select_related("author")
+    return JsonResponse({"authors": [f.author.username for f in queryset]})
+
+
+class BatchAuthors(View):
+    allow_repeated_queries = True
+
+    def get(self, request):
+        return authors(request)
+
+
+urlpatterns = [
+    path("authors/", authors),
+    path("batch-authors/", BatchAuthors.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class QueryInstrumentationMiddlewareTest(TestCase):
+    def setUp(self):
+        for i in range(6):
+            Feature.objects.create(
+                title=f"Feature {i}", author=User.objects.create(username=f"a{i}")
+            )
+
+    @override_settings(MONITORING={"SERVER_TIMING": True})
+    def test_server_timing_and_log_line(self):
+        """Test that query counts reach the header and the request log."""
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertLogs("monitoring.middleware", "INFO") as logs:
+                response = self.client.get("/authors/", {"joined": 1})
+        self.assertRegex(
+            response["Server-Timing"],
+            rf'^db;dur=[\d.]+;desc="{len(queries)} queries", app;dur=[\d.]+$',
+        )
+        self.assertIn(f"queries={len(queries)}", logs.output[0])
+        self.assertEqual(logs.records[0].request_metrics["status"], 200)
+
+    @override_settings(MONITORING={"SERVER_TIMING": True})
+    async def test_async_requests_are_counted(self):
+        """Test that queries run in sync_to_async threads are recorded."""
+        response = await AsyncClient().get("/authors/", {"joined": 1})
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    @override_settings(MONITORING={})
+    def test_server_timing_is_off_by_default(self):
+        """Test that query counts are not sent to clients unless enabled."""
+        response = self.client.get("/authors/", {"joined": 1})
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(MONITORING={"N_PLUS_ONE": "log"})
+    def test_n_plus_one_is_reported_with_its_call_site(self):
+        """Test that a query repeated per row is logged, naming the loop."""
+        with self.assertLogs("monitoring.middleware", "WARNING") as logs:
+            self.client.get("/authors/")
+        self.assertIn('6 x SELECT "auth_user"', logs.output[-1])
+        self.assertIn("monitoring/tests.py", logs.output[-1])
+        self.assertIn("in <listcomp>", logs.output[-1])
+
+    @override_settings(MONITORING={"N_PLUS_ONE": "raise"})
+    def test_raise_mode(self):
+        """Test that raise mode fails N+1 requests and only those."""
+        with self.assertRaises(NPlusOneDetected):
+            self.client.get("/authors/")
+        self.assertEqual(self.client.get("/authors/", {"joined": 1}).status_code, 200)
+        self.assertEqual(self.client.get("/batch-authors/").status_code, 200)
+
+
+class MetricsTest(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        self.voter = User.objects.create(username="voter")
+        self.feature = Feature.objects.create(
+            title="Metered", author=User.objects.create(username="author")
+        )
+
+    def test_render_sums_threads_and_accumulates_buckets(self):
+        """Test the text format of counters and histograms."""
+        hits = metrics.counter("test_hits_total", "Hits", ("kind",))
+        sizes = metrics.histogram("test_size", "Sizes", buckets=(1, 10))
+
+        def work():
+            for _ in range(1000):
+                hits.inc('a "quoted" kind')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for value in (0.5, 1, 5, 50):
+            sizes.observe(value)
+
+        text = metrics.render()
+        self.assertIn("# TYPE test_hits_total counter", text)
+        self.assertIn('test_hits_total{kind="a \\"quoted\\" kind"} 4000', text)
+        self.assertIn('test_size_bucket{le="1"} 2', text)
+        self.assertIn('test_size_bucket{le="10"} 3', text)
+        self.assertIn('test_size_bucket{le="+Inf"} 4', text)
+        self.assertIn("test_size_sum 56.5\ntest_size_count 4", text)
+
+    def test_exited_threads_are_folded_into_shared_totals(self):
+        """Test that shards of finished threads do not accumulate."""
+        hits = metrics.counter("test_churn_total", "Hits")
+        sizes = metrics.histogram("test_churn_size", "Sizes", buckets=(1,))
+        for _ in range(50):
+            thread = threading.Thread(target=lambda: (hits.inc(), sizes.observe(2)))
+            thread.start()
+            thread.join()
+        hits.inc()
+
+        self.assertEqual(len(hits._shards), 1)
+        self.assertEqual(hits.samples(), {(): 51})
+        self.assertEqual(sizes.samples(), {(): [0, 50, 100]})
+
+    def test_endpoint_labels_requests_by_viewset_action(self):
+        """Test that requests, queries and JWT timing reach /metrics."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {tokens_for(self.voter)['access']}"
+        )
+        self.client.post(reverse("feature-upvote", kwargs={"pk": self.feature.pk}))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(
+            response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8"
+        )
+        text = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{view="FeatureViewSet.upvote",'
+            'method="POST"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_responses_total{view="FeatureViewSet.upvote",status="200"} 1', text
+        )
+        self.assertIn(
+            'http_request_db_queries_count{view="FeatureViewSet.upvote"}', text
+        )
+        self.assertIn("jwt_authentication_seconds_count 1", text)
+        self.assertIn('jwt_user_lookups_total{source="database"} 1', text)
+        self.assertIn("# TYPE vote_events_total counter", text)
+
+    @override_settings(MONITORING={"METRICS_TOKEN": "scrape"})
+    def test_token(self):
+        """Test that a configured token is required."""
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_processes_are_merged_through_the_shared_directory(self):
+        """Test that /metrics sums every worker's file."""
+        gauges = []
+        with tempfile.TemporaryDirectory() as directory, patch.object(
+            metrics, "_gauges", gauges
+        ):
+            metrics.gauge("test_depth", "Depth", lambda: 3)
+            metrics.gauge("test_slowest", "Slowest", lambda: 0.5, merge="max")
+            with override_settings(MONITORING={"METRICS_DIR": directory}):
+                self.client.get(
+                    reverse("feature-detail", kwargs={"pk": self.feature.pk})
+                )
+                other = metrics.snapshot()  # Another worker, same traffic.
+                with open(os.path.join(directory, "other.json"), "w") as f:
+                    json.dump(other, f)
+                text = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn(
+            'http_responses_total{view="FeatureViewSet.retrieve",status="200"} 2', text
+        )
+        self.assertIn("# TYPE test_depth gauge\ntest_depth 6\n", text)
+        self.assertIn("test_slowest 0.5\n", text)
@@ -0,0 +1,18 @@
+import hmac
+
+from django.http import Http404, HttpResponse
+
+from . import conf, metrics
+
+
+def prometheus_metrics(request):
+    """Serve the metrics registry in the Prometheus text format."""
+    if not conf.get("METRICS"):
+        raise Http404
+    token = conf.get("METRICS_TOKEN")
+    supplied = request.headers.get("Authorization", "")
+    if token and not hmac.compare_digest(supplied, f"Bearer {token}"):
+        return HttpResponse(status=401, headers={"WWW-Authenticate": "Bearer"})
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -27,6 +27,8 @@ function App(): JSX.Element {
   const [title, setTitle] = useState('');
   const [description, setDescription] = useState('');
   const [loading, setLoading] = useState(false);
+  const [nextUrl, setNextUrl] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchFeatures();
@@ -35,13 +37,38 @@ function App(): JSX.Element {
   const fetchFeatures = async () => {
     try {
       const response = await axios.get(`${API_BASE_URL}/features/`);
-      setFeatures(response.data);
+      setFeatures(response.data.results);
+      setNextUrl(response.data.next);
     } catch (error) {
       console.error('Error fetching features:', error);
       Alert.alert('Error', 'Failed to fetch features');
     }
   };
 
+  const loadMoreFeatures = async () => {
+    if (!nextUrl || loadingMore) {
+      return;
+    }
+
+    setLoadingMore(true);
+    try {
+      // The cursor URL carries the page position; follow it as given.
+      const response = await axios.get(nextUrl);
+      const results: Feature[] = response.data.results;
+      setFeatures(current => {
+        const seen = new Set(current.map(feature => feature.id));
+        const fresh = results.filter(feature => !seen.has(feature.id));
+        return [...current, ...fresh];
+      });
+      setNextUrl(response.data.next);
+    } catch (error) {
+      console.error('Error loading more features:', error);
+      Alert.alert('Error', 'Failed to load more features');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const createFeature = async () => {
     if (!title.trim()) {
       Alert.alert('Error', 'Please enter a feature title');
@@ -133,6 +160,16 @@ function App(): JSX.Element {
           {features.length === 0 && (
             <Text style={styles.emptyText}>No features yet. Add one above!</Text>
           )}
+          {nextUrl && (
+            <TouchableOpacity
+              style={[styles.button, loadingMore && styles.buttonDisabled]}
+              onPress={loadMoreFeatures}
+              disabled={loadingMore}>
+              <Text style={styles.buttonText}>
+                {loadingMore ? 'Loading...' : 'Load More'}
+              </Text>
+            </TouchableOpacity>
+          )}
         </View>
       </ScrollView>
     </SafeAreaView>
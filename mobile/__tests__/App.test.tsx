@@ -1,10 +1,13 @@
 import React from 'react';
 import {render, fireEvent, waitFor} from '@testing-library/react-native';
+import axios from 'axios';
 import App from '../App';
 
 // Mock axios
 jest.mock('axios', () => ({
-  get: jest.fn(() => Promise.resolve({data: []})),
+  get: jest.fn(() =>
+    Promise.resolve({data: {next: null, previous: null, results: []}}),
+  ),
   post: jest.fn(() => Promise.resolve({data: {}})),
 }));
 
@@ -30,4 +33,30 @@ describe('App', () => {
     const {getByText} = render(<App />);
     expect(getByText(/Features \(\d+\)/)).toBeTruthy();
   });
+
+  it('loads the next page and appends it', async () => {
+    const feature = (id: string) => ({
+      id,
+      title: `Feature ${id}`,
+      description: '',
+      votes: 0,
+      created_at: '2024-01-01T00:00:00Z',
+    });
+    const nextUrl = 'http://10.0.2.2:8000/api/features/?cursor=abc';
+    (axios.get as jest.Mock)
+      .mockResolvedValueOnce({
+        data: {next: nextUrl, previous: null, results: [feature('1')]},
+      })
+      .mockResolvedValueOnce({
+        data: {next: null, previous: nextUrl, results: [feature('2')]},
+      });
+
+    const {getByText, queryByText} = render(<App />);
+    fireEvent.press(await waitFor(() => getByText('Load More')));
+
+    await waitFor(() => expect(getByText('Feature 2')).toBeTruthy());
+    expect(getByText('Feature 1')).toBeTruthy();
+    expect(axios.get).toHaveBeenLastCalledWith(nextUrl);
+    expect(queryByText('Load More')).toBeNull();
+  });
 });
\ No newline at end of file